@@ -0,0 +1,173 @@
+"""Benchmark: persistência linha a linha (iterrows) x ingestão colunar em lotes.
+
+Gera um relatório sintético de pedidos e de itens com N linhas (padrão 500 mil),
+já no formato devolvido por `_ler_excel`, e mede o tempo de gravação em um banco
+SQLite temporário com a implementação antiga e com a nova.
+
+Uso:
+    python benchmarks/bench_importacao_vetorizada.py [--linhas 500000] [--sem-legado]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import database  # noqa: E402
+from bi import service  # noqa: E402
+
+
+def gerar_relatorios(linhas: int, semente: int = 42) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(semente)
+    inicio = np.datetime64("2024-01-01T00:00:00")
+    segundos = rng.integers(0, 365 * 24 * 3600, size=linhas)
+    ids = np.char.add("PED", np.arange(linhas).astype(str))
+
+    pedidos = pd.DataFrame(
+        {
+            "id do pedido": ids,
+            "data e hora do pedido": pd.to_datetime(inicio + segundos.astype("timedelta64[s]")),
+            "status": rng.choice(["Concluído", "Cancelado"], size=linhas, p=[0.95, 0.05]),
+            "tempo preparo": rng.integers(5, 40, size=linhas).astype(float),
+            "tempo entrega": rng.integers(10, 60, size=linhas).astype(float),
+        }
+    )
+    quantidade = rng.integers(1, 4, size=linhas).astype(float)
+    preco = rng.choice([12.9, 18.5, 24.0, 32.9, 7.5], size=linhas)
+    itens = pd.DataFrame(
+        {
+            "id do pedido": ids,
+            "nome do item": rng.choice([f"Produto {n:03d}" for n in range(200)], size=linhas),
+            "quantidade vendida": quantidade,
+            "receita do item": quantidade * preco,
+            "preço médio": preco,
+        }
+    )
+    pedidos.index = pedidos.index + 2
+    itens.index = itens.index + 2
+    return pedidos, itens
+
+
+def _parse_datetime_legado(valor: Any) -> str:
+    if pd.isna(valor):
+        raise ValueError("Data/hora do pedido está vazia.")
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=" ", timespec="seconds")
+    convertido = pd.to_datetime(valor, errors="coerce")
+    return convertido.to_pydatetime().isoformat(sep=" ", timespec="seconds")
+
+
+def salvar_pedidos_legado(df: pd.DataFrame, arquivo_origem: str) -> int:
+    """Cópia da implementação anterior (iterrows + um INSERT por linha)."""
+    linhas = 0
+    with database.get_connection() as conn:
+        for _, row in df.iterrows():
+            pedido_id = str(row.get("id do pedido", "")).strip()
+            if not pedido_id:
+                continue
+            conn.execute(
+                """
+                INSERT INTO bi_pedidos (
+                    provedor, pedido_id, data_hora_pedido, status, tempo_preparo_min, tempo_entrega_min, arquivo_origem
+                ) VALUES ('99food', ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(provedor, pedido_id) DO UPDATE SET
+                    data_hora_pedido = excluded.data_hora_pedido,
+                    status = excluded.status,
+                    tempo_preparo_min = excluded.tempo_preparo_min,
+                    tempo_entrega_min = excluded.tempo_entrega_min,
+                    arquivo_origem = excluded.arquivo_origem,
+                    atualizado_em = CURRENT_TIMESTAMP
+                """,
+                (
+                    pedido_id,
+                    _parse_datetime_legado(row.get("data e hora do pedido")),
+                    str(row.get("status", "")).strip(),
+                    float(row.get("tempo preparo", 0) or 0),
+                    float(row.get("tempo entrega", 0) or 0),
+                    arquivo_origem,
+                ),
+            )
+            linhas += 1
+        conn.commit()
+    return linhas
+
+
+def salvar_itens_legado(df: pd.DataFrame, arquivo_origem: str) -> int:
+    linhas = 0
+    with database.get_connection() as conn:
+        for _, row in df.iterrows():
+            pedido_id = str(row.get("id do pedido", "")).strip()
+            nome_item = str(row.get("nome do item", "")).strip()
+            if not pedido_id or not nome_item:
+                continue
+            conn.execute(
+                """
+                INSERT INTO bi_itens (
+                    provedor, pedido_id, nome_item, quantidade_vendida, receita_item, preco_medio, arquivo_origem
+                ) VALUES ('99food', ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    pedido_id,
+                    nome_item,
+                    float(row.get("quantidade vendida", 0) or 0),
+                    float(row.get("receita do item", 0) or 0),
+                    float(row.get("preço médio", 0) or 0),
+                    arquivo_origem,
+                ),
+            )
+            linhas += 1
+        conn.commit()
+    return linhas
+
+
+def _medir(rotulo: str, funcao, *args) -> float:
+    inicio = time.perf_counter()
+    funcao(*args)
+    duracao = time.perf_counter() - inicio
+    print(f"{rotulo:<32} {duracao:8.2f} s")
+    return duracao
+
+
+def _usar_banco_temporario(pasta: Path) -> None:
+    database.usar_diretorio_dados(pasta)
+    database.init_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=500_000)
+    parser.add_argument("--sem-legado", action="store_true", help="mede apenas a implementação nova")
+    args = parser.parse_args()
+
+    pedidos, itens = gerar_relatorios(args.linhas)
+    print(f"Relatórios sintéticos: {args.linhas} pedidos e {args.linhas} itens\n")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta_path = Path(pasta)
+
+        _usar_banco_temporario(pasta_path / "vetorizado")
+        novo = _medir("colunar + executemany (pedidos)", service._salvar_relatorio_pedidos, [pedidos], "bench.xlsx")
+        novo += _medir("colunar + executemany (itens)", service._salvar_relatorio_itens, [itens], "bench.xlsx")
+
+        if args.sem_legado:
+            return
+
+        _usar_banco_temporario(pasta_path / "legado")
+        legado = _medir("iterrows (pedidos)", salvar_pedidos_legado, pedidos, "bench.xlsx")
+        legado += _medir("iterrows (itens)", salvar_itens_legado, itens, "bench.xlsx")
+
+        print(f"\nSpeedup total: {legado / novo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
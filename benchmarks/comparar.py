@@ -0,0 +1,88 @@
+"""Compara dois resultados de `benchmarks/run.py` e aponta regressões.
+
+Para cada cenário presente nas duas execuções, mostra as métricas principais
+e a variação percentual. Uma variação pior que `--limite` (padrão: 10%) é
+marcada como regressão; com `--falhar`, o script sai com código 1 nesse caso.
+
+Uso:
+    python benchmarks/comparar.py base.json novo.json [--limite 10] [--falhar]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+# Parâmetros que não afetam as medições
+PARAMETROS_IGNORADOS = {"saida", "cache_arquivos"}
+
+# Métrica -> True quando valores maiores são piores
+METRICAS = {
+    "p50_ms": True,
+    "p95_ms": True,
+    "segundos": True,
+    "linhas_por_segundo": False,
+    "pico_rss_mib": True,
+}
+
+
+def comparar(base: dict, novo: dict, limite: float) -> list[dict]:
+    """Retorna uma linha por (cenário, métrica) presente nos dois resultados."""
+    linhas = []
+    for cenario, resultado_base in base["resultados"].items():
+        resultado_novo = novo["resultados"].get(cenario)
+        if resultado_novo is None:
+            continue
+        for metrica, maior_pior in METRICAS.items():
+            if metrica not in resultado_base or metrica not in resultado_novo:
+                continue
+            anterior, atual = resultado_base[metrica], resultado_novo[metrica]
+            variacao = (atual - anterior) / anterior * 100 if anterior else 0.0
+            piora = variacao if maior_pior else -variacao
+            linhas.append(
+                {
+                    "cenario": cenario,
+                    "metrica": metrica,
+                    "base": anterior,
+                    "novo": atual,
+                    "variacao_pct": round(variacao, 1),
+                    "regressao": piora > limite,
+                }
+            )
+    return linhas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", type=Path)
+    parser.add_argument("novo", type=Path)
+    parser.add_argument("--limite", type=float, default=10.0, help="piora percentual tolerada")
+    parser.add_argument("--falhar", action="store_true", help="sai com código 1 se houver regressão")
+    args = parser.parse_args()
+
+    base = json.loads(args.base.read_text())
+    novo = json.loads(args.novo.read_text())
+    print(f"base: {base['meta'].get('commit')} ({base['meta']['gerado_em']})")
+    print(f"novo: {novo['meta'].get('commit')} ({novo['meta']['gerado_em']})")
+    parametros = [
+        {chave: valor for chave, valor in resultado["meta"]["parametros"].items() if chave not in PARAMETROS_IGNORADOS}
+        for resultado in (base, novo)
+    ]
+    if parametros[0] != parametros[1]:
+        print("Aviso: as execuções usaram parâmetros diferentes.")
+
+    linhas = comparar(base, novo, args.limite)
+    for linha in linhas:
+        marca = "  REGRESSÃO" if linha["regressao"] else ""
+        print(
+            f"{linha['cenario']:45} {linha['metrica']:20} {linha['base']:>12} -> {linha['novo']:>12}"
+            f" ({linha['variacao_pct']:+.1f}%){marca}"
+        )
+
+    if args.falhar and any(linha["regressao"] for linha in linhas):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
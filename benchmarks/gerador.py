@@ -0,0 +1,214 @@
+"""Gerador de relatórios sintéticos da 99Food (pedidos e itens) em XLSX e CSV.
+
+Os arquivos usam os mesmos cabeçalhos das exportações da 99Food, reconhecidos
+pelo registro de `bi.provedores`. A distribuição imita uma operação real: picos no
+almoço e no jantar, mais movimento no fim de semana, catálogo de ~300 produtos
+com popularidade de cauda longa (Zipf) e de 1 a 4 itens por pedido, então o
+relatório de itens tem ~2,5× as linhas do de pedidos.
+
+A geração é feita em blocos, com memória constante. Como uma planilha comporta
+no máximo 1.048.575 linhas de dados, relatórios maiores são divididos em partes
+(`pedidos_001.xlsx`, `pedidos_002.xlsx`, ...). A mesma semente gera sempre os
+mesmos arquivos.
+
+Uso:
+    python benchmarks/gerador.py PASTA [--linhas 100000] [--formatos xlsx csv] [--semente 42]
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+COLUNAS_PEDIDOS = ["ID do pedido", "Data e hora do pedido", "Status", "Tempo preparo", "Tempo entrega"]
+COLUNAS_ITENS = ["ID do pedido", "Nome do item", "Quantidade vendida", "Receita do item", "Preço médio"]
+
+# Linhas de dados por planilha (1.048.576 menos o cabeçalho)
+LIMITE_LINHAS_XLSX = 1_048_575
+TAMANHO_BLOCO = 100_000
+DATA_INICIAL = np.datetime64("2024-01-01T00:00:00")
+
+_BASES = [
+    ("X-Burger", 24.9), ("X-Salada", 26.9), ("X-Bacon", 29.9), ("X-Tudo", 34.9), ("Smash Burger", 31.9),
+    ("Pizza Calabresa", 49.9), ("Pizza Margherita", 47.9), ("Pizza Portuguesa", 54.9), ("Pizza Frango", 52.9),
+    ("Pastel Carne", 12.9), ("Pastel Queijo", 11.9), ("Coxinha", 7.5), ("Esfiha Carne", 6.9), ("Açaí", 18.9),
+    ("Marmita Frango", 22.9), ("Marmita Carne", 25.9), ("Parmegiana", 36.9), ("Yakisoba", 32.9),
+    ("Temaki Salmão", 29.9), ("Poke", 39.9), ("Hot Dog", 15.9), ("Batata Frita", 17.9), ("Refrigerante Lata", 6.5),
+    ("Suco Natural", 9.9), ("Água", 4.0),
+]
+_VARIACOES = [
+    ("", 1.0), (" Grande", 1.3), (" Pequeno", 0.8), (" Combo", 1.5), (" Duplo", 1.4), (" Fit", 1.1),
+    (" Especial", 1.25), (" Kids", 0.7), (" Família", 2.2), (" Promo", 0.85), (" Vegano", 1.2), (" Light", 1.05),
+]
+PRODUTOS = [f"{base}{variacao}" for base, _ in _BASES for variacao, _ in _VARIACOES]
+PRECOS = np.round([preco * fator for _, preco in _BASES for _, fator in _VARIACOES], 2)
+
+# Peso relativo de pedidos por hora do dia (picos às 12h e às 20h)
+_PESO_HORA = np.array([1, 0.5, 0.3, 0.2, 0.2, 0.3, 0.6, 1, 1.5, 2, 3, 7, 10, 8, 3, 2, 2, 3, 6, 9, 10, 8, 5, 2], dtype=float)
+# Peso por dia da semana, começando na segunda (numpy: 1970-01-05 foi segunda)
+_PESO_DIA_SEMANA = np.array([0.8, 0.85, 0.9, 1.0, 1.3, 1.5, 1.2])
+
+
+def _popularidade(semente: int) -> np.ndarray:
+    """Probabilidade de cada produto (Zipf com s=1,1 sobre uma ordem embaralhada)."""
+    pesos = 1.0 / np.arange(1, len(PRODUTOS) + 1) ** 1.1
+    ordem = np.random.default_rng(semente).permutation(len(PRODUTOS))
+    probabilidades = np.empty(len(PRODUTOS))
+    probabilidades[ordem] = pesos / pesos.sum()
+    return probabilidades
+
+
+def produto_mais_vendido(semente: int = 42) -> str:
+    """Produto com maior probabilidade de venda para a semente dada."""
+    return PRODUTOS[int(np.argmax(_popularidade(semente)))]
+
+
+def _datas_pedidos(rng: np.random.Generator, quantidade: int, dias: int) -> np.ndarray:
+    calendario = DATA_INICIAL.astype("datetime64[D]") + np.arange(dias)
+    dia_semana = (calendario.astype("int64") - 4) % 7
+    peso_dia = _PESO_DIA_SEMANA[dia_semana]
+    sorteio_dia = rng.choice(dias, size=quantidade, p=peso_dia / peso_dia.sum())
+    hora = rng.choice(24, size=quantidade, p=_PESO_HORA / _PESO_HORA.sum())
+    segundos = sorteio_dia * 86_400 + hora * 3_600 + rng.integers(0, 3_600, size=quantidade)
+    return DATA_INICIAL + segundos.astype("timedelta64[s]")
+
+
+def gerar_blocos(
+    linhas: int, semente: int = 42, dias: int = 365, tamanho_bloco: int = TAMANHO_BLOCO
+) -> Iterator[tuple[pd.DataFrame, pd.DataFrame]]:
+    """Gera `linhas` pedidos em blocos, cada um com o DataFrame de pedidos e o de itens.
+
+    Os DataFrames já têm os cabeçalhos originais dos relatórios da 99Food.
+    """
+    rng = np.random.default_rng(semente)
+    probabilidades = _popularidade(semente)
+
+    for inicio in range(0, linhas, tamanho_bloco):
+        quantidade = min(tamanho_bloco, linhas - inicio)
+        ids = np.char.add("99F", (np.arange(inicio, inicio + quantidade) + 10_000_000_000).astype(str))
+        preparo = np.clip(rng.normal(18, 6, size=quantidade), 3, 60).round()
+        entrega = np.clip(rng.normal(32, 10, size=quantidade), 8, 90).round()
+        pedidos = pd.DataFrame(
+            {
+                "ID do pedido": ids,
+                "Data e hora do pedido": pd.to_datetime(_datas_pedidos(rng, quantidade, dias)),
+                "Status": rng.choice(["Concluído", "Cancelado"], size=quantidade, p=[0.94, 0.06]),
+                "Tempo preparo": preparo,
+                "Tempo entrega": entrega,
+            }
+        )
+
+        itens_por_pedido = rng.choice([1, 2, 3, 4], size=quantidade, p=[0.25, 0.35, 0.25, 0.15])
+        produto = rng.choice(len(PRODUTOS), size=int(itens_por_pedido.sum()), p=probabilidades)
+        unidades = rng.choice([1, 2, 3, 4], size=len(produto), p=[0.7, 0.2, 0.07, 0.03]).astype(float)
+        preco = PRECOS[produto]
+        itens = pd.DataFrame(
+            {
+                "ID do pedido": np.repeat(ids, itens_por_pedido),
+                "Nome do item": np.asarray(PRODUTOS, dtype=object)[produto],
+                "Quantidade vendida": unidades,
+                "Receita do item": np.round(unidades * preco, 2),
+                "Preço médio": preco,
+            }
+        )
+        yield pedidos, itens
+
+
+class _PlanilhaEmPartes:
+    """Grava linhas em XLSX (write_only), abrindo uma nova parte ao atingir o limite."""
+
+    def __init__(self, pasta: Path, prefixo: str, colunas: list[str]) -> None:
+        self.pasta = pasta
+        self.prefixo = prefixo
+        self.colunas = colunas
+        self.caminhos: list[Path] = []
+        self._workbook: Workbook | None = None
+        self._linhas = 0
+
+    def _nova_parte(self) -> None:
+        self.fechar()
+        self._workbook = Workbook(write_only=True)
+        self._planilha = self._workbook.create_sheet("Relatório")
+        self._planilha.append(self.colunas)
+        self._linhas = 0
+        self.caminhos.append(self.pasta / f"{self.prefixo}_{len(self.caminhos) + 1:03d}.xlsx")
+
+    def escrever(self, df: pd.DataFrame) -> None:
+        for linha in df.astype(object).itertuples(index=False, name=None):
+            if self._workbook is None or self._linhas >= LIMITE_LINHAS_XLSX:
+                self._nova_parte()
+            self._planilha.append(linha)
+            self._linhas += 1
+
+    def fechar(self) -> None:
+        if self._workbook is not None:
+            self._workbook.save(self.caminhos[-1])
+            self._workbook = None
+
+
+def escrever_relatorios(
+    pasta: Path,
+    linhas: int,
+    formatos: tuple[str, ...] = ("xlsx", "csv"),
+    semente: int = 42,
+    dias: int = 365,
+) -> dict[str, list[Path]]:
+    """Grava os relatórios de pedidos e itens nos formatos pedidos.
+
+    Retorna, por formato, os caminhos gerados (arquivos de pedidos antes dos de itens).
+    """
+    pasta.mkdir(parents=True, exist_ok=True)
+    planilhas = []
+    if "xlsx" in formatos:
+        planilhas = [
+            _PlanilhaEmPartes(pasta, "pedidos", COLUNAS_PEDIDOS),
+            _PlanilhaEmPartes(pasta, "itens", COLUNAS_ITENS),
+        ]
+    csvs = [pasta / "pedidos.csv", pasta / "itens.csv"] if "csv" in formatos else []
+
+    for numero, blocos in enumerate(gerar_blocos(linhas, semente, dias)):
+        for posicao, df in enumerate(blocos):
+            if planilhas:
+                planilhas[posicao].escrever(df)
+            if csvs:
+                df.to_csv(
+                    csvs[posicao],
+                    mode="w" if numero == 0 else "a",
+                    header=numero == 0,
+                    index=False,
+                    date_format="%Y-%m-%d %H:%M:%S",
+                )
+
+    for planilha in planilhas:
+        planilha.fechar()
+
+    gerados: dict[str, list[Path]] = {}
+    if planilhas:
+        gerados["xlsx"] = planilhas[0].caminhos + planilhas[1].caminhos
+    if csvs:
+        gerados["csv"] = csvs
+    return gerados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pasta", type=Path)
+    parser.add_argument("--linhas", type=int, default=100_000, help="pedidos gerados (itens: ~2,5×)")
+    parser.add_argument("--formatos", nargs="+", choices=["xlsx", "csv"], default=["xlsx", "csv"])
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--dias", type=int, default=365)
+    args = parser.parse_args()
+
+    gerados = escrever_relatorios(args.pasta, args.linhas, tuple(args.formatos), args.semente, args.dias)
+    for caminhos in gerados.values():
+        for caminho in caminhos:
+            print(caminho)
+
+
+if __name__ == "__main__":
+    main()
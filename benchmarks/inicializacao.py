@@ -0,0 +1,131 @@
+"""Tempo de subida da aplicação web: importações sob demanda e esquema já em dia.
+
+Cria bancos com algumas lojas numa pasta temporária e mede, em processos novos:
+
+- `import webapp` + `create_app`, como antes (pandas, openpyxl e NumPy importados
+  na subida e o DDL de todas as tabelas rodando em cada shard) e agora (só o
+  necessário para o dashboard; shards em VERSAO_ESQUEMA só têm a versão lida);
+- o tempo até a primeira resposta HTTP do servidor prefork (`src/servidor.py`).
+
+Uso:
+    python benchmarks/inicializacao.py [--lojas 4] [--repeticoes 7] [--workers 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+import database  # noqa: E402
+
+_SUBIDA = """
+import sys, time
+from pathlib import Path
+sys.path.insert(0, {src!r})
+inicio = time.perf_counter()
+import database
+database.usar_diretorio_dados(Path({pasta!r}))
+{antes}
+import webapp
+webapp.create_app(iniciar_fila=False)
+print(time.perf_counter() - inicio, "pandas" in sys.modules)
+"""
+
+# Como era: dependências pesadas na importação do bi e DDL completo em todo shard
+_COMO_ANTES = """
+import numpy, openpyxl, pandas
+import bi.colunar
+database.VERSAO_ESQUEMA = database.VERSAO_ESQUEMA_JOBS = 2**31 - 1
+"""
+
+_SERVIDOR = """
+import sys
+from pathlib import Path
+sys.path.insert(0, {src!r})
+import database
+database.usar_diretorio_dados(Path({pasta!r}))
+import servidor
+sys.argv = ["servidor", "--host", "127.0.0.1", "--porta", "{porta}", "--workers", "{workers}"]
+servidor.main()
+"""
+
+
+def _subida_ms(pasta: Path, antes: bool) -> tuple[float, bool]:
+    codigo = _SUBIDA.format(src=str(SRC), pasta=str(pasta), antes=_COMO_ANTES if antes else "")
+    saida = subprocess.run([sys.executable, "-c", codigo], check=True, capture_output=True, text=True).stdout
+    segundos, pandas = saida.split()
+    return float(segundos) * 1000, pandas == "True"
+
+
+def _porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _primeira_resposta_ms(pasta: Path, workers: int) -> float:
+    porta = _porta_livre()
+    codigo = _SERVIDOR.format(src=str(SRC), pasta=str(pasta), porta=porta, workers=workers)
+    inicio = time.perf_counter()
+    processo = subprocess.Popen([sys.executable, "-c", codigo], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{porta}/bi/99food/dashboard/kpis", timeout=5):
+                    return (time.perf_counter() - inicio) * 1000
+            except OSError:
+                if processo.poll() is not None:
+                    raise SystemExit("O servidor saiu antes de responder.")
+                time.sleep(0.005)
+    finally:
+        processo.send_signal(signal.SIGTERM)
+        processo.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lojas", type=int, default=4)
+    parser.add_argument("--repeticoes", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        raise SystemExit("O servidor prefork precisa de fork().")
+
+    with tempfile.TemporaryDirectory() as nome:
+        pasta = Path(nome)
+        database.usar_diretorio_dados(pasta)
+        database.init_db()
+        for numero in range(1, args.lojas):
+            database.criar_loja(f"loja{numero}")
+        database.fechar_conexoes()
+
+        medidas = {
+            rotulo: [_subida_ms(pasta, antes) for _ in range(args.repeticoes)]
+            for rotulo, antes in (("antes", True), ("depois", False))
+        }
+        servidor = [_primeira_resposta_ms(pasta, args.workers) for _ in range(args.repeticoes)]
+
+    print(f"{args.lojas} lojas; mediana de {args.repeticoes} processos")
+    print(f"{'import webapp + create_app (ms)':34}{'antes':>10}{'depois':>10}")
+    antes, depois = (statistics.median(ms for ms, _ in medidas[rotulo]) for rotulo in ("antes", "depois"))
+    print(f"{'':34}{antes:>10.1f}{depois:>10.1f}")
+    print(f"pandas importado na subida: antes={medidas['antes'][0][1]} depois={medidas['depois'][0][1]}")
+    print(f"Servidor prefork ({args.workers} workers), até a 1ª resposta: {statistics.median(servidor):.1f} ms")
+    if medidas["depois"][0][1]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
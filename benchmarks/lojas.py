@@ -0,0 +1,122 @@
+"""Um arquivo para todas as lojas × um shard por loja.
+
+Grava os mesmos relatórios sintéticos (uma parte por loja) nos dois arranjos, com
+uma thread de importação por loja, e mede o tempo total das importações e a
+latência do dashboard consolidado (rollups e tabelas brutas) e de uma loja só.
+Falha (código 1) se o consolidado dos shards divergir do banco único.
+
+Uso:
+    python benchmarks/lojas.py [--lojas 4] [--linhas-por-loja 50000] [--repeticoes 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import database  # noqa: E402
+from bench_importacao_vetorizada import gerar_relatorios  # noqa: E402
+from bi import service  # noqa: E402
+
+
+def _importar(lojas: list[str], destino: Callable[[str], str], pedidos, itens) -> float:
+    """Uma thread por loja; `destino(loja)` é a loja (shard) onde a parte dela é gravada."""
+
+    def importar(numero: int, loja: str) -> None:
+        prefixo = f"L{numero}-"
+        with database.usar_loja(destino(loja)):
+            service._salvar_relatorio_pedidos([pedidos.assign(**{"id do pedido": prefixo + pedidos["id do pedido"]})], "lojas.csv")
+            service._salvar_relatorio_itens([itens.assign(**{"id do pedido": prefixo + itens["id do pedido"]})], "lojas.csv")
+
+    threads = [threading.Thread(target=importar, args=(numero, loja)) for numero, loja in enumerate(lojas)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - inicio
+
+
+def _p50_ms(funcao: Callable[[], Any], repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def _iguais(esperado: Any, obtido: Any) -> bool:
+    if isinstance(esperado, dict):
+        return esperado.keys() == obtido.keys() and all(_iguais(esperado[c], obtido[c]) for c in esperado)
+    if isinstance(esperado, list):
+        return len(esperado) == len(obtido) and all(_iguais(a, b) for a, b in zip(esperado, obtido))
+    if isinstance(esperado, (int, float)) and isinstance(obtido, (int, float)):
+        return math.isclose(esperado, obtido, rel_tol=1e-9, abs_tol=1e-6)
+    return esperado == obtido
+
+
+def _cenario(pasta: Path, lojas: list[str], sharded: bool, pedidos, itens, repeticoes: int) -> dict[str, Any]:
+    database.usar_diretorio_dados(pasta)
+    database.init_db()
+    if sharded:
+        for loja in lojas:
+            database.criar_loja(loja)
+    segundos = _importar(lojas, (lambda loja: loja) if sharded else (lambda _loja: database.LOJA_PADRAO), pedidos, itens)
+
+    resultado = {
+        "importacao_s": segundos,
+        "rollups_ms": _p50_ms(lambda: service.carregar_dashboard("99food"), repeticoes),
+        "brutas_ms": _p50_ms(lambda: service.carregar_dashboard("99food", usar_rollups=False), repeticoes),
+        "dashboard": service.carregar_dashboard("99food", usar_rollups=False),
+    }
+    if sharded:
+        resultado["uma_loja_brutas_ms"] = _p50_ms(
+            lambda: service.carregar_dashboard("99food", usar_rollups=False, loja=lojas[-1]), repeticoes
+        )
+    database.fechar_conexoes()
+    return resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lojas", type=int, default=4)
+    parser.add_argument("--linhas-por-loja", type=int, default=50_000)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    lojas = [database.LOJA_PADRAO, *(f"loja{numero}" for numero in range(1, args.lojas))]
+    pedidos, itens = gerar_relatorios(args.linhas_por_loja)
+    with tempfile.TemporaryDirectory() as pasta:
+        unico = _cenario(Path(pasta) / "unico", lojas, False, pedidos, itens, args.repeticoes)
+        shards = _cenario(Path(pasta) / "shards", lojas, True, pedidos, itens, args.repeticoes)
+
+    print(f"{len(lojas)} lojas × {args.linhas_por_loja} pedidos")
+    print(f"{'':28}{'um arquivo':>12}{'shards':>12}")
+    for chave, rotulo in [
+        ("importacao_s", "importação (s)"),
+        ("rollups_ms", "consolidado, rollups (ms)"),
+        ("brutas_ms", "consolidado, brutas (ms)"),
+    ]:
+        print(f"{rotulo:28}{unico[chave]:>12.2f}{shards[chave]:>12.2f}")
+    print(f"{'uma loja, brutas (ms)':28}{'':>12}{shards['uma_loja_brutas_ms']:>12.2f}")
+
+    consistente = _iguais(unico["dashboard"], shards["dashboard"])
+    print(f"Consolidado igual ao banco único: {consistente}")
+    if not consistente:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Dashboard pelas tabelas brutas antes e depois de arquivar os meses fechados.
+
+Importa um ano de pedidos sintéticos (2024), mede o dashboard sem rollups em
+alguns períodos, arquiva tudo menos os meses mais recentes (bi.particoes) e mede
+de novo: o padrão (só os meses quentes), o histórico inteiro e um mês arquivado.
+Falha (código 1) se o histórico inteiro ou um período depois do arquivamento
+divergir do resultado de antes.
+
+Uso:
+    python benchmarks/particoes.py [--linhas 200000] [--meses-quentes 4] [--repeticoes 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import database  # noqa: E402
+from bench_importacao_vetorizada import gerar_relatorios  # noqa: E402
+from bi import particoes, service  # noqa: E402
+
+# Um dia depois do ano gerado: todos os meses de 2024 estão fechados
+HOJE = date(2025, 1, 15)
+
+CENARIOS: dict[str, dict[str, Any]] = {
+    "sem datas": {},
+    "histórico inteiro": {"todo_periodo": True},
+    "um mês (março)": {"data_inicial": "2024-03-01", "data_final": "2024-03-31"},
+    "último trimestre": {"data_inicial": "2024-10-01", "data_final": "2024-12-31"},
+}
+
+
+def _p50_ms(funcao: Callable[[], Any], repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def _iguais(esperado: Any, obtido: Any) -> bool:
+    if isinstance(esperado, dict):
+        return esperado.keys() == obtido.keys() and all(_iguais(esperado[c], obtido[c]) for c in esperado)
+    if isinstance(esperado, list):
+        return len(esperado) == len(obtido) and all(_iguais(a, b) for a, b in zip(esperado, obtido))
+    if isinstance(esperado, (int, float)) and isinstance(obtido, (int, float)):
+        return math.isclose(esperado, obtido, rel_tol=1e-9, abs_tol=1e-6)
+    return esperado == obtido
+
+
+def _medir(repeticoes: int) -> dict[str, tuple[float, dict[str, Any]]]:
+    return {
+        nome: (
+            _p50_ms(lambda: service.carregar_dashboard("99food", usar_rollups=False, **filtros), repeticoes),
+            service.carregar_dashboard("99food", usar_rollups=False, **filtros),
+        )
+        for nome, filtros in CENARIOS.items()
+    }
+
+
+def _tamanho_mib(*arquivos: Path) -> float:
+    return sum(arquivo.stat().st_size for arquivo in arquivos) / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--meses-quentes", type=int, default=4, help="meses mantidos quentes, contando o mês de referência (HOJE)")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    pedidos, itens = gerar_relatorios(args.linhas)
+    with tempfile.TemporaryDirectory() as pasta:
+        database.usar_diretorio_dados(Path(pasta))
+        database.init_db()
+        service._salvar_relatorio_pedidos([pedidos], "particoes.csv")
+        service._salvar_relatorio_itens([itens], "particoes.csv")
+        with database.conexao_escrita() as conn:
+            conn.execute("VACUUM")
+        antes = _medir(args.repeticoes)
+        tamanho_antes = _tamanho_mib(database.DB_PATH)
+
+        inicio = time.perf_counter()
+        arquivados = particoes.arquivar_meses_fechados(args.meses_quentes, HOJE, compactar=True)
+        segundos_arquivamento = time.perf_counter() - inicio
+        with database.get_connection() as conn:
+            pasta_arquivo = particoes.pasta_arquivo(conn)
+        depois = _medir(args.repeticoes)
+        tamanho_quente = _tamanho_mib(database.DB_PATH)
+        tamanho_arquivo = _tamanho_mib(*pasta_arquivo.glob("*.db"))
+        database.fechar_conexoes()
+
+    print(f"{args.linhas} pedidos; {len(arquivados)} meses arquivados em {segundos_arquivamento:.2f} s")
+    print(f"Banco: {tamanho_antes:.1f} MiB -> quente {tamanho_quente:.1f} MiB + arquivo {tamanho_arquivo:.1f} MiB")
+    print(f"{'dashboard sem rollups (ms)':28}{'antes':>10}{'depois':>10}")
+    for nome in CENARIOS:
+        print(f"{nome:28}{antes[nome][0]:>10.2f}{depois[nome][0]:>10.2f}")
+
+    # "sem datas" muda de propósito (antes: tudo; depois: meses quentes)
+    consistente = all(_iguais(antes[nome][1], depois[nome][1]) for nome in CENARIOS if nome != "sem datas")
+    consistente &= _iguais(depois["sem datas"][1], depois["último trimestre"][1])
+    print(f"Resultados iguais aos de antes do arquivamento: {consistente}")
+    if not consistente:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
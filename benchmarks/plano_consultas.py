@@ -0,0 +1,62 @@
+"""Regressão de plano de consulta do dashboard (EXPLAIN QUERY PLAN).
+
+Garante que a consulta única sobre as tabelas brutas continue usando
+idx_bi_pedidos_tempo quando há filtro de período, e que o filtro
+por produto não vire varredura completa. Sai com código 1 se algum plano regredir.
+
+Uso:
+    python benchmarks/plano_consultas.py
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import database  # noqa: E402
+from bi import service  # noqa: E402
+
+INDICE_DATA = "idx_bi_pedidos_tempo"
+
+# (data_inicial, data_final, produto, trecho obrigatório no plano)
+CASOS = [
+    ("2024-01-01", "2024-01-31", None, INDICE_DATA),
+    ("2024-01-01", None, None, INDICE_DATA),
+    (None, "2024-01-31", None, INDICE_DATA),
+    ("2024-01-01", "2024-01-31", "Produto 001", "USING INDEX"),
+    (None, None, "Produto 001", "USING INDEX"),
+]
+
+
+def plano(conn, data_inicial: str | None, data_final: str | None, produto: str | None) -> list[str]:
+    where, parametros = service._filtros_tabelas_brutas("99food", data_inicial, data_final, produto)
+    sql = service._sql_dashboard_tabelas_brutas(where)
+    return [linha["detail"] for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+
+
+def main() -> None:
+    falhas = 0
+    with tempfile.TemporaryDirectory() as pasta:
+        database.usar_diretorio_dados(Path(pasta))
+        database.init_db()
+
+        with database.get_connection() as conn:
+            for data_inicial, data_final, produto, esperado in CASOS:
+                detalhes = plano(conn, data_inicial, data_final, produto)
+                # A única leitura das tabelas brutas é a materialização de `base`
+                leituras = [d for d in detalhes if d.startswith(("SCAN p", "SCAN i", "SEARCH p", "SEARCH i"))]
+                ok = any(esperado in d for d in leituras) and not any(d in ("SCAN p", "SCAN i") for d in leituras)
+                falhas += not ok
+                print(f"{'OK   ' if ok else 'FALHA'} {(data_inicial, data_final, produto)}")
+                for detalhe in leituras:
+                    print(f"      {detalhe}")
+
+    if falhas:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
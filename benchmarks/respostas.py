@@ -0,0 +1,125 @@
+"""Tamanho e tempo de serialização da resposta do dashboard por formato.
+
+Importa um ano de pedidos sintéticos e, para um mês e para o ano inteiro, compara
+o formato padrão (linhas, serializado como o `jsonify` do Flask) com o colunar
+(`bi.respostas`, com e sem os rankings de produtos): bytes sem compressão, com
+gzip e com brotli (se o módulo estiver instalado) e p50 da serialização e da
+compressão. Falha (código 1) se o colunar não reconstruir as mesmas linhas.
+
+Uso:
+    python benchmarks/respostas.py [--linhas 100000] [--repeticoes 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import database  # noqa: E402
+from bench_importacao_vetorizada import gerar_relatorios  # noqa: E402
+from bi import respostas, service  # noqa: E402
+
+PERIODOS = {
+    "um mês": ("2024-03-01", "2024-03-31"),
+    "ano inteiro": ("2024-01-01", "2024-12-31"),
+}
+
+
+def _p50_ms(funcao: Callable[[], Any], repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def _jsonify(valor: Any) -> bytes:
+    # Mesmas opções do provedor JSON padrão do Flask fora do modo debug
+    return json.dumps(valor, ensure_ascii=True, sort_keys=True, separators=(",", ":")).encode()
+
+
+def _linhas_de_volta(colunar: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    return [dict(zip(colunar, valores)) for valores in zip(*colunar.values())]
+
+
+def _consistente(dashboard: dict[str, Any]) -> bool:
+    colunar = respostas.dashboard_colunar(dashboard)
+    return all(
+        _linhas_de_volta(colunar[secao][painel]) == dashboard[secao][painel]
+        for painel, secao in service.PAINEIS_DASHBOARD.items()
+        if secao is not None
+    )
+
+
+def _medir(dashboard: dict[str, Any], repeticoes: int) -> list[tuple[str, dict[str, float]]]:
+    variantes: list[tuple[str, Callable[[], Any], Callable[[Any], bytes]]] = [
+        ("linhas (jsonify)", lambda: dashboard, _jsonify),
+        ("linhas", lambda: dashboard, respostas.serializar_json),
+        ("colunar", lambda: respostas.dashboard_colunar(dashboard), respostas.serializar_json),
+        ("colunar, produtos=0", lambda: respostas.dashboard_colunar(dashboard, produtos=False), respostas.serializar_json),
+    ]
+    resultados = []
+    for nome, montar, serializar in variantes:
+        corpo = serializar(montar())
+        medidas = {
+            "bytes": len(corpo),
+            "serializacao_ms": _p50_ms(lambda: serializar(montar()), repeticoes),
+        }
+        for codificacao in respostas.codificacoes_disponiveis():
+            medidas[f"{codificacao}_bytes"] = len(respostas.comprimir(corpo, codificacao)[0])
+            medidas[f"{codificacao}_ms"] = _p50_ms(lambda: respostas.comprimir(corpo, codificacao), repeticoes)
+        resultados.append((nome, medidas))
+    return resultados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    pedidos, itens = gerar_relatorios(args.linhas)
+    with tempfile.TemporaryDirectory() as pasta:
+        database.usar_diretorio_dados(Path(pasta))
+        database.init_db()
+        service._salvar_relatorio_pedidos([pedidos], "respostas.csv")
+        service._salvar_relatorio_itens([itens], "respostas.csv")
+        dashboards = {
+            nome: service.carregar_dashboard("99food", data_inicial, data_final)
+            for nome, (data_inicial, data_final) in PERIODOS.items()
+        }
+        database.fechar_conexoes()
+
+    codificacoes = respostas.codificacoes_disponiveis()
+    print(f"{args.linhas} pedidos; encoder: {'orjson' if respostas.orjson else 'json'}; compressão: {', '.join(codificacoes)}")
+    consistente = True
+    for periodo, dashboard in dashboards.items():
+        consistente &= _consistente(dashboard)
+        cabecalho = f"{'bytes':>9}{'serial. ms':>11}"
+        for codificacao in codificacoes:
+            cabecalho += f"{codificacao + ' bytes':>11}{codificacao + ' ms':>9}"
+        print(f"\n{periodo:22}{cabecalho}")
+        for nome, medidas in _medir(dashboard, args.repeticoes):
+            linha = f"{nome:22}{medidas['bytes']:>9}{medidas['serializacao_ms']:>11.3f}"
+            for codificacao in codificacoes:
+                linha += f"{medidas[codificacao + '_bytes']:>11}{medidas[codificacao + '_ms']:>9.3f}"
+            print(linha)
+
+    print(f"\nColunar reconstrói as mesmas linhas: {consistente}")
+    if not consistente:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Suíte de benchmarks reproduzível: importação, dashboard e financeiro.
+
+Gera relatórios sintéticos da 99Food (ver gerador.py), importa com
+`importar_arquivos_99food` a partir de .xlsx, CSV e CSV com gzip (cada formato
+num banco próprio, conferindo que todos gravam os mesmos dados), mede `carregar_dashboard_99food` em cada combinação
+de filtros (período, produto, ambos, nenhum), pelos rollups, pelas tabelas
+brutas e pelo snapshot colunar (carga, memória e conferência contra as tabelas
+brutas), e mede `finance.listar_lancamentos`/`calcular_saldo` num livro-caixa
+sintético. Cada cenário roda num processo próprio, então o pico de RSS
+reportado é só do cenário.
+
+O resultado é gravado em JSON (meta + resultados por cenário) para comparação
+entre execuções com `benchmarks/comparar.py`.
+
+Uso:
+    python benchmarks/run.py [--linhas 10000] [--repeticoes 20] [--lancamentos 100000]
+                             [--saida resultado.json] [--cache-arquivos PASTA]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import shutil
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "src"))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+import database  # noqa: E402
+import finance  # noqa: E402
+from bi import colunar, service  # noqa: E402
+from gerador import escrever_relatorios, produto_mais_vendido  # noqa: E402
+
+PASTA_RESULTADOS = RAIZ / "benchmarks" / "resultados"
+# Janela do filtro de período (dentro do ano gerado pelo gerador)
+PERIODO = ("2024-03-01", "2024-03-31")
+# Formatos importados; o cenário do .xlsx mantém o nome "importacao" dos resultados antigos
+FORMATOS = ("xlsx", "csv", "csv_gz")
+
+
+def _pico_rss_mib() -> float:
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _estatisticas(tempos: list[float]) -> dict[str, Any]:
+    tempos_ms = np.array(tempos) * 1000
+    return {
+        "execucoes": len(tempos),
+        "media_ms": round(float(tempos_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(tempos_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(tempos_ms, 95)), 3),
+        "min_ms": round(float(tempos_ms.min()), 3),
+        "max_ms": round(float(tempos_ms.max()), 3),
+        "ops_por_segundo": round(float(1000 / tempos_ms.mean()), 2),
+    }
+
+
+def _medir(funcao: Callable[[], Any], repeticoes: int) -> dict[str, Any]:
+    funcao()  # aquecimento: cache de páginas do SQLite e imports tardios
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _estatisticas(tempos)
+
+
+def _assinatura_dados() -> str:
+    """SHA-256 do conteúdo de bi_pedidos/bi_itens, sem colunas de origem e horário."""
+    digest = hashlib.sha256()
+    with database.get_connection() as conn:
+        for sql in (
+            "SELECT provedor, pedido_id, data_hora_pedido, status, tempo_preparo_min, tempo_entrega_min"
+            " FROM bi_pedidos ORDER BY provedor, pedido_id",
+            "SELECT provedor, pedido_id, nome_item, quantidade_vendida, receita_item, preco_medio"
+            " FROM bi_itens ORDER BY provedor, pedido_id, nome_item",
+        ):
+            for linha in conn.execute(sql):
+                digest.update(repr(tuple(linha)).encode())
+    return digest.hexdigest()
+
+
+def cenario_importacao(pasta_dados: str, arquivos: list[str], formato: str = "xlsx") -> dict[str, Any]:
+    database.usar_diretorio_dados(Path(pasta_dados))
+    database.init_db()
+
+    caminhos = [Path(arquivo) for arquivo in arquivos]
+    handles = [caminho.open("rb") for caminho in caminhos]
+    try:
+        inicio = time.perf_counter()
+        resultado = service.importar_arquivos_99food([(caminho.name, handle) for caminho, handle in zip(caminhos, handles)])
+        segundos = time.perf_counter() - inicio
+    finally:
+        for handle in handles:
+            handle.close()
+
+    linhas = resultado["pedidos"] + resultado["itens"]
+    return {
+        "importacao" if formato == "xlsx" else f"importacao.{formato}": {
+            "formato": formato,
+            "arquivos": len(caminhos),
+            "bytes": sum(caminho.stat().st_size for caminho in caminhos),
+            "linhas": linhas,
+            "linhas_rejeitadas": sum(arquivo["linhas_rejeitadas"] for arquivo in resultado["arquivos"]),
+            "segundos": round(segundos, 3),
+            "linhas_por_segundo": round(linhas / segundos, 1),
+            "pico_rss_mib": _pico_rss_mib(),
+            "assinatura": _assinatura_dados(),
+        }
+    }
+
+
+def cenario_dashboard(pasta_dados: str, repeticoes: int, produto: str) -> dict[str, Any]:
+    database.usar_diretorio_dados(Path(pasta_dados))
+    filtros = {
+        "sem_filtro": {},
+        "periodo": {"data_inicial": PERIODO[0], "data_final": PERIODO[1]},
+        "produto": {"produto": produto},
+        "periodo_produto": {"data_inicial": PERIODO[0], "data_final": PERIODO[1], "produto": produto},
+    }
+    resultados = {}
+    for motor, usar_rollups in (("rollups", True), ("tabelas_brutas", False)):
+        for nome, parametros in filtros.items():
+            resultados[f"dashboard.{motor}.{nome}"] = _medir(
+                lambda: service.carregar_dashboard_99food(**parametros, usar_rollups=usar_rollups), repeticoes
+            )
+    pico = _pico_rss_mib()
+    for resultado in resultados.values():
+        resultado["pico_rss_mib"] = pico
+
+    # Snapshot colunar: a carga e o RSS a mais vão para um cenário próprio
+    inicio = time.perf_counter()
+    snapshot = colunar.obter_snapshot("99food")
+    segundos = time.perf_counter() - inicio
+    pico_colunar = _pico_rss_mib()
+    linhas = len(snapshot.pedido_ids) + len(snapshot.item_ids)
+    resultados["dashboard.colunar.carga"] = {
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(linhas / segundos, 1),
+        "snapshot_mib": round(snapshot.bytes / (1024 * 1024), 2),
+        "pico_rss_mib": pico_colunar,
+        "rss_adicional_mib": round(pico_colunar - pico, 1),
+    }
+    for nome, parametros in filtros.items():
+        verificacao = colunar.verificar_colunar("99food", **parametros)
+        if not verificacao["consistente"]:
+            raise RuntimeError(f"Dashboard colunar diverge das tabelas brutas ({nome}): {verificacao['divergencias']}")
+        resultados[f"dashboard.colunar.{nome}"] = _medir(
+            lambda: colunar.carregar_dashboard_99food_colunar(**parametros), repeticoes
+        )
+        resultados[f"dashboard.colunar.{nome}"]["pico_rss_mib"] = _pico_rss_mib()
+    return resultados
+
+
+def _popular_lancamentos(quantidade: int, semente: int) -> None:
+    rng = np.random.default_rng(semente)
+    datas = (np.datetime64("2022-01-01") + rng.integers(0, 3 * 365, size=quantidade)).astype(str)
+    tipos = rng.choice(["entrada", "saida"], size=quantidade, p=[0.4, 0.6])
+    categorias = rng.choice(["vendas", "fornecedores", "aluguel", "salarios", "impostos", "outros"], size=quantidade)
+    valores = np.round(rng.lognormal(4.5, 1.0, size=quantidade), 2)
+    with database.conexao_escrita() as conn:
+        conn.executemany(
+            "INSERT INTO lancamentos (tipo, descricao, valor, data, categoria) VALUES (?, ?, ?, ?, ?)",
+            zip(tipos.tolist(), (f"Lançamento {n}" for n in range(quantidade)), valores.tolist(), datas.tolist(), categorias.tolist()),
+        )
+    finance.reconstruir_resumos()
+
+
+def cenario_financeiro(pasta_dados: str, lancamentos: int, repeticoes: int, semente: int) -> dict[str, Any]:
+    database.usar_diretorio_dados(Path(pasta_dados))
+    database.init_db()
+    _popular_lancamentos(lancamentos, semente)
+
+    resultados = {
+        "financeiro.listar_lancamentos": _medir(finance.listar_lancamentos, repeticoes),
+        "financeiro.calcular_saldo": _medir(finance.calcular_saldo, repeticoes),
+    }
+    pico = _pico_rss_mib()
+    for resultado in resultados.values():
+        resultado["lancamentos"] = lancamentos
+        resultado["pico_rss_mib"] = pico
+    return resultados
+
+
+def _executar_isolado(funcao: Callable[..., dict[str, Any]], *args: Any) -> dict[str, Any]:
+    # spawn: o processo filho começa limpo, sem herdar a memória do pai
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(funcao, *args).result()
+
+
+def _commit_atual() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta(args: argparse.Namespace) -> dict[str, Any]:
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "parametros": {chave: str(valor) if isinstance(valor, Path) else valor for chave, valor in vars(args).items()},
+    }
+
+
+def _comprimir(caminho: Path) -> Path:
+    destino = caminho.with_name(caminho.name + ".gz")
+    with caminho.open("rb") as origem, gzip.open(destino, "wb", compresslevel=6) as saida:
+        shutil.copyfileobj(origem, saida)
+    return destino
+
+
+def _arquivos_de_teste(args: argparse.Namespace, pasta_temporaria: Path) -> dict[str, list[str]]:
+    """Caminhos dos relatórios por formato (os mesmos dados em .xlsx, CSV e CSV.gz)."""
+    if args.cache_arquivos:
+        pasta = args.cache_arquivos / f"{args.linhas}-{args.semente}"
+        existentes = {
+            "xlsx": sorted(pasta.glob("pedidos_*.xlsx")) + sorted(pasta.glob("itens_*.xlsx")),
+            "csv": [pasta / "pedidos.csv", pasta / "itens.csv"],
+            "csv_gz": [pasta / "pedidos.csv.gz", pasta / "itens.csv.gz"],
+        }
+        if all(caminhos and all(caminho.exists() for caminho in caminhos) for caminhos in existentes.values()):
+            return {formato: [str(caminho) for caminho in caminhos] for formato, caminhos in existentes.items()}
+    else:
+        pasta = pasta_temporaria / "relatorios"
+    gerados = escrever_relatorios(pasta, args.linhas, ("xlsx", "csv"), args.semente)
+    gerados["csv_gz"] = [_comprimir(caminho) for caminho in gerados["csv"]]
+    return {formato: [str(caminho) for caminho in gerados[formato]] for formato in FORMATOS}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=10_000, help="pedidos no relatório sintético (itens: ~2,5×)")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--lancamentos", type=int, default=100_000)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", type=Path, help="arquivo JSON (padrão: benchmarks/resultados/<data>.json)")
+    parser.add_argument("--cache-arquivos", type=Path, help="reaproveita relatórios gerados nesta pasta")
+    args = parser.parse_args()
+
+    resultados: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta_temporaria = Path(pasta)
+        print(f"Gerando relatórios com {args.linhas} pedidos...", flush=True)
+        arquivos = _arquivos_de_teste(args, pasta_temporaria)
+
+        pasta_bi = str(pasta_temporaria / "bi")
+        for formato in FORMATOS:
+            print(f"Importação ({formato})...", flush=True)
+            pasta_formato = pasta_bi if formato == "xlsx" else f"{pasta_bi}_{formato}"
+            resultados.update(_executar_isolado(cenario_importacao, pasta_formato, arquivos[formato], formato))
+        assinaturas = {resultado["formato"]: resultado["assinatura"] for resultado in resultados.values()}
+        if len(set(assinaturas.values())) != 1:
+            raise SystemExit(f"Os formatos gravaram dados diferentes: {assinaturas}")
+        print("Dashboard...", flush=True)
+        resultados.update(_executar_isolado(cenario_dashboard, pasta_bi, args.repeticoes, produto_mais_vendido(args.semente)))
+        print("Financeiro...", flush=True)
+        resultados.update(
+            _executar_isolado(
+                cenario_financeiro, str(pasta_temporaria / "financeiro"), args.lancamentos, args.repeticoes, args.semente
+            )
+        )
+
+    saida = args.saida or PASTA_RESULTADOS / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps({"meta": _meta(args), "resultados": resultados}, indent=2, ensure_ascii=False))
+
+    for nome, resultado in resultados.items():
+        if "p50_ms" in resultado:
+            print(f"{nome:45} p50 {resultado['p50_ms']:>10.2f} ms   p95 {resultado['p95_ms']:>10.2f} ms")
+        else:
+            print(f"{nome:45} {resultado['segundos']:>10.2f} s   {resultado['linhas_por_segundo']:>12.0f} linhas/s")
+    print(f"Resultado gravado em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Teste de estresse de concorrência: importações e leituras do dashboard ao mesmo tempo.
+
+Threads escritoras gravam relatórios sintéticos (pedidos e itens) e lançamentos
+financeiros, enquanto threads leitoras consultam o dashboard (rollups e tabelas
+brutas) e o saldo. Falha (código 1) se qualquer operação levantar erro, por
+exemplo "database is locked", ou se os rollups terminarem inconsistentes.
+
+Uso:
+    python benchmarks/stress_concorrencia.py [--segundos 20] [--leitores 8] [--escritores 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import database  # noqa: E402
+import finance  # noqa: E402
+from bench_importacao_vetorizada import gerar_relatorios  # noqa: E402
+from bi import rollups, service  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segundos", type=float, default=20.0)
+    parser.add_argument("--leitores", type=int, default=8)
+    parser.add_argument("--escritores", type=int, default=2)
+    parser.add_argument("--linhas-por-importacao", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        database.usar_diretorio_dados(Path(pasta))
+        database.init_db()
+
+        pedidos, itens = gerar_relatorios(args.linhas_por_importacao)
+        fim = time.monotonic() + args.segundos
+        erros: list[str] = []
+        latencias: list[float] = []
+        importacoes = [0]
+        trava = threading.Lock()
+
+        def escritor(numero: int) -> None:
+            rodada = 0
+            while time.monotonic() < fim:
+                try:
+                    # IDs deslocados por escritor/rodada: parte nova, parte upsert
+                    deslocamento = f"E{numero}R{rodada % 3}-"
+                    lote_pedidos = pedidos.assign(**{"id do pedido": deslocamento + pedidos["id do pedido"]})
+                    lote_itens = itens.assign(**{"id do pedido": deslocamento + itens["id do pedido"]})
+                    service._salvar_relatorio_pedidos([lote_pedidos], "stress.xlsx")
+                    service._salvar_relatorio_itens([lote_itens], "stress.xlsx")
+                    finance.adicionar_lancamento("entrada", "stress", 10.0, "2024-01-01", "teste")
+                    with trava:
+                        importacoes[0] += 1
+                except Exception as exc:
+                    with trava:
+                        erros.append(f"escritor {numero}: {exc!r}")
+                rodada += 1
+
+        def leitor(numero: int) -> None:
+            filtros = [(None, None, None), ("2024-03-01", "2024-03-31", None), (None, None, "Produto 001")]
+            rodada = 0
+            while time.monotonic() < fim:
+                inicio = time.perf_counter()
+                try:
+                    filtro = filtros[rodada % len(filtros)]
+                    service.carregar_dashboard_99food(*filtro, usar_rollups=rodada % 2 == 0)
+                    finance.calcular_saldo()
+                except Exception as exc:
+                    with trava:
+                        erros.append(f"leitor {numero}: {exc!r}")
+                with trava:
+                    latencias.append(time.perf_counter() - inicio)
+                rodada += 1
+
+        threads = [threading.Thread(target=escritor, args=(n,)) for n in range(args.escritores)]
+        threads += [threading.Thread(target=leitor, args=(n,)) for n in range(args.leitores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        verificacao = rollups.verificar_rollups()
+        database.fechar_conexoes()
+
+    latencias.sort()
+    print(f"Importações concluídas: {importacoes[0]}")
+    print(f"Leituras do dashboard:  {len(latencias)} ({len(latencias) / args.segundos:.1f}/s)")
+    if latencias:
+        print(f"Latência p50/p95:       {statistics.median(latencias) * 1000:.1f} / "
+              f"{latencias[int(len(latencias) * 0.95) - 1] * 1000:.1f} ms")
+    print(f"Rollups consistentes:   {verificacao['consistente']}")
+    print(f"Erros:                  {len(erros)}")
+    for erro in erros[:10]:
+        print(f"  {erro}")
+
+    if erros or not verificacao["consistente"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
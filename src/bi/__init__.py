@@ -1,13 +1,93 @@
-"""Módulos de Business Intelligence."""
+"""Módulos de Business Intelligence.
 
+O motor colunar (NumPy/pandas) é exportado sob demanda: `from bi import
+carregar_dashboard_colunar` o importa, `import bi` não.
+"""
+
+from .cache import (
+    carregar_dashboard_99food_em_cache,
+    carregar_dashboard_em_cache,
+    carregar_painel_em_cache,
+    versao_dados,
+    versao_dados_99food,
+)
+from .exportacao import FORMATOS_EXPORTACAO, TIPOS_EXPORTACAO, comprimir_gzip, exportar
+from .jobs import consultar_job, enfileirar_importacao, enfileirar_importacao_99food, iniciar_fila_importacao
+from .particoes import Particao, arquivar_mes, arquivar_meses_fechados, listar_particoes, restaurar_mes
+from .produtos import LIMITE_BUSCA, buscar_produtos
+from .provedores import BIProvider, EsquemaRelatorio, listar_provedores, obter_provedor, registrar_provedor
+from .respostas import (
+    FORMATOS_DASHBOARD,
+    codificacoes_disponiveis,
+    comprimir,
+    dashboard_colunar,
+    painel_colunar,
+    serializar_json,
+)
+from .rollups import garantir_rollups, reconstruir_rollups, verificar_rollups
 from .service import (
-    BIProvider,
+    PAINEIS_DASHBOARD,
+    carregar_dashboard,
     carregar_dashboard_99food,
+    carregar_painel,
+    importar_arquivos,
     importar_arquivos_99food,
 )
 
 __all__ = [
     "BIProvider",
+    "EsquemaRelatorio",
+    "FORMATOS_DASHBOARD",
+    "FORMATOS_EXPORTACAO",
+    "LIMITE_BUSCA",
+    "PAINEIS_DASHBOARD",
+    "Particao",
+    "TIPOS_EXPORTACAO",
+    "arquivar_mes",
+    "arquivar_meses_fechados",
+    "buscar_produtos",
+    "carregar_dashboard",
     "carregar_dashboard_99food",
+    "carregar_dashboard_99food_colunar",
+    "carregar_dashboard_99food_em_cache",
+    "carregar_dashboard_colunar",
+    "carregar_dashboard_em_cache",
+    "carregar_painel",
+    "carregar_painel_em_cache",
+    "codificacoes_disponiveis",
+    "comprimir",
+    "comprimir_gzip",
+    "consultar_job",
+    "dashboard_colunar",
+    "enfileirar_importacao",
+    "enfileirar_importacao_99food",
+    "exportar",
+    "garantir_rollups",
+    "importar_arquivos",
     "importar_arquivos_99food",
+    "iniciar_fila_importacao",
+    "listar_particoes",
+    "listar_provedores",
+    "obter_provedor",
+    "painel_colunar",
+    "registrar_provedor",
+    "reconstruir_rollups",
+    "restaurar_mes",
+    "serializar_json",
+    "verificar_colunar",
+    "verificar_rollups",
+    "versao_dados",
+    "versao_dados_99food",
 ]
+
+_EXPORTADOS_COLUNAR = frozenset(
+    {"carregar_dashboard_99food_colunar", "carregar_dashboard_colunar", "verificar_colunar"}
+)
+
+
+def __getattr__(nome: str):
+    if nome in _EXPORTADOS_COLUNAR:
+        from . import colunar
+
+        return getattr(colunar, nome)
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
@@ -0,0 +1,218 @@
+"""Detecção do formato e leitura só da linha de cabeçalho dos relatórios.
+
+O formato sai do conteúdo, não do nome do arquivo: .xlsx (zip), CSV/TSV em texto
+ou CSV comprimido com gzip, com separador e codificação detectados pelo início
+do arquivo.
+
+Classificar um relatório (provedor e tipo) só depende do cabeçalho. Em vez de
+abrir a pasta de trabalho com o openpyxl, o XML da planilha ativa é percorrido
+com `iterparse` até o fim da primeira linha, e das strings compartilhadas só se
+lê até o maior índice usado nela. Arquivos errados são recusados em
+milissegundos, sem depender do tamanho do relatório.
+"""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import gzip
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+from xml.etree.ElementTree import iterparse
+
+# Bytes lidos do início do arquivo para detectar formato, codificação e separador
+TAMANHO_AMOSTRA = 64 * 1024
+SEPARADORES = ",;\t|"
+
+_NS_RELACOES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_RE_COLUNA = re.compile(r"^([A-Z]+)")
+
+
+def _nome_local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _relacoes(pacote: zipfile.ZipFile) -> dict[str, tuple[str, str]]:
+    """Id -> (tipo, caminho no zip) das relações de xl/workbook.xml."""
+    relacoes = {}
+    with pacote.open("xl/_rels/workbook.xml.rels") as arquivo:
+        for _, elemento in iterparse(arquivo):
+            if _nome_local(elemento.tag) == "Relationship":
+                alvo = elemento.get("Target", "")
+                caminho = alvo.lstrip("/") if alvo.startswith("/") else posixpath.normpath(f"xl/{alvo}")
+                relacoes[elemento.get("Id", "")] = (elemento.get("Type", ""), caminho)
+    return relacoes
+
+
+def _planilha_ativa(pacote: zipfile.ZipFile, relacoes: dict[str, tuple[str, str]]) -> str:
+    """Caminho da planilha ativa (a mesma que `workbook.active` do openpyxl)."""
+    aba_ativa = 0
+    ids: list[str] = []
+    with pacote.open("xl/workbook.xml") as arquivo:
+        for _, elemento in iterparse(arquivo):
+            nome = _nome_local(elemento.tag)
+            if nome == "workbookView" and not ids:
+                aba_ativa = int(elemento.get("activeTab") or 0)
+            elif nome == "sheet":
+                ids.append(elemento.get(f"{{{_NS_RELACOES}}}id", ""))
+    if not ids:
+        raise KeyError("planilha")
+    return relacoes[ids[aba_ativa if aba_ativa < len(ids) else 0]][1]
+
+
+def _indice_coluna(referencia: str | None, padrao: int) -> int:
+    correspondencia = _RE_COLUNA.match(referencia or "")
+    if not correspondencia:
+        return padrao
+    indice = 0
+    for letra in correspondencia.group(1):
+        indice = indice * 26 + ord(letra) - ord("A") + 1
+    return indice - 1
+
+
+def _primeira_linha(pacote: zipfile.ZipFile, caminho: str) -> list[tuple[int, str | None, str | None]]:
+    """Células da linha 1 como (coluna, tipo, valor bruto)."""
+    celulas: list[tuple[int, str | None, str | None]] = []
+    with pacote.open(caminho) as arquivo:
+        for _, elemento in iterparse(arquivo):
+            if _nome_local(elemento.tag) != "row":
+                continue
+            if elemento.get("r") not in (None, "1"):
+                break
+            for celula in elemento:
+                if _nome_local(celula.tag) != "c":
+                    continue
+                tipo = celula.get("t")
+                if tipo == "inlineStr":
+                    valor = "".join(t.text or "" for t in celula.iter() if _nome_local(t.tag) == "t")
+                else:
+                    valor = next((v.text for v in celula if _nome_local(v.tag) == "v"), None)
+                celulas.append((_indice_coluna(celula.get("r"), len(celulas)), tipo, valor))
+            break
+    return celulas
+
+
+def _strings_compartilhadas(pacote: zipfile.ZipFile, caminho: str, indices: set[int]) -> dict[int, str]:
+    """Lê sharedStrings.xml só até o maior índice pedido."""
+    encontradas: dict[int, str] = {}
+    ultimo = max(indices)
+    posicao = 0
+    with pacote.open(caminho) as arquivo:
+        for _, elemento in iterparse(arquivo):
+            if _nome_local(elemento.tag) != "si":
+                continue
+            if posicao in indices:
+                # Texto com formatação vem em vários <r><t>; a leitura fonética (<rPh>) fica de fora
+                foneticos = {id(t) for rph in elemento if _nome_local(rph.tag) == "rPh" for t in rph.iter()}
+                encontradas[posicao] = "".join(
+                    filho.text or ""
+                    for filho in elemento.iter()
+                    if _nome_local(filho.tag) == "t" and id(filho) not in foneticos
+                )
+            elemento.clear()
+            posicao += 1
+            if posicao > ultimo:
+                break
+    return encontradas
+
+
+def ler_cabecalho_xlsx(caminho: Path) -> list[str | None]:
+    """Valores da primeira linha da planilha ativa (None nas células vazias).
+
+    Levanta zipfile.BadZipFile se o arquivo não for um zip e KeyError se faltar
+    alguma parte esperada do pacote.
+    """
+    with zipfile.ZipFile(caminho) as pacote:
+        relacoes = _relacoes(pacote)
+        celulas = _primeira_linha(pacote, _planilha_ativa(pacote, relacoes))
+        if not celulas:
+            return []
+
+        indices = {int(valor) for _, tipo, valor in celulas if tipo == "s" and valor is not None}
+        compartilhadas: dict[int, str] = {}
+        if indices:
+            caminho_strings = next(
+                (alvo for tipo, alvo in relacoes.values() if tipo.endswith("/sharedStrings")), "xl/sharedStrings.xml"
+            )
+            compartilhadas = _strings_compartilhadas(pacote, caminho_strings, indices)
+
+    valores: list[str | None] = [None] * (max(coluna for coluna, _, _ in celulas) + 1)
+    for coluna, tipo, valor in celulas:
+        if valor is None:
+            continue
+        valores[coluna] = compartilhadas.get(int(valor)) if tipo == "s" else valor
+    return valores
+
+
+@dataclass(frozen=True)
+class FormatoArquivo:
+    """Formato detectado: 'xlsx' ou 'csv' (com separador, codificação e compressão)."""
+
+    tipo: str
+    separador: str = ","
+    encoding: str = "utf-8"
+    compressao: str | None = None
+
+
+FORMATO_XLSX = FormatoArquivo("xlsx")
+
+
+def _abrir_binario(caminho: Path, compressao: str | None) -> IO[bytes]:
+    return gzip.open(caminho, "rb") if compressao == "gzip" else open(caminho, "rb")
+
+
+def _detectar_encoding(amostra: bytes) -> str:
+    if amostra.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False: a amostra pode cortar um caractere multibyte no fim
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        # Exportações antigas do Excel em português
+        return "cp1252"
+
+
+def _detectar_separador(texto: str) -> str:
+    linhas = [linha for linha in texto.splitlines()[:20] if linha.strip()]
+    try:
+        return csv.Sniffer().sniff("\n".join(linhas), delimiters=SEPARADORES).delimiter
+    except csv.Error:
+        # Sem padrão consistente: o separador mais frequente no cabeçalho
+        cabecalho = linhas[0] if linhas else ""
+        return max(SEPARADORES, key=cabecalho.count) if any(s in cabecalho for s in SEPARADORES) else ","
+
+
+def detectar_formato(caminho: Path) -> FormatoArquivo:
+    """Identifica o formato pelo conteúdo (assinatura do zip/gzip e amostra do texto).
+
+    Levanta ValueError para conteúdo binário que não seja .xlsx nem CSV.
+    """
+    with open(caminho, "rb") as arquivo:
+        inicio = arquivo.read(4)
+    if inicio.startswith(b"PK\x03\x04"):
+        return FORMATO_XLSX
+
+    compressao = "gzip" if inicio.startswith(b"\x1f\x8b") else None
+    try:
+        with _abrir_binario(caminho, compressao) as arquivo:
+            amostra = arquivo.read(TAMANHO_AMOSTRA)
+    except (OSError, EOFError) as exc:
+        raise ValueError(f"Arquivo '{Path(caminho).name}' não pôde ser lido: {exc}") from exc
+    if not amostra.strip() or b"\x00" in amostra:
+        raise ValueError(f"Arquivo '{Path(caminho).name}' não é uma planilha .xlsx nem um CSV.")
+
+    encoding = _detectar_encoding(amostra)
+    texto = amostra.decode(encoding, errors="ignore")
+    return FormatoArquivo("csv", _detectar_separador(texto), encoding, compressao)
+
+
+def ler_cabecalho_csv(caminho: Path, formato: FormatoArquivo) -> list[str]:
+    """Campos da primeira linha do CSV."""
+    with _abrir_binario(caminho, formato.compressao) as binario:
+        texto = codecs.getreader(formato.encoding)(binario, errors="replace")
+        return next(csv.reader(texto, delimiter=formato.separador), [])
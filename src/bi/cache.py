@@ -0,0 +1,168 @@
+"""Cache em memória dos resultados do dashboard de BI.
+
+As entradas ficam num LRU limitado por tamanho e TTL e são marcadas com a
+versão dos dados (tabela versao_dados). Cada importação incrementa a versão
+na mesma transação da gravação, então uma entrada de versão antiga nunca é servida
+depois que a versão nova é lida. As versões lidas ficam em memória por um TTL
+curto (`database.obter_versao_dados`): a importação de outro processo aparece em
+até SQLITE_VERSOES_TTL segundos.
+
+Com BI_DASHBOARD_COLUNAR=1, as entradas são calculadas pelo snapshot colunar
+(`bi.colunar`) em vez das consultas aos rollups; só então o módulo (e o NumPy)
+é importado.
+
+Cada painel (KPIs, séries, rankings) também tem entrada própria no mesmo LRU,
+então a tela pode buscá-los em paralelo sem recalcular o dashboard inteiro.
+
+A loja faz parte da chave; a visão consolidada (sem loja) usa a soma das versões
+de todas as lojas, que muda a cada importação em qualquer uma delas.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from database import listar_lojas, obter_versao_dados
+
+from .provedores import PROVEDOR_99FOOD, obter_provedor
+from .service import carregar_dashboard, carregar_painel, extrair_painel
+
+TAMANHO_PADRAO = 128
+TTL_PADRAO_SEGUNDOS = 300.0
+MOTOR_COLUNAR = os.environ.get("BI_DASHBOARD_COLUNAR", "").lower() in ("1", "true", "sim")
+
+
+class CacheLRU:
+    """LRU thread-safe com TTL; cada entrada guarda a versão dos dados que a gerou."""
+
+    def __init__(self, tamanho_maximo: int = TAMANHO_PADRAO, ttl_segundos: float = TTL_PADRAO_SEGUNDOS) -> None:
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self._entradas: OrderedDict[Hashable, tuple[int, float, Any]] = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave: Hashable, versao: int) -> Any | None:
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            versao_entrada, expira_em, valor = entrada
+            if versao_entrada != versao or expira_em < time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave: Hashable, versao: int, valor: Any) -> None:
+        with self._trava:
+            self._entradas[chave] = (versao, time.monotonic() + self.ttl_segundos, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._trava:
+            self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+_cache_dashboard = CacheLRU(
+    tamanho_maximo=int(os.environ.get("BI_CACHE_TAMANHO", TAMANHO_PADRAO)),
+    ttl_segundos=float(os.environ.get("BI_CACHE_TTL", TTL_PADRAO_SEGUNDOS)),
+)
+
+
+def versao_dados(provedor: str, loja: str | None = None) -> int:
+    """Versão dos dados do provedor na loja; sem loja, a soma das versões de todas as lojas."""
+    provedor = obter_provedor(provedor).slug
+    return sum(obter_versao_dados(provedor, loja_dados) for loja_dados in ([loja] if loja else listar_lojas()))
+
+
+def versao_dados_99food() -> int:
+    return versao_dados(PROVEDOR_99FOOD.slug)
+
+
+def carregar_dashboard_em_cache(
+    provedor: str,
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    versao: int | None = None,
+    loja: str | None = None,
+    todo_periodo: bool = False,
+) -> tuple[int, dict[str, Any]]:
+    """Retorna (versão dos dados do provedor, dashboard), reaproveitando o cache quando possível.
+
+    Tamanho e TTL vêm de BI_CACHE_TAMANHO e BI_CACHE_TTL (segundos); o motor, de
+    BI_DASHBOARD_COLUNAR. Sem `loja`, o dashboard consolida todas as lojas; sem
+    datas, cobre os meses quentes, salvo com `todo_periodo`.
+    """
+    if versao is None:
+        versao = versao_dados(provedor, loja)
+    filtros = (provedor, data_inicial or None, data_final or None, produto or None)
+    chave = (*filtros, loja or None, todo_periodo)
+
+    dashboard = _cache_dashboard.obter(chave, versao)
+    if dashboard is None:
+        if MOTOR_COLUNAR:
+            from .colunar import carregar_dashboard_colunar
+
+            dashboard = carregar_dashboard_colunar(*filtros, loja=loja, todo_periodo=todo_periodo)
+        else:
+            dashboard = carregar_dashboard(*filtros, loja=loja, todo_periodo=todo_periodo)
+        _cache_dashboard.guardar(chave, versao, dashboard)
+    return versao, dashboard
+
+
+def carregar_painel_em_cache(
+    provedor: str,
+    painel: str,
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    versao: int | None = None,
+    loja: str | None = None,
+    todo_periodo: bool = False,
+) -> tuple[int, Any]:
+    """Retorna (versão dos dados do provedor, painel), como `carregar_dashboard_em_cache`.
+
+    Se o dashboard completo com os mesmos filtros já está no cache, o painel sai
+    dele; senão só o painel é calculado e guardado.
+    """
+    if versao is None:
+        versao = versao_dados(provedor, loja)
+    filtros = (provedor, data_inicial or None, data_final or None, produto or None)
+
+    dashboard = _cache_dashboard.obter((*filtros, loja or None, todo_periodo), versao)
+    if dashboard is not None:
+        return versao, extrair_painel(dashboard, painel)
+
+    chave = (*filtros, loja or None, todo_periodo, painel)
+    valor = _cache_dashboard.obter(chave, versao)
+    if valor is None:
+        if MOTOR_COLUNAR:
+            from .colunar import carregar_dashboard_colunar
+
+            valor = extrair_painel(
+                carregar_dashboard_colunar(*filtros, loja=loja, todo_periodo=todo_periodo), painel
+            )
+        else:
+            valor = carregar_painel(provedor, painel, *filtros[1:], loja=loja, todo_periodo=todo_periodo)
+        _cache_dashboard.guardar(chave, versao, valor)
+    return versao, valor
+
+
+def carregar_dashboard_99food_em_cache(
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    versao: int | None = None,
+) -> tuple[int, dict[str, Any]]:
+    return carregar_dashboard_em_cache(PROVEDOR_99FOOD.slug, data_inicial, data_final, produto, versao)
@@ -0,0 +1,495 @@
+"""Motor colunar do dashboard: snapshot em memória das tabelas de BI com NumPy.
+
+Opcional (BI_DASHBOARD_COLUNAR=1). Cada provedor de cada loja tem um snapshot com os pedidos
+(horário em segundos desde a época, int64, e dia/hora/dia da semana derivados) e
+os itens (posição do pedido, código inteiro do produto num dicionário ordenado,
+receita e quantidade em float64). KPIs, séries e rankings saem de máscaras
+vetorizadas e `np.bincount`, sem voltar ao SQLite a cada troca de filtro.
+
+O resultado tem o mesmo formato e a mesma ordenação de `service._dashboard_tabelas_brutas`
+(empates no ranking em ordem alfabética); somas de ponto flutuante podem diferir
+só no arredondamento, pela ordem da soma.
+
+Quando a versão dos dados do provedor muda, o snapshot relê só as linhas gravadas
+depois da sua versão (coluna `versao`, índice (provedor, versao)); os snapshots
+são imutáveis e a troca é atômica, então consultas em andamento não são afetadas.
+Sem loja, os snapshots de todas as lojas são lidos em paralelo e combinados como
+em `service.carregar_dashboard`.
+
+O snapshot tem só os meses quentes (bi.particoes): um período que alcança meses
+arquivados sai das tabelas brutas, e arquivar ou restaurar um mês recarrega o
+snapshot inteiro.
+"""
+
+from __future__ import annotations
+
+import math
+import sqlite3
+import sys
+import threading
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from database import get_connection, loja_atual, obter_versao_dados
+
+from . import particoes
+from .provedores import PROVEDOR_99FOOD, obter_provedor
+from .service import (
+    _NOMES_DIA_SEMANA,
+    TAMANHO_RANKING,
+    _com_provedores,
+    _consolidar,
+    _dashboard_tabelas_brutas,
+    combinar_dashboards,
+)
+
+# Tolerância relativa para diferenças de arredondamento entre somas em ordens distintas
+TOLERANCIA = 1e-9
+SEGUNDOS_DIA = 86_400
+# 1970-01-01 foi uma quinta-feira (strftime('%w') = 4)
+_DIA_SEMANA_EPOCA = 4
+
+_SQL_PEDIDOS = """
+    SELECT id, epoch
+    FROM bi_pedidos
+    WHERE provedor = ? AND versao > ?
+    ORDER BY id
+"""
+
+# LEFT JOIN: itens sem pedido não entram nas agregações, mas o nome vai para o dicionário
+_SQL_ITENS = """
+    SELECT i.id, p.id, i.nome_item, i.receita_item, i.quantidade_vendida
+    FROM bi_itens i
+    LEFT JOIN bi_pedidos p ON p.provedor = i.provedor AND p.pedido_id = i.pedido_id
+    WHERE i.provedor = ? AND i.versao > ?
+    ORDER BY i.id
+"""
+
+# Itens antigos cujo pedido chegou (ou mudou) depois da versão do snapshot
+_SQL_ITENS_DE_PEDIDOS_NOVOS = """
+    SELECT i.id, p.id, i.nome_item, i.receita_item, i.quantidade_vendida
+    FROM bi_pedidos p
+    JOIN bi_itens i ON i.provedor = p.provedor AND i.pedido_id = p.pedido_id
+    WHERE p.provedor = ? AND p.versao > ? AND i.versao <= ?
+    ORDER BY i.id
+"""
+
+
+@dataclass(frozen=True)
+class SnapshotColunar:
+    """Colunas de pedidos e itens de um provedor numa versão dos dados.
+
+    Os ids (rowid no SQLite) ficam em ordem crescente, o que permite localizar
+    linhas alteradas com `np.searchsorted`. `produtos` é o dicionário dos códigos,
+    em ordem alfabética: ordenar por código é ordenar por nome. `inicio_quente`
+    é o início do período quente quando o snapshot foi lido.
+    """
+
+    provedor: str
+    versao: int
+    inicio_quente: str | None
+    pedido_ids: np.ndarray
+    segundos: np.ndarray
+    dias: np.ndarray
+    horas: np.ndarray
+    dias_semana: np.ndarray
+    item_ids: np.ndarray
+    item_pedido: np.ndarray
+    item_produto: np.ndarray
+    receita: np.ndarray
+    quantidade: np.ndarray
+    produtos: tuple[str, ...]
+
+    @property
+    def bytes(self) -> int:
+        """Memória ocupada pelas colunas e pelo dicionário de produtos."""
+        colunas = (
+            self.pedido_ids, self.segundos, self.dias, self.horas, self.dias_semana,
+            self.item_ids, self.item_pedido, self.item_produto, self.receita, self.quantidade,
+        )
+        return sum(coluna.nbytes for coluna in colunas) + sum(sys.getsizeof(nome) for nome in self.produtos)
+
+
+def _colunas_pedidos(linhas: list[tuple[Any, ...]]) -> tuple[np.ndarray, np.ndarray]:
+    if not linhas:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    ids, segundos = zip(*linhas)
+    return np.array(ids, np.int64), np.array(segundos, np.int64)
+
+
+def _colunas_itens(
+    linhas: list[tuple[Any, ...]],
+) -> tuple[np.ndarray, np.ndarray, list[str], np.ndarray, np.ndarray]:
+    """Colunas dos itens como vieram do SQLite; item sem pedido fica com id de pedido -1."""
+    if not linhas:
+        vazio = np.empty(0, np.int64)
+        return vazio, vazio, [], np.empty(0), np.empty(0)
+    ids, pedidos, nomes, receitas, quantidades = zip(*linhas)
+    return (
+        np.array(ids, np.int64),
+        np.array([-1 if pedido is None else pedido for pedido in pedidos], np.int64),
+        list(nomes),
+        np.array(receitas, np.float64),
+        np.array(quantidades, np.float64),
+    )
+
+
+def _posicoes(pedido_ids: np.ndarray, item_pedido_db: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Posição de cada item no array de pedidos e máscara dos itens cujo pedido existe."""
+    posicoes = np.searchsorted(pedido_ids, item_pedido_db)
+    com_pedido = (item_pedido_db >= 0) & (posicoes < len(pedido_ids))
+    com_pedido[com_pedido] = pedido_ids[posicoes[com_pedido]] == item_pedido_db[com_pedido]
+    return posicoes.astype(np.int32), com_pedido
+
+
+def _codificar(produtos: tuple[str, ...], nomes: list[str]) -> np.ndarray:
+    return pd.Index(produtos, dtype=object).get_indexer(pd.Index(nomes, dtype=object)).astype(np.int32)
+
+
+def _derivar_tempo(segundos: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    dias = segundos // SEGUNDOS_DIA
+    horas = (segundos % SEGUNDOS_DIA) // 3600
+    dias_semana = (dias + _DIA_SEMANA_EPOCA) % 7
+    return dias.astype(np.int32), horas.astype(np.int8), dias_semana.astype(np.int8)
+
+
+@contextmanager
+def _transacao_leitura() -> Iterator[sqlite3.Connection]:
+    # Versão e linhas lidas na mesma transação enxergam o mesmo estado do banco (WAL)
+    conn = get_connection()
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+
+def _ler_versao(conn: sqlite3.Connection, provedor: str) -> int:
+    row = conn.execute("SELECT versao FROM versao_dados WHERE escopo = ?", (provedor,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def carregar_snapshot(provedor: str) -> SnapshotColunar:
+    """Lê pedidos e itens do provedor inteiros."""
+    provedor = obter_provedor(provedor).slug
+    with _transacao_leitura() as conn:
+        versao = _ler_versao(conn, provedor)
+        inicio_quente = particoes.inicio_quente(conn)
+        pedido_ids, segundos = _colunas_pedidos(conn.execute(_SQL_PEDIDOS, (provedor, -1)).fetchall())
+        item_ids, item_pedido_db, nomes, receita, quantidade = _colunas_itens(
+            conn.execute(_SQL_ITENS, (provedor, -1)).fetchall()
+        )
+
+    produtos = tuple(sorted(set(nomes)))
+    posicoes, com_pedido = _posicoes(pedido_ids, item_pedido_db)
+    dias, horas, dias_semana = _derivar_tempo(segundos)
+    return SnapshotColunar(
+        provedor=provedor,
+        versao=versao,
+        inicio_quente=inicio_quente,
+        pedido_ids=pedido_ids,
+        segundos=segundos,
+        dias=dias,
+        horas=horas,
+        dias_semana=dias_semana,
+        item_ids=item_ids[com_pedido],
+        item_pedido=posicoes[com_pedido],
+        item_produto=_codificar(produtos, nomes)[com_pedido],
+        receita=receita[com_pedido],
+        quantidade=quantidade[com_pedido],
+        produtos=produtos,
+    )
+
+
+def _substituir_ou_anexar(
+    ids: np.ndarray, colunas: list[np.ndarray], novos_ids: np.ndarray, novas_colunas: list[np.ndarray]
+) -> tuple[np.ndarray, list[np.ndarray]] | None:
+    """Atualiza linhas existentes (mesmo id) e anexa as novas no fim, sem alterar as entradas.
+
+    Retorna None se alguma linha nova tiver id menor que o maior existente (a ordem
+    por id se perderia); nesse caso o snapshot é recarregado inteiro.
+    """
+    posicoes = np.searchsorted(ids, novos_ids)
+    existentes = posicoes < len(ids)
+    existentes[existentes] = ids[posicoes[existentes]] == novos_ids[existentes]
+    anexados = novos_ids[~existentes]
+    if len(anexados) and len(ids) and anexados.min() <= ids[-1]:
+        return None
+    resultado = []
+    for coluna, nova in zip(colunas, novas_colunas):
+        coluna = coluna.copy()
+        coluna[posicoes[existentes]] = nova[existentes]
+        resultado.append(np.concatenate([coluna, nova[~existentes]]))
+    return np.concatenate([ids, anexados]), resultado
+
+
+def atualizar_snapshot(snapshot: SnapshotColunar) -> SnapshotColunar:
+    """Aplica ao snapshot só as linhas gravadas depois da sua versão.
+
+    Linhas alteradas (mesmo id) são substituídas e as novas, anexadas, então as
+    posições dos pedidos já carregados não mudam. O snapshot recebido não é modificado.
+    Se um mês foi arquivado ou restaurado, o snapshot é relido inteiro.
+    """
+    provedor, versao = snapshot.provedor, snapshot.versao
+    with _transacao_leitura() as conn:
+        versao_atual = _ler_versao(conn, provedor)
+        if versao_atual == versao:
+            return snapshot
+        # Linhas que saíram das tabelas quentes não aparecem na leitura incremental
+        arquivamento = particoes.inicio_quente(conn) != snapshot.inicio_quente
+        if not arquivamento:
+            novos_pedidos, novos_segundos = _colunas_pedidos(
+                conn.execute(_SQL_PEDIDOS, (provedor, versao)).fetchall()
+            )
+            linhas_itens = conn.execute(_SQL_ITENS, (provedor, versao)).fetchall()
+            linhas_itens += conn.execute(_SQL_ITENS_DE_PEDIDOS_NOVOS, (provedor, versao, versao)).fetchall()
+    if arquivamento:
+        return carregar_snapshot(provedor)
+
+    pedidos = _substituir_ou_anexar(snapshot.pedido_ids, [snapshot.segundos], novos_pedidos, [novos_segundos])
+    if pedidos is None:
+        return carregar_snapshot(provedor)
+    pedido_ids, (segundos,) = pedidos
+
+    linhas_itens.sort(key=lambda linha: linha[0])
+    item_ids, item_pedido_db, nomes, receita, quantidade = _colunas_itens(linhas_itens)
+    produtos = tuple(sorted(set(snapshot.produtos).union(nomes)))
+    item_produto = snapshot.item_produto
+    if len(produtos) != len(snapshot.produtos):
+        # Produtos novos deslocam os códigos: remapeia os antigos para o novo dicionário
+        item_produto = _codificar(produtos, list(snapshot.produtos))[item_produto]
+    posicoes, com_pedido = _posicoes(pedido_ids, item_pedido_db)
+    itens = _substituir_ou_anexar(
+        snapshot.item_ids,
+        [snapshot.item_pedido, item_produto, snapshot.receita, snapshot.quantidade],
+        item_ids[com_pedido],
+        [posicoes[com_pedido], _codificar(produtos, nomes)[com_pedido], receita[com_pedido], quantidade[com_pedido]],
+    )
+    if itens is None:
+        return carregar_snapshot(provedor)
+    item_ids, (item_pedido, item_produto, receita, quantidade) = itens
+
+    dias, horas, dias_semana = _derivar_tempo(segundos)
+    return SnapshotColunar(
+        provedor=provedor,
+        versao=versao_atual,
+        inicio_quente=snapshot.inicio_quente,
+        pedido_ids=pedido_ids,
+        segundos=segundos,
+        dias=dias,
+        horas=horas,
+        dias_semana=dias_semana,
+        item_ids=item_ids,
+        item_pedido=item_pedido,
+        item_produto=item_produto,
+        receita=receita,
+        quantidade=quantidade,
+        produtos=produtos,
+    )
+
+
+# (loja, provedor) -> snapshot
+_snapshots: dict[tuple[str, str], SnapshotColunar] = {}
+_trava_snapshots = threading.Lock()
+
+
+def obter_snapshot(provedor: str) -> SnapshotColunar:
+    """Snapshot do provedor na loja atual, na versão atual dos dados (carrega ou atualiza se preciso)."""
+    provedor = obter_provedor(provedor).slug
+    chave = (loja_atual(), provedor)
+    snapshot = _snapshots.get(chave)
+    if snapshot is not None and snapshot.versao == obter_versao_dados(provedor):
+        return snapshot
+    # Uma thread atualiza por vez; as demais recebem o snapshot já atualizado
+    with _trava_snapshots:
+        snapshot = _snapshots.get(chave)
+        snapshot = carregar_snapshot(provedor) if snapshot is None else atualizar_snapshot(snapshot)
+        _snapshots[chave] = snapshot
+    return snapshot
+
+
+def descartar_snapshots() -> None:
+    with _trava_snapshots:
+        _snapshots.clear()
+
+
+def _limites_periodo(data_inicial: str | None, data_final: str | None) -> tuple[int | None, int | None, bool]:
+    """Limites em segundos com a mesma interpretação de datas do SQLite (date(?)).
+
+    O terceiro valor é False se alguma data informada for inválida (nenhum pedido passa).
+    """
+    if not data_inicial and not data_final:
+        return None, None, True
+    inicio, fim = get_connection().execute(
+        "SELECT CAST(strftime('%s', date(?)) AS INTEGER), CAST(strftime('%s', date(?, '+1 day')) AS INTEGER)",
+        (data_inicial or None, data_final or None),
+    ).fetchone()
+    valido = (not data_inicial or inicio is not None) and (not data_final or fim is not None)
+    return inicio, fim, valido
+
+
+def _somar(grupos: np.ndarray, pesos: np.ndarray, tamanho: int) -> np.ndarray:
+    return np.bincount(grupos, weights=pesos, minlength=tamanho) if len(grupos) else np.zeros(tamanho)
+
+
+def carregar_dashboard_colunar(
+    provedor: str,
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    loja: str | None = None,
+    todo_periodo: bool = False,
+) -> dict[str, Any]:
+    """Dashboard calculado do snapshot colunar, no formato de `service.carregar_dashboard`.
+
+    Com `loja`, só o snapshot dela; sem, todas as lojas combinadas. Período
+    padrão como em `service.carregar_dashboard`.
+    """
+    provedor = obter_provedor(provedor).slug
+
+    def calcular(limite: int | None) -> dict[str, Any]:
+        with get_connection() as conn:
+            inicio, fim = particoes.periodo_efetivo(conn, data_inicial, data_final, todo_periodo)
+        return _dashboard_colunar(provedor, inicio, fim, produto, limite)
+
+    return _com_provedores(_consolidar(loja, calcular, combinar_dashboards), provedor)
+
+
+def _dashboard_colunar(
+    provedor: str,
+    data_inicial: str | None,
+    data_final: str | None,
+    produto: str | None,
+    limite_ranking: int | None = TAMANHO_RANKING,
+) -> dict[str, Any]:
+    with get_connection() as conn:
+        alcancadas = particoes.particoes_do_periodo(conn, data_inicial, data_final)
+    if alcancadas != [None]:
+        # Meses arquivados não estão no snapshot
+        return _dashboard_tabelas_brutas(provedor, data_inicial, data_final, produto, limite_ranking)
+    snapshot = obter_snapshot(provedor)
+    inicio, fim, valido = _limites_periodo(data_inicial, data_final)
+
+    pedidos = np.full(len(snapshot.pedido_ids), valido)
+    if inicio is not None:
+        pedidos &= snapshot.segundos >= inicio
+    if fim is not None:
+        pedidos &= snapshot.segundos < fim
+    itens = pedidos[snapshot.item_pedido]
+    if produto:
+        codigo = bisect_left(snapshot.produtos, produto)
+        if codigo < len(snapshot.produtos) and snapshot.produtos[codigo] == produto:
+            itens &= snapshot.item_produto == codigo
+        else:
+            itens[:] = False
+        # Com produto, só contam os pedidos que têm o produto (junção interna)
+        pedidos = np.zeros(len(snapshot.pedido_ids), bool)
+        pedidos[snapshot.item_pedido[itens]] = True
+
+    item_pedido = snapshot.item_pedido[itens]
+    receita = snapshot.receita[itens]
+    quantidade = snapshot.quantidade[itens]
+    total_pedidos = int(np.count_nonzero(pedidos))
+    faturamento = float(receita.sum())
+
+    # Dias contados a partir do primeiro dia com pedido selecionado
+    dias_presentes = np.unique(snapshot.dias[pedidos])
+    primeiro_dia = int(dias_presentes[0]) if len(dias_presentes) else 0
+    total_dias = int(dias_presentes[-1]) - primeiro_dia + 1 if len(dias_presentes) else 0
+    receita_dia = _somar(snapshot.dias[item_pedido] - primeiro_dia, receita, total_dias)
+    pedidos_hora = np.bincount(snapshot.horas[pedidos], minlength=24)
+    semanas_presentes = np.unique(snapshot.dias_semana[pedidos])
+    receita_semana = _somar(snapshot.dias_semana[item_pedido], receita, 7)
+
+    produtos_vendidos = np.bincount(snapshot.item_produto[itens], minlength=len(snapshot.produtos)) > 0
+    receita_produto = _somar(snapshot.item_produto[itens], receita, len(snapshot.produtos))
+    quantidade_produto = _somar(snapshot.item_produto[itens], quantidade, len(snapshot.produtos))
+    codigos = np.flatnonzero(produtos_vendidos)
+    # Estável sobre códigos em ordem alfabética: empates ficam em ordem alfabética
+    ranking_faturamento = codigos[np.argsort(-receita_produto[codigos], kind="stable")][:limite_ranking]
+    ranking_quantidade = codigos[np.argsort(-quantidade_produto[codigos], kind="stable")][:limite_ranking]
+
+    return {
+        "kpis": {
+            "faturamento_total": faturamento,
+            "total_pedidos": total_pedidos,
+            "total_itens_vendidos": float(quantidade.sum()),
+            "ticket_medio": faturamento / total_pedidos if total_pedidos else 0,
+        },
+        "graficos": {
+            "faturamento_por_dia": [
+                {"dia": str(np.datetime64(int(dia), "D")), "valor": float(receita_dia[dia - primeiro_dia])}
+                for dia in dias_presentes
+            ],
+            "pedidos_por_hora": [
+                {"hora": f"{hora:02d}", "pedidos": int(pedidos_hora[hora])} for hora in np.flatnonzero(pedidos_hora)
+            ],
+            "vendas_por_dia_semana": [
+                {
+                    "dia_semana": _NOMES_DIA_SEMANA[dia] if dia < 6 else "Sábado",
+                    "valor": float(receita_semana[dia]),
+                }
+                for dia in semanas_presentes
+            ],
+        },
+        "produtos": {
+            "ranking_faturamento": [
+                {"nome_item": snapshot.produtos[codigo], "valor": float(receita_produto[codigo])}
+                for codigo in ranking_faturamento
+            ],
+            "ranking_quantidade": [
+                {"nome_item": snapshot.produtos[codigo], "quantidade": float(quantidade_produto[codigo])}
+                for codigo in ranking_quantidade
+            ],
+        },
+    }
+
+
+def carregar_dashboard_99food_colunar(
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    todo_periodo: bool = False,
+) -> dict[str, Any]:
+    return carregar_dashboard_colunar(
+        PROVEDOR_99FOOD.slug, data_inicial, data_final, produto, todo_periodo=todo_periodo
+    )
+
+
+def _divergencias(esperado: Any, obtido: Any, caminho: str = "") -> list[str]:
+    if isinstance(esperado, dict) and isinstance(obtido, dict):
+        if esperado.keys() != obtido.keys():
+            return [caminho or "."]
+        return [d for chave in esperado for d in _divergencias(esperado[chave], obtido[chave], f"{caminho}.{chave}")]
+    if isinstance(esperado, list) and isinstance(obtido, list):
+        if len(esperado) != len(obtido):
+            return [caminho]
+        return [d for i, (a, b) in enumerate(zip(esperado, obtido)) for d in _divergencias(a, b, f"{caminho}[{i}]")]
+    numeros = (int, float)
+    if isinstance(esperado, numeros) and isinstance(obtido, numeros):
+        return [] if math.isclose(esperado, obtido, rel_tol=TOLERANCIA, abs_tol=TOLERANCIA) else [caminho]
+    return [] if esperado == obtido else [caminho]
+
+
+def verificar_colunar(
+    provedor: str,
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+) -> dict[str, Any]:
+    """Compara o dashboard colunar com o calculado das tabelas brutas, na loja atual.
+
+    Retorna os caminhos divergentes (ex.: '.produtos.ranking_faturamento[3].valor').
+    """
+    provedor = obter_provedor(provedor).slug
+    divergencias = _divergencias(
+        _dashboard_tabelas_brutas(provedor, data_inicial, data_final, produto),
+        _dashboard_colunar(provedor, data_inicial, data_final, produto),
+    )
+    return {"consistente": not divergencias, "divergencias": divergencias}
@@ -0,0 +1,191 @@
+"""Exportação dos dados de BI em CSV ou NDJSON, em streaming.
+
+As linhas saem de um cursor SQLite lido em lotes (`fetchmany`) e são serializadas
+lote a lote: a memória não cresce com o tamanho da exportação e o primeiro bloco
+sai antes de a consulta terminar. Os filtros são os mesmos do dashboard; pedidos e
+itens vêm das tabelas brutas, partição mensal a partição mensal (bi.particoes), e
+o resumo diário, dos rollups. Sem datas, como no dashboard, só os meses quentes.
+Cada exportação lê o shard de uma loja só.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from database import caminho_loja, get_connection
+
+from . import particoes
+from .provedores import obter_provedor
+from .service import _filtros_rollups, _filtros_tabelas_brutas
+
+# Linhas lidas do cursor (e serializadas) por vez
+TAMANHO_LOTE_EXPORTACAO = 2_000
+
+TIPOS_EXPORTACAO = ("pedidos", "itens", "resumo-diario")
+# Formato -> Content-Type
+FORMATOS_EXPORTACAO = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+_COLUNAS = {
+    "pedidos": ("pedido_id", "data_hora_pedido", "status", "tempo_preparo_min", "tempo_entrega_min"),
+    "itens": ("pedido_id", "data_hora_pedido", "nome_item", "quantidade_vendida", "receita_item", "preco_medio"),
+    "resumo-diario": ("dia", "pedidos", "itens_vendidos", "faturamento", "ticket_medio"),
+}
+
+
+def _consulta(
+    provedor: str,
+    tipo: str,
+    data_inicial: str | None,
+    data_final: str | None,
+    produto: str | None,
+    esquema: str = particoes.ESQUEMA_QUENTE,
+) -> tuple[str, list[Any]]:
+    """SQL e parâmetros da exportação na partição `esquema`.
+
+    Pedidos e itens seguem a ordem do índice (provedor, dia, hora, epoch), que é a
+    ordem cronológica, então o SQLite entrega as linhas sem ordenar o resultado
+    inteiro antes.
+    """
+    if tipo == "resumo-diario":
+        tabela, where, parametros = _filtros_rollups(provedor, data_inicial, data_final, produto)
+        return (
+            f"""
+            SELECT
+                dia,
+                SUM(pedidos) AS pedidos,
+                SUM(quantidade) AS itens_vendidos,
+                ROUND(SUM(receita), 2) AS faturamento,
+                CASE WHEN SUM(pedidos) = 0 THEN 0 ELSE ROUND(SUM(receita) / SUM(pedidos), 2) END AS ticket_medio
+            FROM {tabela}
+            WHERE {where}
+            GROUP BY dia
+            ORDER BY dia
+            """,
+            parametros,
+        )
+
+    if tipo == "itens":
+        # CROSS JOIN fixa bi_pedidos no laço externo: sem ele o planejador pode começar
+        # por bi_itens e ordenar tudo numa B-tree temporária antes da primeira linha
+        where, parametros = _filtros_tabelas_brutas(provedor, data_inicial, data_final, produto)
+        return (
+            f"""
+            SELECT p.pedido_id, p.data_hora_pedido, i.nome_item, i.quantidade_vendida, i.receita_item, i.preco_medio
+            FROM {esquema}.bi_pedidos p
+            CROSS JOIN {esquema}.bi_itens i ON i.provedor = p.provedor AND i.pedido_id = p.pedido_id
+            WHERE {where}
+            ORDER BY p.dia, p.hora, p.epoch, p.id, i.nome_item
+            """,
+            parametros,
+        )
+
+    # Pedidos com o produto: EXISTS em vez de junção, para não repetir o pedido
+    where, parametros = _filtros_tabelas_brutas(provedor, data_inicial, data_final, None)
+    if produto:
+        where += (
+            f" AND EXISTS (SELECT 1 FROM {esquema}.bi_itens i"
+            " WHERE i.provedor = p.provedor AND i.pedido_id = p.pedido_id AND i.nome_item = ?)"
+        )
+        parametros.append(produto)
+    return (
+        f"""
+        SELECT p.pedido_id, p.data_hora_pedido, p.status, p.tempo_preparo_min, p.tempo_entrega_min
+        FROM {esquema}.bi_pedidos p
+        WHERE {where}
+        ORDER BY p.dia, p.hora, p.epoch, p.id
+        """,
+        parametros,
+    )
+
+
+def _lotes(
+    provedor: str,
+    tipo: str,
+    data_inicial: str | None,
+    data_final: str | None,
+    produto: str | None,
+    todo_periodo: bool,
+    banco: Path,
+) -> Iterator[list[Any]]:
+    # As consultas só rodam na primeira iteração, depois do cabeçalho já ter saído.
+    # As partições vêm em ordem cronológica, então a saída continua em ordem.
+    conn = get_connection(banco)
+    data_inicial, data_final = particoes.periodo_efetivo(conn, data_inicial, data_final, todo_periodo)
+    alcancadas = [None] if tipo == "resumo-diario" else particoes.particoes_do_periodo(conn, data_inicial, data_final)
+    for particao in alcancadas:
+        with particoes.anexar(conn, particao) as esquema:
+            cursor = conn.execute(*_consulta(provedor, tipo, data_inicial, data_final, produto, esquema))
+            try:
+                while lote := cursor.fetchmany(TAMANHO_LOTE_EXPORTACAO):
+                    yield lote
+            finally:
+                cursor.close()
+
+
+def _csv(colunas: Sequence[str], lotes: Iterable[list[Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(colunas)
+    yield buffer.getvalue().encode()
+    for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(colunas: Sequence[str], lotes: Iterable[list[Any]]) -> Iterator[bytes]:
+    for lote in lotes:
+        yield "".join(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n" for linha in lote).encode()
+
+
+def exportar(
+    provedor: str,
+    tipo: str,
+    formato: str = "csv",
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    loja: str | None = None,
+    todo_periodo: bool = False,
+) -> Iterator[bytes]:
+    """Blocos de bytes da exportação de `tipo` ('pedidos', 'itens' ou 'resumo-diario').
+
+    Provedor, tipo, formato e loja (padrão: a loja atual) são validados na chamada
+    (ValueError); a consulta só roda quando o iterador é consumido, na thread que o
+    consome, no shard da loja escolhida aqui. Período padrão como no dashboard.
+    """
+    provedor = obter_provedor(provedor).slug
+    banco = caminho_loja(loja)
+    if tipo not in TIPOS_EXPORTACAO:
+        raise ValueError(f"Exportação desconhecida: '{tipo}'. Use: {', '.join(TIPOS_EXPORTACAO)}.")
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação inválido: '{formato}'. Use: {', '.join(FORMATOS_EXPORTACAO)}.")
+
+    serializar = _csv if formato == "csv" else _ndjson
+    return serializar(
+        _COLUNAS[tipo], _lotes(provedor, tipo, data_inicial, data_final, produto, todo_periodo, banco)
+    )
+
+
+def comprimir_gzip(blocos: Iterable[bytes], nivel: int = 6) -> Iterator[bytes]:
+    """Comprime os blocos em gzip sem juntá-los; o primeiro sai logo (sync flush)."""
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    primeiro = True
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if primeiro:
+            comprimido += compressor.flush(zlib.Z_SYNC_FLUSH)
+            primeiro = False
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
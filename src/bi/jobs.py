@@ -0,0 +1,349 @@
+"""Fila de importação em segundo plano para os relatórios de BI.
+
+O upload grava os arquivos em disco, registra um job e retorna imediatamente.
+Um pool de threads processa os arquivos; o estado fica no SQLite (JOBS_DB_PATH),
+então jobs interrompidos por um restart são retomados em `iniciar_fila_importacao`.
+Cada arquivo é apagado do disco quando termina ('concluido' ou 'erro').
+
+Arquivos do mesmo tipo (pedidos ou itens) rodam em sequência, na ordem do upload,
+para que o último arquivo prevaleça no upsert. Grupos de tipos diferentes rodam
+em paralelo; a gravação em cada shard continua serializada pelo SQLite. Cada job
+importa para uma loja, e o worker roteia as conexões para o shard dela.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import database
+from database import LOJA_PADRAO, caminho_loja, conexao_escrita, get_connection, usar_loja
+
+from .provedores import PROVEDOR_99FOOD, obter_provedor
+from .service import gravar_upload, identificar_tipo_arquivo, importar_arquivo
+
+WORKERS_PADRAO = 2
+# Constantes da API do Windows usadas em `_processo_ativo_windows`
+_PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+_ERROR_ACCESS_DENIED = 5
+_STILL_ACTIVE = 259
+
+_executor: ThreadPoolExecutor | None = None
+_trava_executor = threading.Lock()
+
+
+def _conexao_jobs():
+    return get_connection(database.JOBS_DB_PATH)
+
+
+def _escrita_jobs():
+    return conexao_escrita(database.JOBS_DB_PATH)
+
+
+def _processo_ativo(pid: int | None) -> bool:
+    if not pid or pid == os.getpid():
+        return False
+    if os.name == "nt":
+        return _processo_ativo_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _processo_ativo_windows(pid: int) -> bool:
+    # No Windows o sinal 0 é CTRL_C_EVENT: a consulta é pela API do processo
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.GetExitCodeProcess.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD))
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    processo = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not processo:
+        # Acesso negado: o processo existe, mas é de outro usuário
+        return ctypes.get_last_error() == _ERROR_ACCESS_DENIED
+    try:
+        codigo = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(processo, ctypes.byref(codigo)):
+            return True
+        return codigo.value == _STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(processo)
+
+
+def iniciar_fila_importacao(workers: int | None = None) -> None:
+    """Cria o pool de workers e retoma jobs que ficaram pendentes.
+
+    O número de workers vem do parâmetro, da variável BI_IMPORT_WORKERS ou de WORKERS_PADRAO.
+    """
+    _obter_executor(workers)
+    retomar_jobs_pendentes()
+
+
+def _obter_executor(workers: int | None = None) -> ThreadPoolExecutor:
+    global _executor
+    with _trava_executor:
+        if _executor is None:
+            total = workers or int(os.environ.get("BI_IMPORT_WORKERS", WORKERS_PADRAO))
+            _executor = ThreadPoolExecutor(max_workers=max(total, 1), thread_name_prefix="bi-import")
+        return _executor
+
+
+def _submeter(funcao, *args) -> None:
+    _obter_executor().submit(funcao, *args)
+
+
+def retomar_jobs_pendentes() -> int:
+    """Reenfileira arquivos pendentes ou abandonados por um processo que morreu."""
+    with _escrita_jobs() as conn:
+        orfaos = conn.execute(
+            "SELECT id, pid FROM bi_import_job_arquivos WHERE status = 'processando'"
+        ).fetchall()
+        for arquivo in orfaos:
+            if not _processo_ativo(arquivo["pid"]):
+                conn.execute(
+                    "UPDATE bi_import_job_arquivos SET status = 'pendente', pid = NULL, linhas = 0 WHERE id = ?",
+                    (arquivo["id"],),
+                )
+        jobs = conn.execute(
+            "SELECT DISTINCT job_id FROM bi_import_job_arquivos WHERE status = 'pendente'"
+        ).fetchall()
+
+    for job in jobs:
+        _submeter(_planejar_job, job["job_id"])
+    return len(jobs)
+
+
+def enfileirar_importacao(
+    provedor: str, arquivos: list[tuple[str, bytes | BinaryIO]], loja: str = LOJA_PADRAO
+) -> str:
+    """Grava os uploads em disco, registra o job do provedor na loja e retorna seu ID."""
+    provedor = obter_provedor(provedor).slug
+    caminho_loja(loja)
+    if not arquivos:
+        raise ValueError("Nenhum arquivo foi enviado.")
+
+    job_id = uuid.uuid4().hex
+    # A posição no upload entra no nome: dois arquivos com o mesmo nome não se sobrescrevem
+    caminhos = [
+        (nome, gravar_upload(provedor, f"{posicao:03d}-{Path(nome).name}", conteudo, subpasta=job_id))
+        for posicao, (nome, conteudo) in enumerate(arquivos, start=1)
+    ]
+
+    with _escrita_jobs() as conn:
+        conn.execute(
+            "INSERT INTO bi_import_jobs (id, provedor, loja) VALUES (?, ?, ?)",
+            (job_id, provedor, loja),
+        )
+        conn.executemany(
+            "INSERT INTO bi_import_job_arquivos (job_id, nome, caminho) VALUES (?, ?, ?)",
+            [(job_id, nome, str(caminho)) for nome, caminho in caminhos],
+        )
+
+    _submeter(_planejar_job, job_id)
+    return job_id
+
+
+def enfileirar_importacao_99food(arquivos: list[tuple[str, bytes | BinaryIO]]) -> str:
+    return enfileirar_importacao(PROVEDOR_99FOOD.slug, arquivos)
+
+
+def _apagar_upload(caminho: Path) -> None:
+    """Apaga o arquivo de um upload já finalizado e a pasta do job, se ficou vazia.
+
+    O arquivo só serve para retomar o job; depois de 'concluido' ou 'erro', não volta a ser lido.
+    """
+    try:
+        caminho.unlink(missing_ok=True)
+        caminho.parent.rmdir()
+    except OSError:
+        # Pasta com outros arquivos do job (ou arquivo ainda aberto no Windows)
+        pass
+
+
+def _marcar_erro(arquivo_id: int, mensagem: str, caminho: Path) -> None:
+    with _escrita_jobs() as conn:
+        conn.execute(
+            """
+            UPDATE bi_import_job_arquivos
+            SET status = 'erro', mensagem = ?, finalizado_em = ?
+            WHERE id = ?
+            """,
+            (mensagem, time.time(), arquivo_id),
+        )
+    _apagar_upload(caminho)
+
+
+def _planejar_job(job_id: str) -> None:
+    """Identifica o tipo de cada arquivo pendente (só pelo cabeçalho) e dispara um grupo por tipo."""
+    with _conexao_jobs() as conn:
+        provedor = conn.execute("SELECT provedor FROM bi_import_jobs WHERE id = ?", (job_id,)).fetchone()["provedor"]
+        arquivos = conn.execute(
+            """
+            SELECT id, caminho, tipo
+            FROM bi_import_job_arquivos
+            WHERE job_id = ? AND status = 'pendente'
+            ORDER BY id
+            """,
+            (job_id,),
+        ).fetchall()
+
+    grupos: dict[str, list[int]] = {}
+    for arquivo in arquivos:
+        tipo = arquivo["tipo"]
+        if tipo is None:
+            try:
+                tipo = identificar_tipo_arquivo(Path(arquivo["caminho"]), provedor)
+            except Exception as exc:
+                _marcar_erro(arquivo["id"], str(exc), Path(arquivo["caminho"]))
+                continue
+            with _escrita_jobs() as conn:
+                conn.execute("UPDATE bi_import_job_arquivos SET tipo = ? WHERE id = ?", (tipo, arquivo["id"]))
+        grupos.setdefault(tipo, []).append(arquivo["id"])
+
+    # Submete sem aguardar: esperar aqui poderia travar o pool se todos os
+    # workers estivessem ocupados planejando jobs
+    for arquivo_ids in grupos.values():
+        _submeter(_processar_grupo, arquivo_ids)
+
+
+def _processar_grupo(arquivo_ids: list[int]) -> None:
+    for arquivo_id in arquivo_ids:
+        _processar_arquivo(arquivo_id)
+
+
+def _processar_arquivo(arquivo_id: int) -> None:
+    with _escrita_jobs() as conn:
+        # Reivindica o arquivo; outro processo que também o tenha enfileirado desiste
+        reivindicado = conn.execute(
+            """
+            UPDATE bi_import_job_arquivos
+            SET status = 'processando', pid = ?, iniciado_em = ?, linhas = 0
+            WHERE id = ? AND status = 'pendente'
+            """,
+            (os.getpid(), time.time(), arquivo_id),
+        ).rowcount
+        if not reivindicado:
+            return
+        arquivo = conn.execute(
+            """
+            SELECT a.nome, a.caminho, j.provedor, j.loja
+            FROM bi_import_job_arquivos a
+            JOIN bi_import_jobs j ON j.id = a.job_id
+            WHERE a.id = ?
+            """,
+            (arquivo_id,),
+        ).fetchone()
+
+    def progresso(linhas: int) -> None:
+        with _escrita_jobs() as conn:
+            conn.execute("UPDATE bi_import_job_arquivos SET linhas = ? WHERE id = ?", (linhas, arquivo_id))
+
+    caminho = Path(arquivo["caminho"])
+    try:
+        with usar_loja(arquivo["loja"]):
+            resumo = importar_arquivo(caminho, arquivo["nome"], arquivo["provedor"], progresso)
+    except Exception as exc:
+        _marcar_erro(arquivo_id, str(exc), caminho)
+        return
+
+    with _escrita_jobs() as conn:
+        conn.execute(
+            """
+            UPDATE bi_import_job_arquivos
+            SET status = 'concluido', tipo = ?, linhas = ?, linhas_rejeitadas = ?, erros = ?, mensagem = ?,
+                finalizado_em = ?
+            WHERE id = ?
+            """,
+            (
+                resumo["tipo"],
+                resumo["linhas"],
+                resumo["linhas_rejeitadas"],
+                json.dumps(resumo["erros"], ensure_ascii=False, default=str),
+                resumo.get("mensagem"),
+                time.time(),
+                arquivo_id,
+            ),
+        )
+    _apagar_upload(caminho)
+
+
+def _linhas_por_segundo(linhas: int, inicio: float | None, fim: float | None) -> float:
+    if not inicio:
+        return 0.0
+    duracao = (fim or time.time()) - inicio
+    return round(linhas / duracao, 1) if duracao > 0 else 0.0
+
+
+def _status_job(status_arquivos: list[str]) -> str:
+    if all(status == "pendente" for status in status_arquivos):
+        return "pendente"
+    if any(status in ("pendente", "processando") for status in status_arquivos):
+        return "processando"
+    if all(status == "erro" for status in status_arquivos):
+        return "erro"
+    if any(status == "erro" for status in status_arquivos):
+        return "concluido_com_erros"
+    return "concluido"
+
+
+def consultar_job(job_id: str) -> dict[str, Any] | None:
+    """Retorna estado, linhas processadas, linhas/s e erros por arquivo do job."""
+    with _conexao_jobs() as conn:
+        job = conn.execute(
+            "SELECT id, provedor, loja, criado_em FROM bi_import_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if job is None:
+            return None
+        arquivos = conn.execute(
+            """
+            SELECT nome, tipo, status, linhas, linhas_rejeitadas, erros, mensagem, iniciado_em, finalizado_em
+            FROM bi_import_job_arquivos
+            WHERE job_id = ?
+            ORDER BY id
+            """,
+            (job_id,),
+        ).fetchall()
+
+    linhas = sum(arquivo["linhas"] for arquivo in arquivos)
+    inicios = [arquivo["iniciado_em"] for arquivo in arquivos if arquivo["iniciado_em"]]
+    status = _status_job([arquivo["status"] for arquivo in arquivos])
+    fim = None
+    if status not in ("pendente", "processando"):
+        fim = max((arquivo["finalizado_em"] or 0 for arquivo in arquivos), default=None)
+
+    return {
+        **dict(job),
+        "status": status,
+        "linhas_processadas": linhas,
+        "linhas_por_segundo": _linhas_por_segundo(linhas, min(inicios, default=None), fim),
+        "arquivos": [
+            {
+                "nome": arquivo["nome"],
+                "tipo": arquivo["tipo"],
+                "status": arquivo["status"],
+                "linhas": arquivo["linhas"],
+                "linhas_rejeitadas": arquivo["linhas_rejeitadas"],
+                "linhas_por_segundo": _linhas_por_segundo(
+                    arquivo["linhas"], arquivo["iniciado_em"], arquivo["finalizado_em"]
+                ),
+                "erros": json.loads(arquivo["erros"]),
+                "mensagem": arquivo["mensagem"],
+            }
+            for arquivo in arquivos
+        ],
+    }
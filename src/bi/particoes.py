@@ -0,0 +1,447 @@
+"""Partições mensais das tabelas de fatos do BI (bi_pedidos e bi_itens).
+
+Os meses recentes ("quentes") ficam nas tabelas do shard da loja. Um mês fechado
+pode ser arquivado: seus pedidos e itens vão para um arquivo SQLite próprio, ao
+lado do shard (`<shard>.arquivo/<AAAA-MM>-<sufixo>.db`), com as mesmas tabelas e
+índices, compactado (VACUUM) e somente leitura. O catálogo fica em bi_particoes.
+
+As consultas sobre as tabelas brutas percorrem só as partições que o período
+alcança (`particoes_do_periodo`), anexando cada mês arquivado com
+`mode=ro&immutable=1` enquanto é lido. Sem datas, o dashboard fica nos meses
+quentes (`periodo_efetivo`); o histórico inteiro é pedido com `todo_periodo`.
+
+Os meses arquivados são sempre os mais antigos: arquiva-se do mais antigo para o
+mais novo e restaura-se na ordem inversa, então o período quente começa no dia 1
+do mês seguinte ao último arquivado (`inicio_quente`). Os rollups cobrem todo o
+histórico e não mudam com o arquivamento; a importação recusa pedidos de meses
+arquivados e itens de pedidos arquivados (`meses_dos_pedidos_arquivados`).
+Migrações que reconstroem bi_pedidos ou bi_itens precisam tratar também os
+arquivos.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import uuid
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+from database import (
+    _colunas,
+    conexao_escrita,
+    get_connection,
+    incrementar_versao_dados,
+    init_db,
+    listar_lojas,
+    usar_loja,
+)
+
+from .provedores import listar_provedores
+
+# Padrão do arquivamento: o mês atual e os 2 anteriores continuam quentes
+MESES_QUENTES = 3
+
+ESQUEMA_QUENTE = "main"
+_RE_MES = re.compile(r"\d{4}-(0[1-9]|1[0-2])")
+_RE_DATA = re.compile(r"\d{4}-\d{2}-\d{2}")
+_PEDIDOS_POR_CONSULTA = 500
+
+_log = logging.getLogger("bi.particoes")
+
+
+@dataclass(frozen=True)
+class Particao:
+    """Mês arquivado: nome do arquivo (na pasta de arquivo do shard) e linhas movidas."""
+
+    mes: str
+    arquivo: str
+    pedidos: int
+    itens: int
+
+    @property
+    def esquema(self) -> str:
+        # O sufixo único do arquivo entra no nome: um mês rearquivado não reaproveita um anexo antigo
+        return "arquivo_" + Path(self.arquivo).stem.replace("-", "_")
+
+
+def _deslocar_mes(mes: str, meses: int) -> str:
+    ano, numero = map(int, mes.split("-"))
+    total = ano * 12 + numero - 1 + meses
+    return f"{total // 12:04d}-{total % 12 + 1:02d}"
+
+
+def _validar_mes(mes: str) -> str:
+    if not _RE_MES.fullmatch(mes):
+        raise ValueError(f"Mês inválido: '{mes}'. Use AAAA-MM.")
+    return mes
+
+
+def pasta_arquivo(conn: sqlite3.Connection) -> Path:
+    """Pasta dos meses arquivados do shard da conexão (ao lado do arquivo do shard)."""
+    caminho = next(Path(linha[2]) for linha in conn.execute("PRAGMA database_list") if linha[1] == "main")
+    return caminho.with_name(f"{caminho.stem}.arquivo")
+
+
+def listar_particoes(conn: sqlite3.Connection) -> list[Particao]:
+    """Meses arquivados do shard, do mais antigo para o mais novo."""
+    linhas = conn.execute("SELECT mes, arquivo, pedidos, itens FROM bi_particoes ORDER BY mes").fetchall()
+    return [Particao(*linha) for linha in linhas]
+
+
+def inicio_quente(conn: sqlite3.Connection) -> str | None:
+    """Primeiro dia do período quente ('AAAA-MM-01'); None se nenhum mês foi arquivado."""
+    ultimo = conn.execute("SELECT MAX(mes) FROM bi_particoes").fetchone()[0]
+    return f"{_deslocar_mes(ultimo, 1)}-01" if ultimo else None
+
+
+def periodo_efetivo(
+    conn: sqlite3.Connection, data_inicial: str | None, data_final: str | None, todo_periodo: bool = False
+) -> tuple[str | None, str | None]:
+    """Período consultado: sem datas nem `todo_periodo`, começa no período quente."""
+    if data_inicial or data_final or todo_periodo:
+        return data_inicial, data_final
+    return inicio_quente(conn), data_final
+
+
+def particoes_do_periodo(
+    conn: sqlite3.Connection, data_inicial: str | None, data_final: str | None
+) -> list[Particao | None]:
+    """Partições que o período alcança, em ordem cronológica; None é a quente (o próprio shard).
+
+    Datas fora do formato AAAA-MM-DD não podam nada: o filtro do SQL decide.
+    """
+    inicial = data_inicial if data_inicial and _RE_DATA.fullmatch(data_inicial) else None
+    final = data_final if data_final and _RE_DATA.fullmatch(data_final) else None
+    alcancadas: list[Particao | None] = [
+        particao
+        for particao in listar_particoes(conn)
+        if not (inicial and f"{particao.mes}-31" < inicial) and not (final and f"{particao.mes}-01" > final)
+    ]
+    inicio = inicio_quente(conn)
+    if not (inicio and final and final < inicio):
+        alcancadas.append(None)
+    return alcancadas
+
+
+def meses_dos_pedidos_arquivados(
+    conn: sqlite3.Connection, provedor: str, pedido_ids: Iterable[str]
+) -> dict[str, str]:
+    """Mês arquivado ('AAAA-MM') de cada pedido de `pedido_ids` que está num arquivo do shard.
+
+    Só os pedidos ausentes das tabelas quentes são procurados, e em conexões
+    próprias (somente leitura): a conexão pode estar no meio de uma transação,
+    onde não se anexa banco.
+    """
+    particoes = listar_particoes(conn)
+    if not particoes:
+        return {}
+    ids = list(dict.fromkeys(pedido_ids))
+    quentes = set(_pedidos_existentes(conn, provedor, ids))
+    procurados = [pedido_id for pedido_id in ids if pedido_id not in quentes]
+    meses: dict[str, str] = {}
+    pasta = pasta_arquivo(conn)
+    for particao in reversed(particoes):
+        if not procurados:
+            break
+        caminho = (pasta / particao.arquivo).resolve().as_uri()
+        arquivo = sqlite3.connect(f"{caminho}?mode=ro&immutable=1", uri=True)
+        try:
+            encontrados = set(_pedidos_existentes(arquivo, provedor, procurados))
+        finally:
+            arquivo.close()
+        meses.update(dict.fromkeys(encontrados, particao.mes))
+        procurados = [pedido_id for pedido_id in procurados if pedido_id not in encontrados]
+    return meses
+
+
+def _pedidos_existentes(conn: sqlite3.Connection, provedor: str, pedido_ids: list[str]) -> Iterator[str]:
+    # Em fatias, abaixo do limite de parâmetros por consulta do SQLite
+    for inicio in range(0, len(pedido_ids), _PEDIDOS_POR_CONSULTA):
+        fatia = pedido_ids[inicio : inicio + _PEDIDOS_POR_CONSULTA]
+        marcadores = ", ".join("?" for _ in fatia)
+        for (pedido_id,) in conn.execute(
+            f"SELECT pedido_id FROM bi_pedidos WHERE provedor = ? AND pedido_id IN ({marcadores})",
+            (provedor, *fatia),
+        ):
+            yield pedido_id
+
+
+@contextmanager
+def anexar(conn: sqlite3.Connection, particao: Particao | None) -> Iterator[str]:
+    """Nome do esquema da partição na conexão; um mês arquivado fica anexado só dentro do bloco."""
+    if particao is None:
+        yield ESQUEMA_QUENTE
+        return
+    caminho = pasta_arquivo(conn) / particao.arquivo
+    conn.execute(f"ATTACH DATABASE ? AS {particao.esquema}", (f"{caminho.resolve().as_uri()}?mode=ro&immutable=1",))
+    try:
+        yield particao.esquema
+    finally:
+        conn.execute(f"DETACH DATABASE {particao.esquema}")
+
+
+def _criar_arquivo(conn: sqlite3.Connection, caminho: Path) -> None:
+    """Arquivo vazio com as tabelas de fatos e os índices do shard (DDL lido de sqlite_master)."""
+    ddls = [
+        linha[0]
+        for linha in conn.execute(
+            """
+            SELECT sql FROM sqlite_master
+            WHERE tbl_name IN ('bi_pedidos', 'bi_itens') AND sql IS NOT NULL
+            ORDER BY type = 'index', name
+            """
+        )
+    ]
+    caminho.unlink(missing_ok=True)
+    destino = sqlite3.connect(caminho)
+    try:
+        for ddl in ddls:
+            destino.execute(ddl)
+        destino.commit()
+    finally:
+        destino.close()
+
+
+def _compactar(caminho: Path) -> None:
+    """VACUUM e estatísticas do planejador; depois o arquivo fica somente leitura."""
+    destino = sqlite3.connect(caminho, isolation_level=None)
+    try:
+        destino.execute("ANALYZE")
+        destino.execute("VACUUM")
+    finally:
+        destino.close()
+    os.chmod(caminho, 0o444)
+
+
+def _compactar_quente(conn: sqlite3.Connection) -> None:
+    """VACUUM do shard depois de tirar um mês: devolve ao disco as páginas liberadas.
+
+    Reescreve o shard inteiro com a conexão de escrita presa: num shard grande,
+    importações de outros processos podem esgotar o SQLITE_BUSY_TIMEOUT_MS. Por
+    isso só roda quando pedido (`--compactar`), numa janela sem importações. O
+    checkpoint em seguida encolhe o WAL de volta.
+    """
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def _filtro_mes() -> str:
+    # provedor na frente para o índice (provedor, dia, hora, epoch)
+    marcadores = ", ".join("?" for _ in listar_provedores())
+    return f"provedor IN ({marcadores}) AND dia >= ? AND dia < ?"
+
+
+def _parametros_mes(mes: str) -> list[str]:
+    return [*(provedor.slug for provedor in listar_provedores()), f"{mes}-01", f"{_deslocar_mes(mes, 1)}-01"]
+
+
+def _incrementar_versoes(conn: sqlite3.Connection) -> None:
+    # O período quente muda para todos os provedores: invalida cache, ETag e snapshots colunares
+    for provedor in listar_provedores():
+        incrementar_versao_dados(conn, provedor.slug)
+
+
+def arquivar_mes(mes: str, hoje: date | None = None, compactar: bool = False) -> Particao:
+    """Move os pedidos e itens de um mês fechado do shard da loja atual para um arquivo próprio.
+
+    Só o mês quente mais antigo pode ser arquivado. A conexão de escrita fica
+    presa do início ao fim, então nenhuma importação grava no meio da cópia. O
+    arquivo é copiado, compactado e renomeado antes de as linhas saírem das
+    tabelas quentes; se o processo parar antes, o mês continua quente. Sem
+    `compactar`, as páginas liberadas no shard são reaproveitadas pelas próximas
+    importações; com ele, o shard passa por VACUUM no fim e encolhe de fato.
+    """
+    _validar_mes(mes)
+    if mes >= (hoje or date.today()).strftime("%Y-%m"):
+        raise ValueError(f"O mês {mes} ainda não fechou.")
+    filtro, parametros = _filtro_mes(), _parametros_mes(mes)
+
+    with conexao_escrita() as conn:
+        inicio = inicio_quente(conn)
+        if inicio and mes < inicio[:7]:
+            raise ValueError(f"O mês {mes} já está arquivado.")
+        mais_antigo = conn.execute("SELECT MIN(dia) FROM bi_pedidos").fetchone()[0]
+        if mais_antigo is None or mais_antigo >= f"{_deslocar_mes(mes, 1)}-01":
+            raise ValueError(f"Nenhum pedido em {mes}.")
+        if mais_antigo < f"{mes}-01":
+            raise ValueError(f"Arquive os meses em ordem: {mais_antigo[:7]} ainda está nas tabelas quentes.")
+
+        pasta = pasta_arquivo(conn)
+        pasta.mkdir(parents=True, exist_ok=True)
+        arquivo = f"{mes}-{uuid.uuid4().hex[:8]}.db"
+        temporario = pasta / f"{arquivo}.tmp"
+        _criar_arquivo(conn, temporario)
+
+        colunas_pedidos = ", ".join(_colunas(conn, "bi_pedidos"))
+        colunas_itens = _colunas(conn, "bi_itens")
+        conn.execute("ATTACH DATABASE ? AS arquivo_novo", (str(temporario),))
+        try:
+            pedidos = conn.execute(
+                f"""
+                INSERT INTO arquivo_novo.bi_pedidos ({colunas_pedidos})
+                SELECT {colunas_pedidos} FROM main.bi_pedidos WHERE {filtro} ORDER BY id
+                """,
+                parametros,
+            ).rowcount
+            itens = conn.execute(
+                f"""
+                INSERT INTO arquivo_novo.bi_itens ({", ".join(colunas_itens)})
+                SELECT {", ".join(f"i.{coluna}" for coluna in colunas_itens)}
+                FROM arquivo_novo.bi_pedidos p
+                JOIN main.bi_itens i ON i.provedor = p.provedor AND i.pedido_id = p.pedido_id
+                ORDER BY i.id
+                """
+            ).rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE arquivo_novo")
+        _compactar(temporario)
+        os.replace(temporario, pasta / arquivo)
+
+        conn.execute(
+            f"""
+            DELETE FROM bi_itens
+            WHERE (provedor, pedido_id) IN (SELECT provedor, pedido_id FROM bi_pedidos WHERE {filtro})
+            """,
+            parametros,
+        )
+        conn.execute(f"DELETE FROM bi_pedidos WHERE {filtro}", parametros)
+        conn.execute(
+            "INSERT INTO bi_particoes (mes, arquivo, pedidos, itens) VALUES (?, ?, ?, ?)",
+            (mes, arquivo, pedidos, itens),
+        )
+        _incrementar_versoes(conn)
+        if compactar:
+            _compactar_quente(conn)
+    return Particao(mes, arquivo, pedidos, itens)
+
+
+def arquivar_meses_fechados(
+    meses_quentes: int = MESES_QUENTES, hoje: date | None = None, compactar: bool = False
+) -> list[Particao]:
+    """Arquiva, do mais antigo para o mais novo, os meses anteriores aos `meses_quentes` mais recentes.
+
+    Com `compactar`, o shard passa por um VACUUM só, depois do último mês.
+    """
+    if meses_quentes < 1:
+        raise ValueError("meses_quentes deve ser pelo menos 1.")
+    limite = _deslocar_mes((hoje or date.today()).strftime("%Y-%m"), 1 - meses_quentes)
+    with get_connection() as conn:
+        meses = [
+            linha[0]
+            for linha in conn.execute(
+                "SELECT DISTINCT substr(dia, 1, 7) FROM bi_pedidos WHERE dia < ? ORDER BY 1", (f"{limite}-01",)
+            )
+        ]
+    arquivados = [arquivar_mes(mes, hoje) for mes in meses]
+    if arquivados and compactar:
+        with conexao_escrita() as conn:
+            _compactar_quente(conn)
+    return arquivados
+
+
+def restaurar_mes(mes: str) -> Particao:
+    """Devolve às tabelas quentes o último mês arquivado do shard da loja atual e apaga o arquivo.
+
+    Se o arquivo não puder ser apagado depois do commit (ainda aberto por uma
+    leitura no Windows, por exemplo), a restauração vale do mesmo jeito: o
+    arquivo, já fora do catálogo, só fica registrado no log para ser removido.
+    """
+    _validar_mes(mes)
+    with conexao_escrita() as conn:
+        particoes = listar_particoes(conn)
+        if mes not in {particao.mes for particao in particoes}:
+            raise ValueError(f"O mês {mes} não está arquivado.")
+        particao = particoes[-1]
+        if particao.mes != mes:
+            raise ValueError(f"Restaure os meses em ordem: {particao.mes} foi o último arquivado.")
+
+        with anexar(conn, particao) as esquema:
+            try:
+                for tabela in ("bi_pedidos", "bi_itens"):
+                    colunas = ", ".join(_colunas(conn, tabela))
+                    conn.execute(
+                        f"INSERT OR IGNORE INTO main.{tabela} ({colunas}) SELECT {colunas} FROM {esquema}.{tabela}"
+                    )
+                conn.execute("DELETE FROM bi_particoes WHERE mes = ?", (mes,))
+                _incrementar_versoes(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        _apagar_arquivo(pasta_arquivo(conn) / particao.arquivo)
+    return particao
+
+
+def _apagar_arquivo(caminho: Path) -> None:
+    try:
+        # Somente leitura desde `_compactar`; no Windows, apagar exige a permissão de escrita
+        os.chmod(caminho, 0o644)
+        caminho.unlink()
+    except OSError as exc:
+        _log.warning("Arquivo de partição restaurada não foi apagado (%s): %s", caminho, exc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Arquivamento mensal do histórico do BI.")
+    parser.add_argument("comando", choices=["listar", "arquivar", "restaurar"])
+    parser.add_argument("mes", nargs="?", help="AAAA-MM (arquivar: padrão, todos os meses fechados fora do período quente)")
+    parser.add_argument("--meses-quentes", type=int, default=MESES_QUENTES)
+    parser.add_argument("--loja", help="só esta loja (padrão: todas)")
+    parser.add_argument(
+        "--compactar",
+        action="store_true",
+        help="arquivar: VACUUM do shard no fim (trava as importações enquanto roda)",
+    )
+    args = parser.parse_args()
+    if args.comando == "restaurar" and not args.mes:
+        parser.error("restaurar exige o mês (AAAA-MM).")
+
+    init_db()
+    falhou = False
+    for loja in [args.loja] if args.loja else listar_lojas():
+        with usar_loja(loja):
+            try:
+                _executar(args.comando, loja, args.mes, args.meses_quentes, args.compactar)
+            except ValueError as exc:
+                print(f"{loja}: {exc}")
+                falhou = True
+    if falhou:
+        raise SystemExit(1)
+
+
+def _executar(comando: str, loja: str, mes: str | None, meses_quentes: int, compactar: bool) -> None:
+    if comando == "listar":
+        with get_connection() as conn:
+            particoes = listar_particoes(conn)
+            inicio = inicio_quente(conn)
+        for particao in particoes:
+            print(f"{loja}: {particao.mes} {particao.pedidos} pedidos, {particao.itens} itens ({particao.arquivo})")
+        print(f"{loja}: período quente desde {inicio or 'o início'}")
+    elif comando == "arquivar":
+        if mes:
+            arquivados = [arquivar_mes(mes, compactar=compactar)]
+        else:
+            arquivados = arquivar_meses_fechados(meses_quentes, compactar=compactar)
+        for particao in arquivados:
+            print(f"{loja}: {particao.mes} arquivado ({particao.pedidos} pedidos, {particao.itens} itens)")
+        if not arquivados:
+            print(f"{loja}: nenhum mês a arquivar.")
+    else:
+        particao = restaurar_mes(mes)
+        print(f"{loja}: {particao.mes} restaurado ({particao.pedidos} pedidos, {particao.itens} itens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Dimensão de produtos do BI (tabela bi_produtos).
+
+Cada nome de item ganha uma chave inteira por provedor, cadastrada pela
+importação. Itens e rollups guardam a chave e os rankings agrupam por ela; o
+nome só volta nas linhas finais. A busca por prefixo do filtro de produto usa o
+índice (provedor, nome_busca), sem listar o catálogo inteiro.
+
+As chaves são do shard de cada loja: o mesmo nome pode ter chaves diferentes em
+lojas diferentes, e a combinação entre lojas é sempre pelo nome.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import TYPE_CHECKING, Any
+
+from database import em_cada_loja, get_connection, texto_busca
+
+from .provedores import obter_provedor
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Sugestões devolvidas por busca (padrão e máximo)
+LIMITE_BUSCA = 20
+LIMITE_BUSCA_MAXIMO = 100
+
+
+def carregar_chaves(conn: sqlite3.Connection, provedor: str) -> dict[str, int]:
+    """Nome -> chave dos produtos já cadastrados do provedor."""
+    return dict(conn.execute("SELECT nome, id FROM bi_produtos WHERE provedor = ?", (provedor,)).fetchall())
+
+
+def cadastrar_produtos(
+    conn: sqlite3.Connection, provedor: str, nomes: pd.Series, chaves: dict[str, int]
+) -> pd.Series:
+    """Chave de cada nome da série, cadastrando os nomes novos em bi_produtos.
+
+    `chaves` (ver `carregar_chaves`) é atualizado com os cadastros; deve vir da
+    mesma conexão de escrita, dentro da transação da importação.
+    """
+    for nome in nomes.unique():
+        if nome not in chaves:
+            chaves[nome] = conn.execute(
+                "INSERT INTO bi_produtos (provedor, nome, nome_busca) VALUES (?, ?, ?) RETURNING id",
+                (provedor, nome, texto_busca(nome)),
+            ).fetchone()[0]
+    return nomes.map(chaves)
+
+
+def buscar_produtos(
+    provedor: str, prefixo: str = "", limite: int = LIMITE_BUSCA, loja: str | None = None
+) -> list[dict[str, Any]]:
+    """Produtos cujo nome começa com `prefixo` (sem diferenciar acentos e maiúsculas).
+
+    O intervalo [prefixo, prefixo + U+10FFFF) percorre só o trecho do índice
+    idx_bi_produtos_busca que interessa. Sem `loja`, busca em todas as lojas em
+    paralelo e junta os nomes; a chave (`id`) só vem quando um shard só respondeu.
+    """
+    provedor = obter_provedor(provedor).slug
+    limite = max(1, min(int(limite), LIMITE_BUSCA_MAXIMO))
+    inicio = texto_busca(prefixo)
+
+    def buscar() -> list[dict[str, Any]]:
+        with get_connection() as conn:
+            linhas = conn.execute(
+                """
+                SELECT id, nome, nome_busca
+                FROM bi_produtos
+                WHERE provedor = ? AND nome_busca >= ? AND nome_busca < ?
+                ORDER BY nome_busca, nome
+                LIMIT ?
+                """,
+                (provedor, inicio, inicio + "\U0010ffff", limite),
+            ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    parciais = list(em_cada_loja(buscar, [loja] if loja else None).values())
+    if len(parciais) == 1:
+        return [{"id": produto["id"], "nome": produto["nome"]} for produto in parciais[0]]
+    nomes = {(produto["nome_busca"], produto["nome"]) for parcial in parciais for produto in parcial}
+    return [{"nome": nome} for _, nome in sorted(nomes)[:limite]]
@@ -0,0 +1,250 @@
+"""Registro de provedores de marketplace e dos esquemas dos seus relatórios.
+
+Cada provedor declara, por tipo de relatório (pedidos ou itens), como os
+cabeçalhos da planilha viram os campos canônicos gravados nas tabelas de BI
+(bi_pedidos e bi_itens) e quais conversões aplicar antes da validação. Todos os
+provedores passam pela mesma importação em `service`; para incluir um novo basta
+declarar seus esquemas e chamar `registrar_provedor`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+from .sob_demanda import modulo_sob_demanda
+
+# Só a importação de relatórios usa as conversões; o pandas entra no primeiro uso
+pd = modulo_sob_demanda("pandas")
+
+# Campos canônicos (colunas de bi_pedidos/bi_itens) por tipo de relatório
+CAMPOS = {
+    "pedidos": ("pedido_id", "data_hora_pedido", "status", "tempo_preparo_min", "tempo_entrega_min"),
+    "itens": ("pedido_id", "nome_item", "quantidade_vendida", "receita_item", "preco_medio"),
+}
+# Campos que a validação converte para número
+CAMPOS_NUMERICOS = frozenset(
+    {"tempo_preparo_min", "tempo_entrega_min", "quantidade_vendida", "receita_item", "preco_medio"}
+)
+
+Conversor = Callable[["pd.Series"], "pd.Series"]
+
+
+@dataclass(frozen=True)
+class EsquemaRelatorio:
+    """Layout de um relatório: cabeçalho normalizado -> campo canônico.
+
+    `obrigatorias` são os cabeçalhos que identificam o relatório; `conversores`
+    recebem a coluna já renomeada e devolvem valores que a validação entende.
+    """
+
+    tipo: str
+    colunas: dict[str, str]
+    obrigatorias: frozenset[str]
+    conversores: dict[str, Conversor] = field(default_factory=dict)
+
+    def reconhece(self, colunas: Iterable[str]) -> bool:
+        return self.obrigatorias.issubset(colunas)
+
+
+@dataclass(frozen=True)
+class BIProvider:
+    """Representa um provedor de marketplace para BI."""
+
+    slug: str
+    nome: str
+    relatorios: tuple[EsquemaRelatorio, ...] = ()
+
+    def identificar(self, colunas: Iterable[str]) -> EsquemaRelatorio | None:
+        """Primeiro esquema cujos cabeçalhos obrigatórios estão todos presentes."""
+        colunas = set(colunas)
+        return next((esquema for esquema in self.relatorios if esquema.reconhece(colunas)), None)
+
+
+def numero_brasileiro(serie: pd.Series) -> pd.Series:
+    """Converte textos como '1.234,56' ou 'R$ 10,00'; células numéricas passam direto.
+
+    Textos que não viram número ficam como estão, para a validação apontar a linha.
+    """
+    if not pd.api.types.is_object_dtype(serie) and not pd.api.types.is_string_dtype(serie):
+        return serie
+    texto = serie.astype("string").str.replace("R$", "", regex=False).str.strip()
+    com_virgula = texto.str.contains(",", regex=False).fillna(False).astype(bool)
+    if not com_virgula.any():
+        return serie
+    convertido = pd.to_numeric(
+        texto[com_virgula].str.replace(".", "", regex=False).str.replace(",", ".", regex=False), errors="coerce"
+    ).dropna()
+    resultado = serie.astype(object)
+    resultado[convertido.index] = convertido
+    return resultado
+
+
+_FORMATOS_DATA_BR = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+
+
+def data_dia_primeiro(serie: pd.Series) -> pd.Series:
+    """Converte textos 'DD/MM/AAAA[ HH:MM[:SS]]'; datas já lidas como data passam direto."""
+    if not pd.api.types.is_object_dtype(serie) and not pd.api.types.is_string_dtype(serie):
+        return serie
+    resultado = serie.astype(object)
+    pendentes = serie.map(lambda valor: isinstance(valor, str)).astype(bool)
+    for formato in _FORMATOS_DATA_BR:
+        if not pendentes.any():
+            break
+        convertido = pd.to_datetime(serie[pendentes].str.strip(), format=formato, errors="coerce").dropna()
+        resultado[convertido.index] = convertido
+        pendentes[convertido.index] = False
+    return resultado
+
+
+PROVEDOR_99FOOD = BIProvider(
+    slug="99food",
+    nome="99Food",
+    relatorios=(
+        EsquemaRelatorio(
+            tipo="pedidos",
+            colunas={
+                "id do pedido": "pedido_id",
+                "data e hora do pedido": "data_hora_pedido",
+                "status": "status",
+                "tempo preparo": "tempo_preparo_min",
+                "tempo entrega": "tempo_entrega_min",
+            },
+            obrigatorias=frozenset({"id do pedido", "status"}),
+        ),
+        EsquemaRelatorio(
+            tipo="itens",
+            colunas={
+                "id do pedido": "pedido_id",
+                "nome do item": "nome_item",
+                "quantidade vendida": "quantidade_vendida",
+                "receita do item": "receita_item",
+                "preço médio": "preco_medio",
+            },
+            obrigatorias=frozenset({"id do pedido", "nome do item", "quantidade vendida"}),
+        ),
+    ),
+)
+
+# Exportações do iFood usam data DD/MM/AAAA e valores com vírgula decimal
+PROVEDOR_IFOOD = BIProvider(
+    slug="ifood",
+    nome="iFood",
+    relatorios=(
+        EsquemaRelatorio(
+            tipo="pedidos",
+            colunas={
+                "id pedido": "pedido_id",
+                "data/hora do pedido": "data_hora_pedido",
+                "status do pedido": "status",
+                "tempo de preparo (min)": "tempo_preparo_min",
+                "tempo de entrega (min)": "tempo_entrega_min",
+            },
+            obrigatorias=frozenset({"id pedido", "status do pedido"}),
+            conversores={
+                "data_hora_pedido": data_dia_primeiro,
+                "tempo_preparo_min": numero_brasileiro,
+                "tempo_entrega_min": numero_brasileiro,
+            },
+        ),
+        EsquemaRelatorio(
+            tipo="itens",
+            colunas={
+                "id pedido": "pedido_id",
+                "item": "nome_item",
+                "quantidade": "quantidade_vendida",
+                "valor total (r$)": "receita_item",
+                "valor unitário (r$)": "preco_medio",
+            },
+            obrigatorias=frozenset({"id pedido", "item", "quantidade"}),
+            conversores={
+                "quantidade_vendida": numero_brasileiro,
+                "receita_item": numero_brasileiro,
+                "preco_medio": numero_brasileiro,
+            },
+        ),
+    ),
+)
+
+PROVEDOR_KEETA = BIProvider(
+    slug="keeta",
+    nome="Keeta",
+    relatorios=(
+        EsquemaRelatorio(
+            tipo="pedidos",
+            colunas={
+                "order id": "pedido_id",
+                "order time": "data_hora_pedido",
+                "order status": "status",
+                "prep time (min)": "tempo_preparo_min",
+                "delivery time (min)": "tempo_entrega_min",
+            },
+            obrigatorias=frozenset({"order id", "order status"}),
+        ),
+        EsquemaRelatorio(
+            tipo="itens",
+            colunas={
+                "order id": "pedido_id",
+                "item name": "nome_item",
+                "quantity": "quantidade_vendida",
+                "item revenue": "receita_item",
+                "unit price": "preco_medio",
+            },
+            obrigatorias=frozenset({"order id", "item name", "quantity"}),
+        ),
+    ),
+)
+
+_REGISTRO: dict[str, BIProvider] = {}
+
+
+def registrar_provedor(provedor: BIProvider) -> None:
+    """Inclui (ou substitui) um provedor no registro, validando seus esquemas."""
+    for esquema in provedor.relatorios:
+        if esquema.tipo not in CAMPOS:
+            raise ValueError(f"Tipo de relatório inválido em '{provedor.slug}': {esquema.tipo}.")
+        desconhecidos = set(esquema.colunas.values()) - set(CAMPOS[esquema.tipo])
+        if desconhecidos or "pedido_id" not in esquema.colunas.values():
+            raise ValueError(f"Esquema de {esquema.tipo} de '{provedor.slug}' com campos inválidos: {sorted(desconhecidos)}.")
+    _REGISTRO[provedor.slug] = provedor
+
+
+def listar_provedores() -> list[BIProvider]:
+    return list(_REGISTRO.values())
+
+
+def obter_provedor(slug: str) -> BIProvider:
+    provedor = _REGISTRO.get(slug)
+    if provedor is None:
+        raise ValueError(f"Provedor de BI desconhecido: '{slug}'.")
+    return provedor
+
+
+def identificar_relatorio(colunas: Iterable[str], provedor: str | None = None) -> tuple[BIProvider, EsquemaRelatorio]:
+    """Provedor e esquema de um relatório a partir só das colunas do cabeçalho.
+
+    Com `provedor`, só os esquemas dele são considerados.
+    """
+    colunas = set(colunas)
+    candidatos = [obter_provedor(provedor)] if provedor else listar_provedores()
+    for candidato in candidatos:
+        esquema = candidato.identificar(colunas)
+        if esquema is not None:
+            return candidato, esquema
+    nomes = ", ".join(candidato.nome for candidato in candidatos)
+    raise ValueError(f"Arquivo não reconhecido. Use relatório de pedidos ou itens de: {nomes}.")
+
+
+def aplicar_esquema(df: pd.DataFrame, esquema: EsquemaRelatorio) -> pd.DataFrame:
+    """Renomeia as colunas para os campos canônicos, descarta as demais e aplica os conversores."""
+    presentes = {coluna: campo for coluna, campo in esquema.colunas.items() if coluna in df.columns}
+    df = df[list(presentes)].rename(columns=presentes)
+    for campo, conversor in esquema.conversores.items():
+        if campo in df.columns:
+            df[campo] = conversor(df[campo])
+    return df
+
+
+for _provedor in (PROVEDOR_99FOOD, PROVEDOR_IFOOD, PROVEDOR_KEETA):
+    registrar_provedor(_provedor)
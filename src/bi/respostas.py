@@ -0,0 +1,79 @@
+"""Formato, serialização e compressão das respostas JSON do dashboard de BI.
+
+No formato padrão ("linhas") cada série é uma lista de objetos que repetem as
+chaves em todo ponto. O formato "colunar" manda cada série como arrays
+paralelos (`{"dia": [...], "valor": [...]}`) e deixa os rankings de produtos
+opcionais. A serialização usa o orjson quando instalado e a compressão
+negocia brotli (se o módulo `brotli` estiver instalado) ou gzip pelo
+Accept-Encoding; sem eles, caem no `json` e no `zlib` da biblioteca padrão.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any
+
+from .service import _COMBINACAO_PAINEIS, PAINEIS_DASHBOARD
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATOS_DASHBOARD = ("linhas", "colunar")
+# Respostas menores que isso saem sem compressão (os KPIs, por exemplo)
+TAMANHO_MINIMO_COMPRESSAO = 1024
+# Níveis para conteúdo gerado a cada requisição: quase toda a redução, pouca CPU
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+
+
+def painel_colunar(painel: str, valor: Any) -> Any:
+    """Série ou ranking como arrays paralelos; os KPIs já são um objeto só."""
+    if painel == "kpis":
+        return valor
+    chave, campo = _COMBINACAO_PAINEIS[painel]
+    return {chave: [linha[chave] for linha in valor], campo: [linha[campo] for linha in valor]}
+
+
+def dashboard_colunar(dashboard: dict[str, Any], produtos: bool = True) -> dict[str, Any]:
+    """Dashboard completo no formato colunar; `produtos=False` omite os rankings."""
+    resultado: dict[str, Any] = {"kpis": dashboard["kpis"], "graficos": {}}
+    if produtos:
+        resultado["produtos"] = {}
+    for painel, secao in PAINEIS_DASHBOARD.items():
+        if secao in resultado:
+            resultado[secao][painel] = painel_colunar(painel, dashboard[secao][painel])
+    resultado["provedores_futuros"] = dashboard["provedores_futuros"]
+    resultado["provedores"] = dashboard["provedores"]
+    return resultado
+
+
+def serializar_json(valor: Any) -> bytes:
+    """JSON compacto em UTF-8 (orjson se disponível)."""
+    if orjson is not None:
+        return orjson.dumps(valor)
+    return json.dumps(valor, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def codificacoes_disponiveis() -> list[str]:
+    """Codificações suportadas, na ordem de preferência do servidor."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def comprimir(corpo: bytes, codificacao: str | None) -> tuple[bytes, str | None]:
+    """Comprime `corpo` na codificação negociada; retorna (corpo, codificação usada ou None)."""
+    if codificacao is None or len(corpo) < TAMANHO_MINIMO_COMPRESSAO:
+        return corpo, None
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=QUALIDADE_BROTLI), "br"
+    if codificacao == "gzip":
+        compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(corpo) + compressor.flush(), "gzip"
+    raise ValueError(f"Codificação não suportada: '{codificacao}'.")
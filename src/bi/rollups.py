@@ -0,0 +1,273 @@
+"""Tabelas de agregação (rollups) do dashboard de BI.
+
+Granularidade provedor × dia × hora (bi_rollup_hora) e provedor × dia × hora ×
+produto (bi_rollup_hora_produto, pela chave de bi_produtos), com receita,
+quantidade e pedidos distintos.
+Como cada pedido pertence a uma única hora, somar `pedidos` entre horas/dias
+equivale ao COUNT(DISTINCT) das tabelas brutas.
+
+A importação registra os pedidos tocados (com a hora antiga, antes do upsert)
+e, ao final da transação, recalcula apenas as horas afetadas.
+
+Os rollups cobrem também os meses arquivados (bi.particoes), cujas linhas já não
+estão nas tabelas quentes: reconstrução e conferência só tocam o período quente,
+e os rollups dos meses arquivados ficam como estavam no arquivamento.
+
+Uso pela linha de comando (a partir de src/):
+    python -m bi.rollups reconstruir
+    python -m bi.rollups verificar [--loja LOJA]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from collections.abc import Iterable
+from typing import Any
+
+from database import conexao_escrita, get_connection, incrementar_versao_dados, init_db, listar_lojas, usar_loja
+
+from .particoes import inicio_quente
+from .provedores import listar_provedores
+
+TABELAS_ROLLUP = ("bi_rollup_hora", "bi_rollup_hora_produto")
+
+# Acima desta fração de horas afetadas, o recálculo incremental vira reconstrução completa
+FRACAO_RECONSTRUCAO_TOTAL = 0.5
+
+# Tolerância relativa para diferenças de arredondamento entre somas em ordens distintas
+TOLERANCIA = 1e-6
+
+# `{origem}` é a cláusula FROM que define quais pedidos entram no cálculo
+# dia/hora/dia_semana são colunas geradas de bi_pedidos; a hora do rollup fica em texto ('09')
+_SQL_AGREGAR_HORA = """
+    SELECT
+        p.provedor AS provedor,
+        p.dia AS dia,
+        printf('%02d', p.hora) AS hora,
+        p.dia_semana AS dia_semana,
+        COUNT(DISTINCT p.id) AS pedidos,
+        COALESCE(SUM(i.receita_item), 0) AS receita,
+        COALESCE(SUM(i.quantidade_vendida), 0) AS quantidade
+    FROM {origem}
+    LEFT JOIN bi_itens i ON i.provedor = p.provedor AND i.pedido_id = p.pedido_id
+    GROUP BY p.provedor, p.dia, p.hora
+"""
+
+_SQL_AGREGAR_HORA_PRODUTO = """
+    SELECT
+        p.provedor AS provedor,
+        p.dia AS dia,
+        printf('%02d', p.hora) AS hora,
+        p.dia_semana AS dia_semana,
+        i.produto_id AS produto_id,
+        COUNT(DISTINCT p.id) AS pedidos,
+        COALESCE(SUM(i.receita_item), 0) AS receita,
+        COALESCE(SUM(i.quantidade_vendida), 0) AS quantidade
+    FROM {origem}
+    JOIN bi_itens i ON i.provedor = p.provedor AND i.pedido_id = p.pedido_id
+    GROUP BY p.provedor, p.dia, p.hora, i.produto_id
+"""
+
+# Pedidos das horas afetadas, por igualdade no índice (provedor, dia, hora, epoch)
+_ORIGEM_HORAS_AFETADAS = """
+    temp._rollup_horas h
+    JOIN bi_pedidos p
+        ON p.provedor = h.provedor
+        AND p.dia = h.dia
+        AND p.hora = CAST(h.hora AS INTEGER)
+"""
+
+# Todos os pedidos dos provedores afetados (reconstrução completa após carga grande)
+_ORIGEM_PROVEDORES_AFETADOS = """
+    (SELECT * FROM bi_pedidos WHERE provedor IN (SELECT provedor FROM temp._rollup_horas)) p
+"""
+
+_ORIGEM_COMPLETA = "bi_pedidos p"
+
+
+def iniciar_rastreamento(conn: sqlite3.Connection) -> None:
+    """Prepara as tabelas temporárias que acumulam os pedidos tocados na transação."""
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS _rollup_pedidos (provedor TEXT, pedido_id TEXT, PRIMARY KEY (provedor, pedido_id))"
+    )
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS _rollup_horas (provedor TEXT, dia TEXT, hora TEXT, PRIMARY KEY (provedor, dia, hora))"
+    )
+    conn.execute("DELETE FROM temp._rollup_pedidos")
+    conn.execute("DELETE FROM temp._rollup_horas")
+
+
+def _registrar_horas_dos_pedidos(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO temp._rollup_horas (provedor, dia, hora)
+        SELECT p.provedor, p.dia, printf('%02d', p.hora)
+        FROM temp._rollup_pedidos t
+        JOIN bi_pedidos p ON p.provedor = t.provedor AND p.pedido_id = t.pedido_id
+        """
+    )
+
+
+def registrar_pedidos_tocados(conn: sqlite3.Connection, provedor: str, pedido_ids: Iterable[str]) -> None:
+    """Registra pedidos que serão gravados, guardando a hora em que estavam antes da gravação."""
+    conn.execute("DELETE FROM temp._rollup_pedidos")
+    conn.executemany(
+        "INSERT OR IGNORE INTO temp._rollup_pedidos (provedor, pedido_id) VALUES (?, ?)",
+        ((provedor, pedido_id) for pedido_id in pedido_ids),
+    )
+    _registrar_horas_dos_pedidos(conn)
+
+
+def confirmar_pedidos_tocados(conn: sqlite3.Connection) -> None:
+    """Após a gravação do bloco, registra também as horas novas dos pedidos tocados."""
+    _registrar_horas_dos_pedidos(conn)
+
+
+def atualizar_rollups(conn: sqlite3.Connection) -> int:
+    """Recalcula os rollups das horas afetadas; deve rodar na transação da importação.
+
+    Retorna o número de horas recalculadas.
+    """
+    horas = conn.execute("SELECT COUNT(*) FROM temp._rollup_horas").fetchone()[0]
+    if not horas:
+        return 0
+
+    existentes = conn.execute(
+        "SELECT COUNT(*) FROM bi_rollup_hora WHERE provedor IN (SELECT provedor FROM temp._rollup_horas)"
+    ).fetchone()[0]
+    if horas >= existentes * FRACAO_RECONSTRUCAO_TOTAL:
+        # Quando a carga toca quase todo o histórico do provedor, um GROUP BY completo sai mais barato
+        for tabela in TABELAS_ROLLUP:
+            conn.execute(
+                f"DELETE FROM {tabela} WHERE provedor IN (SELECT provedor FROM temp._rollup_horas) AND dia >= ?",
+                (inicio_quente(conn) or "",),
+            )
+        _inserir_agregados(conn, _ORIGEM_PROVEDORES_AFETADOS)
+    else:
+        for tabela in TABELAS_ROLLUP:
+            conn.execute(
+                f"""
+                DELETE FROM {tabela}
+                WHERE (provedor, dia, hora) IN (SELECT provedor, dia, hora FROM temp._rollup_horas)
+                """
+            )
+        _inserir_agregados(conn, _ORIGEM_HORAS_AFETADAS)
+    conn.execute("DELETE FROM temp._rollup_pedidos")
+    conn.execute("DELETE FROM temp._rollup_horas")
+    return int(horas)
+
+
+def _inserir_agregados(conn: sqlite3.Connection, origem: str) -> None:
+    conn.execute(
+        f"""
+        INSERT INTO bi_rollup_hora (provedor, dia, hora, dia_semana, pedidos, receita, quantidade)
+        {_SQL_AGREGAR_HORA.format(origem=origem)}
+        """
+    )
+    conn.execute(
+        f"""
+        INSERT INTO bi_rollup_hora_produto (provedor, dia, hora, dia_semana, produto_id, pedidos, receita, quantidade)
+        {_SQL_AGREGAR_HORA_PRODUTO.format(origem=origem)}
+        """
+    )
+
+
+def reconstruir_rollups() -> None:
+    """Recria os rollups do período quente a partir das tabelas brutas."""
+    with conexao_escrita() as conn:
+        for tabela in TABELAS_ROLLUP:
+            conn.execute(f"DELETE FROM {tabela} WHERE dia >= ?", (inicio_quente(conn) or "",))
+        _inserir_agregados(conn, _ORIGEM_COMPLETA)
+        # A versão de cada provedor invalida o cache e o ETag do seu dashboard
+        for provedor in listar_provedores():
+            incrementar_versao_dados(conn, provedor.slug)
+
+
+def garantir_rollups() -> None:
+    """Popula os rollups de bancos que já tinham dados antes das tabelas existirem, loja a loja."""
+    for loja in listar_lojas():
+        with usar_loja(loja):
+            with get_connection() as conn:
+                vazio = conn.execute("SELECT 1 FROM bi_rollup_hora LIMIT 1").fetchone() is None
+                com_dados = conn.execute("SELECT 1 FROM bi_pedidos LIMIT 1").fetchone() is not None
+            if vazio and com_dados:
+                reconstruir_rollups()
+
+
+def _contar_divergencias(
+    conn: sqlite3.Connection, tabela: str, esperado: str, chaves: list[str], desde: str
+) -> int:
+    juncao = " AND ".join(f"r.{chave} = e.{chave}" for chave in chaves)
+    diferenca = f"""
+        r.pedidos != e.pedidos
+        OR abs(r.receita - e.receita) > {TOLERANCIA} * max(1, abs(e.receita))
+        OR abs(r.quantidade - e.quantidade) > {TOLERANCIA} * max(1, abs(e.quantidade))
+    """
+    faltando = conn.execute(
+        f"""
+        SELECT COUNT(*) FROM ({esperado}) e
+        LEFT JOIN {tabela} r ON {juncao}
+        WHERE r.dia IS NULL OR {diferenca}
+        """
+    ).fetchone()[0]
+    sobrando = conn.execute(
+        f"""
+        SELECT COUNT(*) FROM {tabela} r
+        LEFT JOIN ({esperado}) e ON {juncao}
+        WHERE e.dia IS NULL AND r.dia >= ?
+        """,
+        (desde,),
+    ).fetchone()[0]
+    return int(faltando + sobrando)
+
+
+def verificar_rollups() -> dict[str, Any]:
+    """Compara os rollups do período quente com a agregação das tabelas brutas.
+
+    Retorna as linhas divergentes (ausentes, sobrando ou com valores diferentes) por tabela.
+    """
+    with get_connection() as conn:
+        desde = inicio_quente(conn) or ""
+        divergencias = {
+            "bi_rollup_hora": _contar_divergencias(
+                conn,
+                "bi_rollup_hora",
+                _SQL_AGREGAR_HORA.format(origem=_ORIGEM_COMPLETA),
+                ["provedor", "dia", "hora"],
+                desde,
+            ),
+            "bi_rollup_hora_produto": _contar_divergencias(
+                conn,
+                "bi_rollup_hora_produto",
+                _SQL_AGREGAR_HORA_PRODUTO.format(origem=_ORIGEM_COMPLETA),
+                ["provedor", "dia", "hora", "produto_id"],
+                desde,
+            ),
+        }
+    return {"consistente": not any(divergencias.values()), "divergencias": divergencias}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manutenção dos rollups do BI.")
+    parser.add_argument("comando", choices=["reconstruir", "verificar"])
+    parser.add_argument("--loja", help="só esta loja (padrão: todas)")
+    args = parser.parse_args()
+
+    init_db()
+    inconsistente = False
+    for loja in [args.loja] if args.loja else listar_lojas():
+        with usar_loja(loja):
+            if args.comando == "reconstruir":
+                reconstruir_rollups()
+                print(f"{loja}: rollups reconstruídos.")
+            else:
+                resultado = verificar_rollups()
+                print(f"{loja}: {resultado}")
+                inconsistente |= not resultado["consistente"]
+    if inconsistente:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
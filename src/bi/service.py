@@ -1,285 +1,1104 @@
-"""Serviços de BI para importação e analytics de marketplaces."""
+"""Serviços de BI para importação e analytics de marketplaces.
+
+A importação grava no shard da loja atual (`database.usar_loja`). O dashboard
+lê uma loja ou, sem loja, todas: cada shard calcula agregados parciais em
+paralelo (`database.em_cada_loja`) e as somas são combinadas aqui. Dentro de
+cada shard, as tabelas brutas são lidas só nas partições mensais que o período
+alcança (`bi.particoes`); sem datas, só nos meses quentes.
+"""
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
+import hashlib
+import shutil
+import sqlite3
+import time
+import uuid
+import zipfile
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, TypeVar
+from xml.etree.ElementTree import ParseError
 
-import pandas as pd
+import database
+import metricas
+from database import conexao_escrita, em_cada_loja, get_connection, incrementar_versao_dados, listar_lojas
 
-from database import DATA_DIR, get_connection
+from . import particoes, produtos, rollups
+from .cabecalho import FormatoArquivo, detectar_formato, ler_cabecalho_csv, ler_cabecalho_xlsx
+from .provedores import (
+    CAMPOS_NUMERICOS,
+    PROVEDOR_99FOOD,
+    BIProvider,
+    EsquemaRelatorio,
+    aplicar_esquema,
+    identificar_relatorio,
+    listar_provedores,
+    numero_brasileiro,
+    obter_provedor,
+)
+from .sob_demanda import modulo_sob_demanda
 
+# pandas e openpyxl só entram na importação; o dashboard não precisa deles
+pd = modulo_sob_demanda("pandas")
 
-@dataclass(frozen=True)
-class BIProvider:
-    """Representa um provedor de marketplace para BI."""
+# Linhas por chamada de executemany; todos os lotes de um arquivo ficam na mesma transação
+TAMANHO_LOTE_SQL = 5_000
+# Linhas lidas da planilha por bloco (define a memória de pico da importação)
+TAMANHO_BLOCO_LEITURA = 20_000
+# Linhas por bloco do leitor de CSV (mais barato por linha que o openpyxl)
+TAMANHO_BLOCO_CSV = 100_000
+# Bytes copiados por vez ao gravar o upload em disco
+TAMANHO_BLOCO_UPLOAD = 1024 * 1024
+# Máximo de linhas rejeitadas detalhadas no resultado de cada arquivo
+LIMITE_ERROS = 1_000
+# Produtos em cada ranking do dashboard
+TAMANHO_RANKING = 10
 
-    slug: str
-    nome: str
+# Duração das etapas da importação: leitura, normalizacao, classificacao, persistencia
+METRICA_IMPORTACAO = "bi_importacao_etapa_segundos"
+metricas.registrar_histograma(METRICA_IMPORTACAO, "Duração das etapas da importação de relatórios de BI.")
 
 
-PROVEDOR_99FOOD = BIProvider(slug="99food", nome="99Food")
-PROVEDORES_FUTUROS = [BIProvider(slug="ifood", nome="iFood"), BIProvider(slug="keeta", nome="Keeta")]
+def pasta_uploads() -> Path:
+    """Pasta de uploads de BI; acompanha database.DATA_DIR (ver usar_diretorio_dados)."""
+    return database.DATA_DIR / "uploads" / "bi"
 
-UPLOAD_DIR = DATA_DIR / "uploads" / "bi"
 
+def _normalizar_cabecalho(cabecalho: tuple[Any, ...]) -> list[str]:
+    colunas = []
+    for posicao, valor in enumerate(cabecalho):
+        nome = str(valor).strip().lower() if valor is not None else ""
+        colunas.append(nome or f"unnamed: {posicao}")
+    return colunas
 
-def _normalizar_colunas(df: pd.DataFrame) -> pd.DataFrame:
-    colunas = [str(col).strip().lower() for col in df.columns]
-    return df.rename(columns={antiga: nova for antiga, nova in zip(df.columns, colunas, strict=False)})
 
+@contextmanager
+def _abrir_excel_em_blocos(caminho: Path, tamanho_bloco: int = TAMANHO_BLOCO_LEITURA) -> Iterator[tuple[list[str], Iterator[pd.DataFrame]]]:
+    """Abre a planilha em modo streaming (openpyxl read_only).
 
-def _identificar_tipo_relatorio(df: pd.DataFrame) -> str:
-    colunas = set(df.columns)
-    if {"id do pedido", "status"}.issubset(colunas):
-        return "pedidos"
-    if {"id do pedido", "nome do item", "quantidade vendida"}.issubset(colunas):
-        return "itens"
-    raise ValueError("Arquivo não reconhecido. Use relatório de pedidos ou itens da 99Food.")
+    Entrega as colunas normalizadas do cabeçalho e um iterador de DataFrames com
+    até `tamanho_bloco` linhas cada, indexados pelo número da linha na planilha.
+    A memória de pico depende do tamanho do bloco, não do tamanho do arquivo.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
 
+    inicio_leitura = time.perf_counter()
+    try:
+        workbook = load_workbook(caminho, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile) as exc:
+        raise ValueError(f"Arquivo '{caminho.name}' não é uma planilha .xlsx válida.") from exc
 
-def _parse_datetime(valor: Any) -> str:
-    if pd.isna(valor):
-        raise ValueError("Data/hora do pedido está vazia.")
-    if isinstance(valor, datetime):
-        return valor.isoformat(sep=" ", timespec="seconds")
-    convertido = pd.to_datetime(valor, errors="coerce")
-    if pd.isna(convertido):
-        raise ValueError(f"Data/hora inválida: {valor}")
-    return convertido.to_pydatetime().isoformat(sep=" ", timespec="seconds")
+    try:
+        planilha = workbook.active
+        # Exportações costumam gravar dimensões erradas; sem isso o read_only pode truncar colunas
+        planilha.reset_dimensions()
+        linhas = planilha.iter_rows(values_only=True)
 
+        colunas = _normalizar_cabecalho(next(linhas, None) or ())
+        metricas.observar(METRICA_IMPORTACAO, time.perf_counter() - inicio_leitura, etapa="leitura")
 
-def _ler_excel(caminho: Path) -> pd.DataFrame:
-    df = pd.read_excel(caminho)
-    df = _normalizar_colunas(df)
-    if "id do pedido" not in df.columns:
-        raise ValueError("O arquivo precisa conter a coluna 'ID do pedido'.")
-    return df
+        def blocos() -> Iterator[pd.DataFrame]:
+            total_colunas = len(colunas)
+            numero_linha = 2
+            while True:
+                with metricas.medir(METRICA_IMPORTACAO, etapa="leitura"):
+                    bloco = list(islice(linhas, tamanho_bloco))
+                    if not bloco:
+                        break
+                    registros = [
+                        linha[:total_colunas] if len(linha) >= total_colunas else linha + (None,) * (total_colunas - len(linha))
+                        for linha in bloco
+                    ]
+                    df = pd.DataFrame.from_records(registros, columns=colunas)
+                    df.index = pd.RangeIndex(numero_linha, numero_linha + len(registros))
+                    numero_linha += len(registros)
+                    df = df.dropna(how="all")
+                yield df
 
+        yield colunas, blocos()
+    finally:
+        workbook.close()
 
-def _salvar_relatorio_pedidos(df: pd.DataFrame, arquivo_origem: str) -> int:
-    linhas = 0
-    with get_connection() as conn:
-        for _, row in df.iterrows():
-            pedido_id = str(row.get("id do pedido", "")).strip()
-            if not pedido_id:
-                continue
-            conn.execute(
-                """
-                INSERT INTO bi_99food_pedidos (
-                    pedido_id,
-                    data_hora_pedido,
-                    status,
-                    tempo_preparo_min,
-                    tempo_entrega_min,
-                    arquivo_origem
-                ) VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(pedido_id) DO UPDATE SET
-                    data_hora_pedido = excluded.data_hora_pedido,
-                    status = excluded.status,
-                    tempo_preparo_min = excluded.tempo_preparo_min,
-                    tempo_entrega_min = excluded.tempo_entrega_min,
-                    arquivo_origem = excluded.arquivo_origem,
-                    atualizado_em = CURRENT_TIMESTAMP
-                """,
-                (
-                    pedido_id,
-                    _parse_datetime(row.get("data e hora do pedido")),
-                    str(row.get("status", "")).strip(),
-                    float(row.get("tempo preparo", 0) or 0),
-                    float(row.get("tempo entrega", 0) or 0),
-                    arquivo_origem,
-                ),
-            )
-            linhas += 1
-        conn.commit()
-    return linhas
-
-
-def _salvar_relatorio_itens(df: pd.DataFrame, arquivo_origem: str) -> int:
+
+@contextmanager
+def _abrir_csv_em_blocos(
+    caminho: Path, formato: FormatoArquivo, esquema: EsquemaRelatorio, tamanho_bloco: int = TAMANHO_BLOCO_CSV
+) -> Iterator[tuple[list[str], Iterator[pd.DataFrame]]]:
+    """Lê o CSV (ou TSV, ou .gz) em blocos com o parser C do pandas.
+
+    Só as colunas do esquema são lidas, todas com dtype texto explícito: não há
+    inferência de tipo por bloco, e a conversão e a validação ficam com as mesmas
+    funções da planilha, então as linhas rejeitadas são as mesmas. Com separador
+    ';' ou tabulação, os números aceitam vírgula decimal. Entrega colunas e
+    blocos como `_abrir_excel_em_blocos`, indexados pelo número da linha.
+    """
+    colunas = ler_colunas(caminho, formato)
+    usadas = [posicao for posicao, coluna in enumerate(colunas) if coluna in esquema.colunas]
+    nomes = [colunas[posicao] for posicao in usadas]
+    numericas = [coluna for coluna in nomes if esquema.colunas[coluna] in CAMPOS_NUMERICOS]
+    decimal_virgula = formato.separador != ","
+
+    leitor = pd.read_csv(
+        caminho,
+        sep=formato.separador,
+        encoding=formato.encoding,
+        encoding_errors="replace",
+        compression=formato.compressao,
+        header=0,
+        usecols=usadas,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
+        skip_blank_lines=False,
+        chunksize=tamanho_bloco,
+        engine="c",
+    )
+
+    def blocos() -> Iterator[pd.DataFrame]:
+        while True:
+            with metricas.medir(METRICA_IMPORTACAO, etapa="leitura"):
+                try:
+                    df = next(leitor)
+                except StopIteration:
+                    break
+                except pd.errors.ParserError as exc:
+                    raise ValueError(f"CSV '{caminho.name}' malformado: {exc}") from exc
+                df.columns = nomes
+                # Linha 1 é o cabeçalho, como na planilha
+                df.index = df.index + 2
+                df = df.dropna(how="all")
+                if decimal_virgula:
+                    for coluna in numericas:
+                        df[coluna] = numero_brasileiro(df[coluna])
+            yield df
+
+    try:
+        yield colunas, blocos()
+    finally:
+        leitor.close()
+
+
+def ler_colunas(caminho: Path, formato: FormatoArquivo | None = None) -> list[str]:
+    """Colunas normalizadas do cabeçalho, lendo só a primeira linha do arquivo.
+
+    Planilhas fora do padrão esperado caem na leitura pelo openpyxl.
+    """
+    formato = formato or detectar_formato(caminho)
+    if formato.tipo == "csv":
+        with metricas.medir(METRICA_IMPORTACAO, etapa="leitura"):
+            return _normalizar_cabecalho(tuple(ler_cabecalho_csv(caminho, formato)))
+    try:
+        with metricas.medir(METRICA_IMPORTACAO, etapa="leitura"):
+            return _normalizar_cabecalho(tuple(ler_cabecalho_xlsx(caminho)))
+    except zipfile.BadZipFile as exc:
+        raise ValueError(f"Arquivo '{caminho.name}' não é uma planilha .xlsx válida.") from exc
+    except (KeyError, ParseError, ValueError, IndexError):
+        with _abrir_excel_em_blocos(caminho) as (colunas, _):
+            return colunas
+
+
+def _coluna(df: pd.DataFrame, nome: str, padrao: Any = None) -> pd.Series:
+    if nome in df.columns:
+        return df[nome]
+    return pd.Series(padrao, index=df.index, dtype="object")
+
+
+def _coluna_texto(serie: pd.Series) -> pd.Series:
+    """Converte a coluna inteira para texto sem espaços; vazios viram ''."""
+    if pd.api.types.is_float_dtype(serie):
+        preenchidos = serie.dropna()
+        # IDs numéricos com células vazias chegam como float (123.0)
+        if (preenchidos == preenchidos.round()).all():
+            serie = serie.astype("Int64")
+    return serie.astype("string").str.strip().fillna("").astype(object)
+
+
+def _coluna_numerica(serie: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Converte a coluna para float e devolve também a máscara de valores inválidos."""
+    convertido = pd.to_numeric(serie, errors="coerce")
+    vazio = serie.isna() | (serie.astype("string").str.strip().fillna("") == "")
+    invalido = convertido.isna() & ~vazio
+    return convertido.fillna(0.0).astype(float), invalido
+
+
+def _registrar_erros(erros: list[dict[str, Any]], df: pd.DataFrame, mascara: pd.Series, mensagem: str, coluna: str) -> None:
+    for linha, valor in _coluna(df, coluna)[mascara].items():
+        erros.append({"linha": int(linha), "erro": mensagem.format(valor=valor)})
+
+
+def _coluna_datetime(serie: pd.Series) -> pd.Series:
+    """Converte a coluna para datetime; formatos divergentes caem no parser misto."""
+    convertido = pd.to_datetime(serie, errors="coerce")
+    pendentes = convertido.isna() & serie.notna()
+    if pendentes.any():
+        convertido[pendentes] = pd.to_datetime(serie[pendentes].astype(str), errors="coerce", format="mixed")
+    return convertido
+
+
+def _preparar_pedidos(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dict[str, Any]]]:
+    """Limpa e converte o relatório de pedidos coluna a coluna.
+
+    Retorna as linhas válidas já na ordem do INSERT e a lista de linhas rejeitadas.
+    Recebe as colunas já com os nomes canônicos (ver provedores.aplicar_esquema);
+    o índice do DataFrame é o número da linha na planilha.
+    """
+    erros: list[dict[str, Any]] = []
+    pedido_id = _coluna_texto(_coluna(df, "pedido_id"))
+    preenchido = pedido_id != ""
+
+    data_bruta = _coluna(df, "data_hora_pedido")
+    data_hora = _coluna_datetime(data_bruta)
+    data_vazia = preenchido & data_bruta.isna()
+    data_invalida = preenchido & data_hora.isna() & ~data_bruta.isna()
+    _registrar_erros(erros, df, data_vazia, "Data/hora do pedido está vazia.", "data_hora_pedido")
+    _registrar_erros(erros, df, data_invalida, "Data/hora inválida: {valor}", "data_hora_pedido")
+
+    tempo_preparo, preparo_invalido = _coluna_numerica(_coluna(df, "tempo_preparo_min"))
+    tempo_entrega, entrega_invalido = _coluna_numerica(_coluna(df, "tempo_entrega_min"))
+    _registrar_erros(erros, df, preenchido & preparo_invalido, "Tempo de preparo inválido: {valor}", "tempo_preparo_min")
+    _registrar_erros(erros, df, preenchido & entrega_invalido, "Tempo de entrega inválido: {valor}", "tempo_entrega_min")
+
+    validas = preenchido & ~(data_vazia | data_invalida | preparo_invalido | entrega_invalido)
+    preparado = pd.DataFrame(
+        {
+            "pedido_id": pedido_id,
+            "data_hora_pedido": data_hora.dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "status": _coluna_texto(_coluna(df, "status", "")),
+            "tempo_preparo_min": tempo_preparo,
+            "tempo_entrega_min": tempo_entrega,
+        }
+    )[validas]
+    erros.sort(key=lambda erro: erro["linha"])
+    return preparado, erros
+
+
+def _preparar_itens(df: pd.DataFrame) -> tuple[pd.DataFrame, list[dict[str, Any]]]:
+    """Limpa e converte o relatório de itens coluna a coluna."""
+    erros: list[dict[str, Any]] = []
+    pedido_id = _coluna_texto(_coluna(df, "pedido_id"))
+    nome_item = _coluna_texto(_coluna(df, "nome_item"))
+    preenchido = (pedido_id != "") & (nome_item != "")
+
+    quantidade, quantidade_invalida = _coluna_numerica(_coluna(df, "quantidade_vendida"))
+    receita, receita_invalida = _coluna_numerica(_coluna(df, "receita_item"))
+    preco_medio, preco_invalido = _coluna_numerica(_coluna(df, "preco_medio"))
+    _registrar_erros(erros, df, preenchido & quantidade_invalida, "Quantidade inválida: {valor}", "quantidade_vendida")
+    _registrar_erros(erros, df, preenchido & receita_invalida, "Receita inválida: {valor}", "receita_item")
+    _registrar_erros(erros, df, preenchido & preco_invalido, "Preço médio inválido: {valor}", "preco_medio")
+
+    validas = preenchido & ~(quantidade_invalida | receita_invalida | preco_invalido)
+    preparado = pd.DataFrame(
+        {
+            "pedido_id": pedido_id,
+            "nome_item": nome_item,
+            "quantidade_vendida": quantidade,
+            "receita_item": receita,
+            "preco_medio": preco_medio,
+        }
+    )[validas]
+    erros.sort(key=lambda erro: erro["linha"])
+    return preparado, erros
+
+
+def _executar_em_lotes(conn: sqlite3.Connection, sql: str, df: pd.DataFrame, **constantes: Any) -> int:
+    """Grava o DataFrame com executemany em lotes de TAMANHO_LOTE_SQL linhas.
+
+    `constantes` viram colunas finais com o mesmo valor em todas as linhas.
+    """
+    linhas = df.assign(**constantes).itertuples(index=False, name=None)
+    total = 0
+    while lote := list(islice(linhas, TAMANHO_LOTE_SQL)):
+        conn.executemany(sql, lote)
+        total += len(lote)
+    return total
+
+
+_SQL_UPSERT_PEDIDOS = """
+    INSERT INTO bi_pedidos (
+        pedido_id,
+        data_hora_pedido,
+        status,
+        tempo_preparo_min,
+        tempo_entrega_min,
+        provedor,
+        arquivo_origem,
+        versao
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(provedor, pedido_id) DO UPDATE SET
+        data_hora_pedido = excluded.data_hora_pedido,
+        status = excluded.status,
+        tempo_preparo_min = excluded.tempo_preparo_min,
+        tempo_entrega_min = excluded.tempo_entrega_min,
+        arquivo_origem = excluded.arquivo_origem,
+        atualizado_em = CURRENT_TIMESTAMP,
+        versao = excluded.versao
+"""
+
+# Chave natural (provedor, pedido_id, nome_item): reenviar o relatório substitui os valores.
+# Linhas repetidas dentro da mesma importação (mesmo lote) são somadas.
+_SQL_UPSERT_ITENS = """
+    INSERT INTO bi_itens (
+        pedido_id,
+        nome_item,
+        quantidade_vendida,
+        receita_item,
+        preco_medio,
+        produto_id,
+        provedor,
+        arquivo_origem,
+        lote_importacao,
+        versao
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(provedor, pedido_id, nome_item) DO UPDATE SET
+        quantidade_vendida = CASE
+            WHEN bi_itens.lote_importacao = excluded.lote_importacao
+            THEN bi_itens.quantidade_vendida + excluded.quantidade_vendida
+            ELSE excluded.quantidade_vendida
+        END,
+        receita_item = CASE
+            WHEN bi_itens.lote_importacao = excluded.lote_importacao
+            THEN bi_itens.receita_item + excluded.receita_item
+            ELSE excluded.receita_item
+        END,
+        preco_medio = CASE
+            WHEN bi_itens.lote_importacao = excluded.lote_importacao
+                AND bi_itens.quantidade_vendida + excluded.quantidade_vendida > 0
+            THEN (bi_itens.receita_item + excluded.receita_item)
+                / (bi_itens.quantidade_vendida + excluded.quantidade_vendida)
+            ELSE excluded.preco_medio
+        END,
+        arquivo_origem = excluded.arquivo_origem,
+        lote_importacao = excluded.lote_importacao,
+        versao = excluded.versao
+"""
+
+
+def _recusar_meses_arquivados(
+    preparado: pd.DataFrame, erros: list[dict[str, Any]], meses: pd.Series, rotulo: str
+) -> tuple[pd.DataFrame, list[dict[str, Any]]]:
+    """Tira do bloco as linhas de meses arquivados (ver bi.particoes).
+
+    `meses` traz, por linha, o mês arquivado ('AAAA-MM') ou vazio (NaN) se o mês é quente.
+    """
+    arquivados = meses.notna()
+    if not arquivados.any():
+        return preparado, erros
+    for linha, mes in meses[arquivados].items():
+        erros.append(
+            {
+                "linha": int(linha),
+                "erro": f"{rotulo} de {mes}, mês arquivado: restaure-o com "
+                f"`python -m bi.particoes restaurar {mes}` antes de reimportar.",
+            }
+        )
+    erros.sort(key=lambda erro: erro["linha"])
+    return preparado[~arquivados], erros
+
+
+def _meses_arquivados(
+    conn: sqlite3.Connection, preparado: pd.DataFrame, tipo: str, provedor: str, inicio_quente: str
+) -> pd.Series:
+    """Mês arquivado de cada linha do bloco: pela data do pedido ou, nos itens, pelo pedido arquivado."""
+    if tipo == "pedidos":
+        data_hora = preparado["data_hora_pedido"]
+        return data_hora.str[:7].where(data_hora < inicio_quente)
+    return preparado["pedido_id"].map(
+        particoes.meses_dos_pedidos_arquivados(conn, provedor, preparado["pedido_id"])
+    )
+
+
+_PERSISTENCIA: dict[str, tuple[Callable[[pd.DataFrame], tuple[pd.DataFrame, list[dict[str, Any]]]], str]] = {
+    "pedidos": (_preparar_pedidos, _SQL_UPSERT_PEDIDOS),
+    "itens": (_preparar_itens, _SQL_UPSERT_ITENS),
+}
+
+
+def _salvar_blocos(
+    blocos: Iterable[pd.DataFrame],
+    arquivo_origem: str,
+    provedor: BIProvider,
+    esquema: EsquemaRelatorio,
+    progresso: Callable[[int], None] | None = None,
+    sha256: str | None = None,
+) -> tuple[int, int, list[dict[str, Any]]]:
+    """Prepara e grava cada bloco; todos os blocos entram na mesma transação.
+
+    Os blocos chegam com os cabeçalhos da planilha e passam pelo `esquema` do
+    provedor antes da validação. `progresso`, se informado, recebe o total de
+    linhas gravadas após cada bloco. As linhas gravadas levam a nova versão
+    dos dados do provedor (coluna versao); itens levam a chave do produto
+    (bi.produtos), com os nomes novos cadastrados na mesma transação. Pedidos
+    de meses arquivados (bi.particoes), e itens desses pedidos, são rejeitados.
+    Com `sha256`, o arquivo entra no registro de importados na mesma transação,
+    salvo se houve linha rejeitada por mês arquivado: restaurado o mês, o mesmo
+    arquivo pode ser reimportado.
+    Retorna (linhas gravadas, linhas rejeitadas, primeiros LIMITE_ERROS erros).
+    """
+    preparar, sql = _PERSISTENCIA[esquema.tipo]
+    constantes: dict[str, Any] = {"provedor": provedor.slug, "arquivo_origem": arquivo_origem}
+    if esquema.tipo == "itens":
+        constantes["lote_importacao"] = uuid.uuid4().hex
     linhas = 0
+    rejeitadas = 0
+    recusadas_por_arquivo = 0
+    erros: list[dict[str, Any]] = []
+    # Conexão dedicada de escrita: importações simultâneas esperam a vez em vez de
+    # falhar com "database is locked", e o dashboard continua lendo (WAL)
+    with conexao_escrita() as conn:
+        # Incrementada no início: a versão nova só fica visível com o commit
+        constantes["versao"] = incrementar_versao_dados(conn, provedor.slug)
+        chaves_produtos = produtos.carregar_chaves(conn, provedor.slug) if esquema.tipo == "itens" else {}
+        inicio_quente = particoes.inicio_quente(conn)
+        rollups.iniciar_rastreamento(conn)
+        for bloco in blocos:
+            with metricas.medir(METRICA_IMPORTACAO, etapa="normalizacao"):
+                preparado, erros_bloco = preparar(aplicar_esquema(bloco, esquema))
+                if inicio_quente:
+                    meses = _meses_arquivados(conn, preparado, esquema.tipo, provedor.slug, inicio_quente)
+                    rotulo = "Pedido" if esquema.tipo == "pedidos" else "Item de pedido"
+                    preparado, erros_bloco = _recusar_meses_arquivados(preparado, erros_bloco, meses, rotulo)
+                    recusadas_por_arquivo += int(meses.notna().sum())
+            rejeitadas += len(erros_bloco)
+            erros.extend(erros_bloco[: max(LIMITE_ERROS - len(erros), 0)])
+            with metricas.medir(METRICA_IMPORTACAO, etapa="persistencia"):
+                if esquema.tipo == "itens":
+                    preparado = preparado.assign(
+                        produto_id=produtos.cadastrar_produtos(
+                            conn, provedor.slug, preparado["nome_item"], chaves_produtos
+                        )
+                    )
+                rollups.registrar_pedidos_tocados(conn, provedor.slug, preparado["pedido_id"])
+                linhas += _executar_em_lotes(conn, sql, preparado, **constantes)
+                rollups.confirmar_pedidos_tocados(conn)
+            if progresso:
+                progresso(linhas)
+        with metricas.medir(METRICA_IMPORTACAO, etapa="persistencia"):
+            rollups.atualizar_rollups(conn)
+            if sha256 and not recusadas_por_arquivo:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO bi_arquivos_importados (sha256, provedor, nome, tipo, linhas)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (sha256, provedor.slug, arquivo_origem, esquema.tipo, linhas),
+                )
+    return linhas, rejeitadas, erros
+
+
+def _esquema_99food(tipo: str) -> EsquemaRelatorio:
+    return next(esquema for esquema in PROVEDOR_99FOOD.relatorios if esquema.tipo == tipo)
+
+
+def _salvar_relatorio_pedidos(
+    blocos: Iterable[pd.DataFrame], arquivo_origem: str, progresso: Callable[[int], None] | None = None
+) -> tuple[int, int, list[dict[str, Any]]]:
+    return _salvar_blocos(blocos, arquivo_origem, PROVEDOR_99FOOD, _esquema_99food("pedidos"), progresso)
+
+
+def _salvar_relatorio_itens(
+    blocos: Iterable[pd.DataFrame], arquivo_origem: str, progresso: Callable[[int], None] | None = None
+) -> tuple[int, int, list[dict[str, Any]]]:
+    return _salvar_blocos(blocos, arquivo_origem, PROVEDOR_99FOOD, _esquema_99food("itens"), progresso)
+
+
+def _sha256_arquivo(caminho: Path) -> str:
+    with caminho.open("rb") as arquivo:
+        return hashlib.file_digest(arquivo, "sha256").hexdigest()
+
+
+def _buscar_arquivo_importado(sha256: str) -> sqlite3.Row | None:
     with get_connection() as conn:
-        for _, row in df.iterrows():
-            pedido_id = str(row.get("id do pedido", "")).strip()
-            nome_item = str(row.get("nome do item", "")).strip()
-            if not pedido_id or not nome_item:
-                continue
-            quantidade = float(row.get("quantidade vendida", 0) or 0)
-            receita = float(row.get("receita do item", 0) or 0)
-            preco_medio = float(row.get("preço médio", 0) or 0)
-            conn.execute(
-                """
-                INSERT INTO bi_99food_itens (
-                    pedido_id,
-                    nome_item,
-                    quantidade_vendida,
-                    receita_item,
-                    preco_medio,
-                    arquivo_origem
-                ) VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (pedido_id, nome_item, quantidade, receita, preco_medio, arquivo_origem),
-            )
-            linhas += 1
-        conn.commit()
-    return linhas
-
-
-def importar_arquivos_99food(arquivos: list[tuple[str, bytes]]) -> dict[str, Any]:
-    """Importa múltiplos arquivos Excel da 99Food e salva no banco."""
-    if not arquivos:
-        raise ValueError("Nenhum arquivo foi enviado.")
+        return conn.execute(
+            "SELECT provedor, nome, tipo, importado_em FROM bi_arquivos_importados WHERE sha256 = ?",
+            (sha256,),
+        ).fetchone()
+
+
+def _gravar_upload(conteudo: bytes | BinaryIO, caminho: Path) -> None:
+    """Grava o upload em disco em blocos, sem materializar o arquivo inteiro."""
+    if isinstance(conteudo, bytes):
+        caminho.write_bytes(conteudo)
+        return
+    with caminho.open("wb") as destino:
+        shutil.copyfileobj(conteudo, destino, TAMANHO_BLOCO_UPLOAD)
+
+
+def identificar_arquivo(
+    caminho: Path, provedor: str | None = None, formato: FormatoArquivo | None = None
+) -> tuple[BIProvider, EsquemaRelatorio]:
+    """Provedor e tipo do relatório pelo cabeçalho, sem ler as linhas do arquivo.
+
+    Com `provedor`, arquivos de outros provedores são recusados.
+    """
+    colunas = ler_colunas(caminho, formato)
+    with metricas.medir(METRICA_IMPORTACAO, etapa="classificacao"):
+        return identificar_relatorio(colunas, provedor)
+
+
+def identificar_tipo_arquivo(caminho: Path, provedor: str | None = None) -> str:
+    """Identifica se o arquivo é relatório de pedidos ou de itens."""
+    return identificar_arquivo(caminho, provedor)[1].tipo
+
+
+def importar_arquivo(
+    caminho: Path,
+    nome_arquivo: str,
+    provedor: str | None = None,
+    progresso: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
+    """Importa um arquivo já gravado em disco e retorna o resumo do processamento.
+
+    Aceita .xlsx e CSV/TSV (inclusive gzip), reconhecidos pelo conteúdo. O provedor
+    e o tipo saem só do cabeçalho, antes de qualquer leitura das linhas; sem
+    `provedor`, vale o primeiro do registro que reconhecer o arquivo. Arquivos com
+    conteúdo idêntico (mesmo SHA-256) a um já importado são ignorados.
+    """
+    formato = detectar_formato(caminho)
+    provedor_arquivo, esquema = identificar_arquivo(caminho, provedor, formato)
+
+    sha256 = _sha256_arquivo(caminho)
+    anterior = _buscar_arquivo_importado(sha256)
+    if anterior is not None:
+        return {
+            "nome": nome_arquivo,
+            "provedor": anterior["provedor"],
+            "tipo": anterior["tipo"],
+            "linhas": 0,
+            "linhas_rejeitadas": 0,
+            "erros": [],
+            "duplicado": True,
+            "mensagem": f"Conteúdo já importado em {anterior['importado_em']} ('{anterior['nome']}').",
+        }
+
+    if formato.tipo == "csv":
+        relatorio = _abrir_csv_em_blocos(caminho, formato, esquema)
+    else:
+        relatorio = _abrir_excel_em_blocos(caminho)
+    with relatorio as (_, blocos):
+        processadas, rejeitadas, erros = _salvar_blocos(
+            blocos, nome_arquivo, provedor_arquivo, esquema, progresso, sha256
+        )
+
+    return {
+        "nome": nome_arquivo,
+        "provedor": provedor_arquivo.slug,
+        "tipo": esquema.tipo,
+        "linhas": processadas,
+        "linhas_rejeitadas": rejeitadas,
+        "erros": erros,
+        "duplicado": False,
+    }
+
+
+def importar_arquivo_99food(
+    caminho: Path, nome_arquivo: str, progresso: Callable[[int], None] | None = None
+) -> dict[str, Any]:
+    return importar_arquivo(caminho, nome_arquivo, PROVEDOR_99FOOD.slug, progresso)
+
 
-    destino = UPLOAD_DIR / PROVEDOR_99FOOD.slug
+def gravar_upload(provedor: str, nome_arquivo: str, conteudo: bytes | BinaryIO, subpasta: str | None = None) -> Path:
+    """Grava o upload na pasta do provedor (opcionalmente numa subpasta) e retorna o caminho."""
+    destino = pasta_uploads() / obter_provedor(provedor).slug
+    if subpasta:
+        destino = destino / subpasta
     destino.mkdir(parents=True, exist_ok=True)
 
+    caminho = destino / Path(nome_arquivo).name
+    _gravar_upload(conteudo, caminho)
+    return caminho
+
+
+def gravar_upload_99food(nome_arquivo: str, conteudo: bytes | BinaryIO, subpasta: str | None = None) -> Path:
+    return gravar_upload(PROVEDOR_99FOOD.slug, nome_arquivo, conteudo, subpasta)
+
+
+def importar_arquivos(provedor: str, arquivos: list[tuple[str, bytes | BinaryIO]]) -> dict[str, Any]:
+    """Importa múltiplos relatórios (Excel ou CSV) de um provedor e salva no banco.
+
+    O conteúdo de cada arquivo pode ser `bytes` ou um objeto de arquivo binário;
+    neste caso ele é copiado para disco em blocos e lido em blocos de linhas.
+    """
+    if not arquivos:
+        raise ValueError("Nenhum arquivo foi enviado.")
+
     resultado = {"pedidos": 0, "itens": 0, "arquivos": []}
 
     for nome_arquivo, conteudo in arquivos:
-        caminho = destino / nome_arquivo
-        caminho.write_bytes(conteudo)
+        caminho = gravar_upload(provedor, nome_arquivo, conteudo)
+        resumo = importar_arquivo(caminho, nome_arquivo, provedor)
+        resultado[resumo["tipo"]] += resumo["linhas"]
+        resultado["arquivos"].append(resumo)
 
-        df = _ler_excel(caminho)
-        tipo = _identificar_tipo_relatorio(df)
-        if tipo == "pedidos":
-            processadas = _salvar_relatorio_pedidos(df, nome_arquivo)
-        else:
-            processadas = _salvar_relatorio_itens(df, nome_arquivo)
+    return resultado
 
-        resultado[tipo] += processadas
-        resultado["arquivos"].append({"nome": nome_arquivo, "tipo": tipo, "linhas": processadas})
 
-    return resultado
+def importar_arquivos_99food(arquivos: list[tuple[str, bytes | BinaryIO]]) -> dict[str, Any]:
+    return importar_arquivos(PROVEDOR_99FOOD.slug, arquivos)
+
+
+# Chave do produto pelo nome; subconsulta sem correlação, avaliada uma vez por consulta
+_SQL_CHAVE_PRODUTO = "SELECT id FROM bi_produtos WHERE provedor = ? AND nome = ?"
+
 
+def _filtros_rollups(
+    provedor: str, data_inicial: str | None, data_final: str | None, produto: str | None
+) -> tuple[str, str, list[Any]]:
+    """Tabela de rollup, WHERE e parâmetros para os filtros do dashboard.
 
-def carregar_dashboard_99food(data_inicial: str | None = None, data_final: str | None = None, produto: str | None = None) -> dict[str, Any]:
-    """Retorna KPIs e séries para dashboard analítico da 99Food."""
-    filtros: list[str] = ["1=1"]
-    parametros: list[Any] = []
+    Sem filtro de produto, pedidos sem itens também contam (equivale ao LEFT JOIN),
+    então a tabela é bi_rollup_hora; com produto, a granularidade por produto,
+    filtrada pela chave do nome em bi_produtos.
+    """
+    filtros: list[str] = ["provedor = ?"]
+    parametros: list[Any] = [provedor]
 
     if data_inicial:
-        filtros.append("date(p.data_hora_pedido) >= date(?)")
+        filtros.append("dia >= date(?)")
         parametros.append(data_inicial)
     if data_final:
-        filtros.append("date(p.data_hora_pedido) <= date(?)")
+        filtros.append("dia <= date(?)")
         parametros.append(data_final)
     if produto:
-        filtros.append("i.nome_item = ?")
-        parametros.append(produto)
+        filtros.append(f"produto_id = ({_SQL_CHAVE_PRODUTO})")
+        parametros.extend((provedor, produto))
 
-    where = " AND ".join(filtros)
+    tabela = "bi_rollup_hora_produto" if produto else "bi_rollup_hora"
+    return tabela, " AND ".join(filtros), parametros
 
-    with get_connection() as conn:
-        kpis = conn.execute(
-            f"""
-            SELECT
-                COALESCE(SUM(i.receita_item), 0) AS faturamento_total,
-                COUNT(DISTINCT p.pedido_id) AS total_pedidos,
-                COALESCE(SUM(i.quantidade_vendida), 0) AS total_itens_vendidos,
-                CASE
-                    WHEN COUNT(DISTINCT p.pedido_id) = 0 THEN 0
-                    ELSE COALESCE(SUM(i.receita_item), 0) / COUNT(DISTINCT p.pedido_id)
-                END AS ticket_medio
-            FROM bi_99food_pedidos p
-            LEFT JOIN bi_99food_itens i ON i.pedido_id = p.pedido_id
-            WHERE {where}
-            """,
-            parametros,
-        ).fetchone()
 
-        faturamento_por_dia = conn.execute(
-            f"""
-            SELECT date(p.data_hora_pedido) AS dia, COALESCE(SUM(i.receita_item), 0) AS valor
-            FROM bi_99food_pedidos p
-            LEFT JOIN bi_99food_itens i ON i.pedido_id = p.pedido_id
-            WHERE {where}
-            GROUP BY date(p.data_hora_pedido)
-            ORDER BY dia
-            """,
-            parametros,
-        ).fetchall()
-
-        pedidos_por_hora = conn.execute(
-            f"""
-            SELECT strftime('%H', p.data_hora_pedido) AS hora, COUNT(DISTINCT p.pedido_id) AS pedidos
-            FROM bi_99food_pedidos p
-            LEFT JOIN bi_99food_itens i ON i.pedido_id = p.pedido_id
-            WHERE {where}
-            GROUP BY strftime('%H', p.data_hora_pedido)
-            ORDER BY hora
-            """,
-            parametros,
-        ).fetchall()
-
-        vendas_semana = conn.execute(
-            f"""
-            SELECT
-                CASE cast(strftime('%w', p.data_hora_pedido) as integer)
-                    WHEN 0 THEN 'Domingo'
-                    WHEN 1 THEN 'Segunda'
-                    WHEN 2 THEN 'Terça'
-                    WHEN 3 THEN 'Quarta'
-                    WHEN 4 THEN 'Quinta'
-                    WHEN 5 THEN 'Sexta'
-                    ELSE 'Sábado'
-                END AS dia_semana,
-                COALESCE(SUM(i.receita_item), 0) AS valor
-            FROM bi_99food_pedidos p
-            LEFT JOIN bi_99food_itens i ON i.pedido_id = p.pedido_id
+# Painéis do dashboard -> seção do resultado completo ('kpis' fica na raiz)
+PAINEIS_DASHBOARD = {
+    "kpis": None,
+    "faturamento_por_dia": "graficos",
+    "pedidos_por_hora": "graficos",
+    "vendas_por_dia_semana": "graficos",
+    "ranking_faturamento": "produtos",
+    "ranking_quantidade": "produtos",
+}
+
+# Uma consulta por painel sobre os rollups; `{tabela}` e `{where}` vêm de _filtros_rollups
+_SQL_PAINEIS_ROLLUPS = {
+    "kpis": """
+        SELECT
+            COALESCE(SUM(receita), 0) AS faturamento_total,
+            COALESCE(SUM(pedidos), 0) AS total_pedidos,
+            COALESCE(SUM(quantidade), 0) AS total_itens_vendidos,
+            CASE
+                WHEN COALESCE(SUM(pedidos), 0) = 0 THEN 0
+                ELSE COALESCE(SUM(receita), 0) / SUM(pedidos)
+            END AS ticket_medio
+        FROM {tabela}
+        WHERE {where}
+    """,
+    "faturamento_por_dia": """
+        SELECT dia, SUM(receita) AS valor
+        FROM {tabela}
+        WHERE {where}
+        GROUP BY dia
+        ORDER BY dia
+    """,
+    "pedidos_por_hora": """
+        SELECT hora, SUM(pedidos) AS pedidos
+        FROM {tabela}
+        WHERE {where}
+        GROUP BY hora
+        ORDER BY hora
+    """,
+    "vendas_por_dia_semana": """
+        SELECT
+            CASE dia_semana
+                WHEN 0 THEN 'Domingo'
+                WHEN 1 THEN 'Segunda'
+                WHEN 2 THEN 'Terça'
+                WHEN 3 THEN 'Quarta'
+                WHEN 4 THEN 'Quinta'
+                WHEN 5 THEN 'Sexta'
+                ELSE 'Sábado'
+            END AS dia_semana,
+            SUM(receita) AS valor
+        FROM {tabela}
+        WHERE {where}
+        GROUP BY {tabela}.dia_semana
+        ORDER BY {tabela}.dia_semana
+    """,
+    # Os rankings sempre vêm da granularidade por produto: agrupam pela chave
+    # inteira e só os grupos buscam o nome (empates em ordem alfabética)
+    "ranking_faturamento": """
+        SELECT pr.nome AS nome_item, r.valor
+        FROM (
+            SELECT produto_id, SUM(receita) AS valor
+            FROM bi_rollup_hora_produto
             WHERE {where}
-            GROUP BY strftime('%w', p.data_hora_pedido)
-            ORDER BY cast(strftime('%w', p.data_hora_pedido) as integer)
-            """,
-            parametros,
-        ).fetchall()
-
-        ranking_faturamento = conn.execute(
-            f"""
-            SELECT i.nome_item, COALESCE(SUM(i.receita_item), 0) AS valor
-            FROM bi_99food_pedidos p
-            JOIN bi_99food_itens i ON i.pedido_id = p.pedido_id
+            GROUP BY produto_id
+        ) r
+        JOIN bi_produtos pr ON pr.id = r.produto_id
+        ORDER BY r.valor DESC, pr.nome
+        LIMIT {limite}
+    """,
+    "ranking_quantidade": """
+        SELECT pr.nome AS nome_item, r.quantidade
+        FROM (
+            SELECT produto_id, SUM(quantidade) AS quantidade
+            FROM bi_rollup_hora_produto
             WHERE {where}
-            GROUP BY i.nome_item
-            ORDER BY valor DESC
-            LIMIT 10
-            """,
-            parametros,
-        ).fetchall()
-
-        ranking_quantidade = conn.execute(
-            f"""
-            SELECT i.nome_item, COALESCE(SUM(i.quantidade_vendida), 0) AS quantidade
-            FROM bi_99food_pedidos p
-            JOIN bi_99food_itens i ON i.pedido_id = p.pedido_id
+            GROUP BY produto_id
+        ) r
+        JOIN bi_produtos pr ON pr.id = r.produto_id
+        ORDER BY r.quantidade DESC, pr.nome
+        LIMIT {limite}
+    """,
+}
+
+
+def _painel_rollups(
+    conn: sqlite3.Connection,
+    painel: str,
+    tabela: str,
+    where: str,
+    parametros: list[Any],
+    limite: int | None = TAMANHO_RANKING,
+) -> Any:
+    # LIMIT -1: sem corte (rankings parciais de uma loja, ver _consolidar)
+    sql = _SQL_PAINEIS_ROLLUPS[painel].format(tabela=tabela, where=where, limite=-1 if limite is None else limite)
+    cursor = conn.execute(sql, parametros)
+    if painel == "kpis":
+        return dict(cursor.fetchone())
+    return [dict(linha) for linha in cursor.fetchall()]
+
+
+def _montar_dashboard(paineis: dict[str, Any]) -> dict[str, Any]:
+    """Dashboard completo a partir dos painéis avulsos."""
+    dashboard: dict[str, Any] = {"kpis": paineis["kpis"], "graficos": {}, "produtos": {}}
+    for painel, secao in PAINEIS_DASHBOARD.items():
+        if secao is not None:
+            dashboard[secao][painel] = paineis[painel]
+    return dashboard
+
+
+def extrair_painel(dashboard: dict[str, Any], painel: str) -> Any:
+    """Um painel do dashboard completo (ver PAINEIS_DASHBOARD)."""
+    secao = PAINEIS_DASHBOARD[painel]
+    return dashboard[painel] if secao is None else dashboard[secao][painel]
+
+
+# Série ou ranking -> (campo da chave, campo somado) na combinação entre lojas
+_COMBINACAO_PAINEIS = {
+    "faturamento_por_dia": ("dia", "valor"),
+    "pedidos_por_hora": ("hora", "pedidos"),
+    "vendas_por_dia_semana": ("dia_semana", "valor"),
+    "ranking_faturamento": ("nome_item", "valor"),
+    "ranking_quantidade": ("nome_item", "quantidade"),
+}
+
+
+def combinar_paineis(painel: str, parciais: list[Any], limite: int | None = TAMANHO_RANKING) -> Any:
+    """Soma o mesmo painel de várias lojas (ou partições), com a ordenação do painel de uma só.
+
+    Os rankings parciais precisam vir sem corte: o corte em `limite` só é feito
+    aqui, depois da soma (um produto fora do top de cada loja pode estar no top
+    do conjunto).
+    """
+    if painel == "kpis":
+        kpis = {
+            campo: sum(parcial[campo] for parcial in parciais)
+            for campo in ("faturamento_total", "total_pedidos", "total_itens_vendidos")
+        }
+        kpis["ticket_medio"] = kpis["faturamento_total"] / kpis["total_pedidos"] if kpis["total_pedidos"] else 0
+        return kpis
+
+    chave, campo = _COMBINACAO_PAINEIS[painel]
+    somas: dict[Any, Any] = {}
+    for parcial in parciais:
+        for linha in parcial:
+            somas[linha[chave]] = somas.get(linha[chave], 0) + linha[campo]
+    if painel.startswith("ranking_"):
+        ordem = sorted(somas.items(), key=lambda item: (-item[1], item[0]))[:limite]
+    elif painel == "vendas_por_dia_semana":
+        ordem = sorted(somas.items(), key=lambda item: _ORDEM_DIA_SEMANA.index(item[0]))
+    else:
+        ordem = sorted(somas.items(), key=lambda item: (item[0] is not None, item[0] or ""))
+    return [{chave: valor_chave, campo: valor} for valor_chave, valor in ordem]
+
+
+def combinar_dashboards(parciais: list[dict[str, Any]], limite: int | None = TAMANHO_RANKING) -> dict[str, Any]:
+    """Dashboard do conjunto de lojas (ou partições) a partir dos dashboards parciais de cada uma."""
+    return _montar_dashboard(
+        {
+            painel: combinar_paineis(painel, [extrair_painel(parcial, painel) for parcial in parciais], limite)
+            for painel in PAINEIS_DASHBOARD
+        }
+    )
+
+
+R = TypeVar("R")
+
+
+def _consolidar(loja: str | None, calcular: Callable[[int | None], R], combinar: Callable[[list[R]], R]) -> R:
+    """Resultado de `calcular(limite_ranking)` numa loja ou, sem `loja`, em todas combinadas.
+
+    Com uma loja só, a consulta roda apenas no shard dela, já com o corte dos
+    rankings. Com várias, cada shard calcula em paralelo (`em_cada_loja`) os
+    agregados parciais sem corte e `combinar` os soma.
+    """
+    lojas = [loja] if loja else listar_lojas()
+    if len(lojas) == 1:
+        return em_cada_loja(lambda: calcular(TAMANHO_RANKING), lojas)[lojas[0]]
+    return combinar(list(em_cada_loja(lambda: calcular(None), lojas).values()))
+
+
+def carregar_dashboard(
+    provedor: str,
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    usar_rollups: bool = True,
+    loja: str | None = None,
+    todo_periodo: bool = False,
+) -> dict[str, Any]:
+    """Retorna KPIs e séries para o dashboard analítico de um provedor.
+
+    Por padrão lê das tabelas de rollup (dia × hora × produto), mantidas pela
+    importação; com `usar_rollups=False`, calcula direto das tabelas brutas.
+    Com `loja`, lê só o shard dela; sem, consolida todas as lojas. Sem datas,
+    cobre só os meses quentes de cada loja (bi.particoes), salvo com `todo_periodo`.
+    """
+    provedor = obter_provedor(provedor).slug
+
+    def calcular(limite: int | None) -> dict[str, Any]:
+        with get_connection() as conn:
+            inicio, fim = particoes.periodo_efetivo(conn, data_inicial, data_final, todo_periodo)
+        if not usar_rollups:
+            return _dashboard_tabelas_brutas(provedor, inicio, fim, produto, limite)
+        tabela, where, parametros = _filtros_rollups(provedor, inicio, fim, produto)
+        with get_connection() as conn:
+            paineis = {
+                painel: _painel_rollups(conn, painel, tabela, where, parametros, limite)
+                for painel in PAINEIS_DASHBOARD
+            }
+        return _montar_dashboard(paineis)
+
+    return _com_provedores(_consolidar(loja, calcular, combinar_dashboards), provedor)
+
+
+def carregar_painel(
+    provedor: str,
+    painel: str,
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    usar_rollups: bool = True,
+    loja: str | None = None,
+    todo_periodo: bool = False,
+) -> Any:
+    """Só um painel do dashboard: KPIs (dict), uma série ou um ranking (lista).
+
+    Pelos rollups roda apenas a consulta do painel; pelas tabelas brutas, a
+    junção é lida uma vez de qualquer forma e o painel sai do resultado completo.
+    Lojas e período padrão como em `carregar_dashboard`.
+    """
+    provedor = obter_provedor(provedor).slug
+    if painel not in PAINEIS_DASHBOARD:
+        raise ValueError(f"Painel desconhecido: '{painel}'. Use: {', '.join(PAINEIS_DASHBOARD)}.")
+
+    def calcular(limite: int | None) -> Any:
+        with get_connection() as conn:
+            inicio, fim = particoes.periodo_efetivo(conn, data_inicial, data_final, todo_periodo)
+        if not usar_rollups:
+            return extrair_painel(_dashboard_tabelas_brutas(provedor, inicio, fim, produto, limite), painel)
+        tabela, where, parametros = _filtros_rollups(provedor, inicio, fim, produto)
+        with get_connection() as conn:
+            return _painel_rollups(conn, painel, tabela, where, parametros, limite)
+
+    return _consolidar(loja, calcular, lambda parciais: combinar_paineis(painel, parciais))
+
+
+def carregar_dashboard_99food(
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    usar_rollups: bool = True,
+    todo_periodo: bool = False,
+) -> dict[str, Any]:
+    return carregar_dashboard(
+        PROVEDOR_99FOOD.slug, data_inicial, data_final, produto, usar_rollups, todo_periodo=todo_periodo
+    )
+
+
+def _com_provedores(dashboard: dict[str, Any], provedor: str) -> dict[str, Any]:
+    """Acrescenta as chaves de provedores ao dashboard completo do `provedor`.
+
+    `provedores_futuros` mantém o formato original: os outros provedores, ainda
+    fora deste dashboard (no da 99Food, iFood e Keeta). `provedores` é o registro inteiro.
+    """
+    resumo = [{"slug": registrado.slug, "nome": registrado.nome} for registrado in listar_provedores()]
+    dashboard["provedores_futuros"] = [item for item in resumo if item["slug"] != provedor]
+    dashboard["provedores"] = resumo
+    return dashboard
+
+
+_NOMES_DIA_SEMANA = ("Domingo", "Segunda", "Terça", "Quarta", "Quinta", "Sexta")
+_ORDEM_DIA_SEMANA = (*_NOMES_DIA_SEMANA, "Sábado")
+
+
+def _filtros_tabelas_brutas(
+    provedor: str, data_inicial: str | None, data_final: str | None, produto: str | None
+) -> tuple[str, list[Any]]:
+    """Monta o WHERE sobre as tabelas brutas com predicados de intervalo.
+
+    O período compara a coluna gerada `dia` (gravada junto com o pedido), que abre
+    o índice idx_bi_pedidos_tempo (provedor, dia, hora, epoch); nenhuma função de
+    data roda por linha.
+    """
+    filtros: list[str] = ["p.provedor = ?"]
+    parametros: list[Any] = [provedor]
+
+    if data_inicial:
+        filtros.append("p.dia >= date(?)")
+        parametros.append(data_inicial)
+    if data_final:
+        filtros.append("p.dia <= date(?)")
+        parametros.append(data_final)
+    if produto:
+        filtros.append(f"i.produto_id = ({_SQL_CHAVE_PRODUTO})")
+        parametros.extend((provedor, produto))
+
+    return " AND ".join(filtros), parametros
+
+
+def _sql_dashboard_tabelas_brutas(where: str, esquema: str = particoes.ESQUEMA_QUENTE) -> str:
+    """Consulta única: a junção filtrada é materializada uma vez e todas as agregações leem dela.
+
+    Agrupa pelas colunas já calculadas dia/hora/dia_semana e conta pedidos pela chave inteira.
+    `esquema` é a partição lida (ver bi.particoes); bi_produtos vem sempre do shard.
+    """
+    return f"""
+        WITH base AS MATERIALIZED (
+            SELECT p.id AS pedido, p.dia, p.hora, p.dia_semana, i.produto_id, i.receita_item, i.quantidade_vendida
+            FROM {esquema}.bi_pedidos p
+            LEFT JOIN {esquema}.bi_itens i ON i.provedor = p.provedor AND i.pedido_id = p.pedido_id
             WHERE {where}
-            GROUP BY i.nome_item
-            ORDER BY quantidade DESC
-            LIMIT 10
-            """,
-            parametros,
-        ).fetchall()
-
-        produtos = conn.execute(
-            """
-            SELECT DISTINCT nome_item
-            FROM bi_99food_itens
-            ORDER BY nome_item
-            """
-        ).fetchall()
+        )
+        SELECT
+            'kpis' AS painel,
+            NULL AS chave,
+            COALESCE(SUM(receita_item), 0) AS valor,
+            COUNT(DISTINCT pedido) AS pedidos,
+            COALESCE(SUM(quantidade_vendida), 0) AS quantidade,
+            CASE
+                WHEN COUNT(DISTINCT pedido) = 0 THEN 0
+                ELSE COALESCE(SUM(receita_item), 0) / COUNT(DISTINCT pedido)
+            END AS ticket_medio
+        FROM base
+        UNION ALL
+        SELECT 'dia', dia, COALESCE(SUM(receita_item), 0), NULL, NULL, NULL
+        FROM base
+        GROUP BY dia
+        UNION ALL
+        SELECT 'hora', printf('%02d', hora), NULL, COUNT(DISTINCT pedido), NULL, NULL
+        FROM base
+        GROUP BY hora
+        UNION ALL
+        SELECT 'semana', dia_semana, COALESCE(SUM(receita_item), 0), NULL, NULL, NULL
+        FROM base
+        GROUP BY dia_semana
+        UNION ALL
+        SELECT 'produto', pr.nome, r.valor, NULL, r.quantidade, NULL
+        FROM (
+            SELECT produto_id, COALESCE(SUM(receita_item), 0) AS valor, COALESCE(SUM(quantidade_vendida), 0) AS quantidade
+            FROM base
+            WHERE produto_id IS NOT NULL
+            GROUP BY produto_id
+        ) r
+        JOIN bi_produtos pr ON pr.id = r.produto_id
+    """
+
+
+def _dashboard_tabelas_brutas(
+    provedor: str,
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    produto: str | None = None,
+    limite_ranking: int | None = TAMANHO_RANKING,
+) -> dict[str, Any]:
+    """Calcula o dashboard direto das tabelas brutas (referência para os rollups).
+
+    Lê a junção pedidos × itens uma única vez em cada partição mensal que o
+    período alcança (sem datas, todas); com mais de uma, os parciais são somados
+    como os de várias lojas. O formato é o do dashboard dos rollups. Com
+    `limite_ranking=None`, os rankings trazem todos os produtos.
+    """
+    where, parametros = _filtros_tabelas_brutas(provedor, data_inicial, data_final, produto)
+    with get_connection() as conn:
+        alcancadas = particoes.particoes_do_periodo(conn, data_inicial, data_final)
+        parciais = []
+        for particao in alcancadas:
+            with particoes.anexar(conn, particao) as esquema:
+                parciais.append(
+                    _dashboard_da_particao(
+                        conn, esquema, where, parametros, limite_ranking if len(alcancadas) == 1 else None
+                    )
+                )
+    if len(parciais) == 1:
+        return parciais[0]
+    return combinar_dashboards(parciais, limite_ranking)
+
+
+def _dashboard_da_particao(
+    conn: sqlite3.Connection, esquema: str, where: str, parametros: list[Any], limite_ranking: int | None
+) -> dict[str, Any]:
+    kpis: dict[str, Any] = {}
+    faturamento_por_dia: list[dict[str, Any]] = []
+    pedidos_por_hora: list[dict[str, Any]] = []
+    vendas_semana: list[tuple[int | None, Any]] = []
+    produtos_agregados: list[tuple[str, Any, Any]] = []
+
+    for painel, chave, valor, pedidos, quantidade, ticket_medio in conn.execute(
+        _sql_dashboard_tabelas_brutas(where, esquema), parametros
+    ):
+        if painel == "kpis":
+            kpis = {
+                "faturamento_total": valor,
+                "total_pedidos": pedidos,
+                "total_itens_vendidos": quantidade,
+                "ticket_medio": ticket_medio,
+            }
+        elif painel == "dia":
+            faturamento_por_dia.append({"dia": chave, "valor": valor})
+        elif painel == "hora":
+            pedidos_por_hora.append({"hora": chave, "pedidos": pedidos})
+        elif painel == "semana":
+            vendas_semana.append((chave, valor))
+        else:
+            produtos_agregados.append((chave, valor, quantidade))
+
+    # Mesma ordenação das consultas separadas: NULL antes dos demais valores
+    faturamento_por_dia.sort(key=lambda item: (item["dia"] is not None, item["dia"] or ""))
+    pedidos_por_hora.sort(key=lambda item: (item["hora"] is not None, item["hora"] or ""))
+    vendas_semana.sort(key=lambda item: (item[0] is not None, item[0] or 0))
+    # Ordenação estável: empates no ranking ficam em ordem alfabética
+    produtos_agregados.sort(key=lambda item: item[0])
+    ranking_faturamento = sorted(produtos_agregados, key=lambda item: item[1], reverse=True)[:limite_ranking]
+    ranking_quantidade = sorted(produtos_agregados, key=lambda item: item[2], reverse=True)[:limite_ranking]
 
     return {
-        "kpis": dict(kpis),
+        "kpis": kpis,
         "graficos": {
-            "faturamento_por_dia": [dict(item) for item in faturamento_por_dia],
-            "pedidos_por_hora": [dict(item) for item in pedidos_por_hora],
-            "vendas_por_dia_semana": [dict(item) for item in vendas_semana],
+            "faturamento_por_dia": faturamento_por_dia,
+            "pedidos_por_hora": pedidos_por_hora,
+            "vendas_por_dia_semana": [
+                {
+                    "dia_semana": _NOMES_DIA_SEMANA[dia] if dia is not None and 0 <= dia < 6 else "Sábado",
+                    "valor": valor,
+                }
+                for dia, valor in vendas_semana
+            ],
         },
         "produtos": {
-            "ranking_faturamento": [dict(item) for item in ranking_faturamento],
-            "ranking_quantidade": [dict(item) for item in ranking_quantidade],
-            "filtro": [item[0] for item in produtos],
+            "ranking_faturamento": [{"nome_item": nome, "valor": valor} for nome, valor, _ in ranking_faturamento],
+            "ranking_quantidade": [{"nome_item": nome, "quantidade": quantidade} for nome, _, quantidade in ranking_quantidade],
         },
-        "provedores_futuros": [p.__dict__ for p in PROVEDORES_FUTUROS],
     }
@@ -0,0 +1,38 @@
+"""Importação sob demanda de dependências pesadas.
+
+O pandas leva centenas de milissegundos para importar e só é usado na
+importação de relatórios. Com `modulo_sob_demanda("pandas")`, o módulo é
+importado no primeiro acesso a um atributo (ex.: `pd.DataFrame`), então o
+servidor web sobe e responde o dashboard sem carregá-lo.
+"""
+
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+from typing import Any
+
+
+class ModuloSobDemanda:
+    """Representa um módulo e o importa no primeiro acesso a um atributo.
+
+    O lock de importação do Python serializa o primeiro acesso entre threads;
+    os seguintes leem o módulo já guardado.
+    """
+
+    def __init__(self, nome: str) -> None:
+        self._nome = nome
+        self._modulo: ModuleType | None = None
+
+    def __getattr__(self, atributo: str) -> Any:
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nome)
+        return getattr(self._modulo, atributo)
+
+    def __repr__(self) -> str:
+        estado = "importado" if self._modulo is not None else "sob demanda"
+        return f"<módulo {self._nome!r} ({estado})>"
+
+
+def modulo_sob_demanda(nome: str) -> ModuloSobDemanda:
+    return ModuloSobDemanda(nome)
@@ -1,81 +1,1005 @@
 """Camada de persistência do sistema financeiro.
 
 Este módulo centraliza:
-- Caminho do banco SQLite em /data
-- Conexão com o banco
-- Criação automática das tabelas
+- Caminho do banco SQLite em /data, com um arquivo (shard) por loja
+- Conexão com o banco (pool por thread + conexão dedicada de escrita, modo WAL),
+  roteada para o shard da loja atual
+- Consultas em todas as lojas em paralelo (`em_cada_loja`)
+- Medição de cada comando SQL (métricas e log de consultas lentas)
+- Criação automática das tabelas e migrações versionadas do esquema
 """
 
 from __future__ import annotations
 
+import logging
+import os
+import queue
+import re
 import sqlite3
+import threading
+import time
+import unicodedata
+import weakref
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TypeVar
+
+import metricas
 
 # Diretórios do projeto
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 DB_PATH = DATA_DIR / "financeiro.db"
+# Estado da fila de importação fica em arquivo próprio: atualizar o progresso
+# não pode disputar o lock de escrita com a transação da importação em curso
+JOBS_DB_PATH = DATA_DIR / "jobs.db"
+
+# Cada loja tem o próprio arquivo com todas as tabelas (lançamentos e BI): a loja
+# padrão continua em DB_PATH e as demais ficam em DATA_DIR/lojas/<loja>.db.
+# A loja é a chave do shard; as linhas não repetem a loja numa coluna.
+LOJA_PADRAO = "principal"
+_RE_LOJA = re.compile(r"[a-z0-9][a-z0-9_-]{0,39}")
+_loja_atual: ContextVar[str] = ContextVar("loja_atual", default=LOJA_PADRAO)
+
+T = TypeVar("T")
+
+
+def usar_diretorio_dados(pasta: Path) -> None:
+    """Aponta DATA_DIR e os bancos para outra pasta (benchmarks, bancos temporários)."""
+    global DATA_DIR, DB_PATH, JOBS_DB_PATH
+    DATA_DIR = Path(pasta)
+    DB_PATH = DATA_DIR / "financeiro.db"
+    JOBS_DB_PATH = DATA_DIR / "jobs.db"
+
+
+@dataclass
+class ConfiguracaoSQLite:
+    """Parâmetros das conexões; os padrões podem ser trocados por variáveis de ambiente."""
+
+    max_conexoes: int = int(os.environ.get("SQLITE_POOL_MAX", 32))
+    # Threads que consultam os shards das lojas ao mesmo tempo (em_cada_loja)
+    workers_lojas: int = int(os.environ.get("SQLITE_WORKERS_LOJAS", 8))
+    cache_size_kib: int = int(os.environ.get("SQLITE_CACHE_SIZE_KIB", 20_000))
+    mmap_size: int = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    busy_timeout_ms: int = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 30_000))
+    espera_pool_segundos: float = 30.0
+    # Histograma de duração por comando SQL (SQLITE_METRICAS=0 desliga)
+    metricas: bool = os.environ.get("SQLITE_METRICAS", "1") != "0"
+    # Comandos que levarem ao menos este tempo vão para o log "database.consultas_lentas" (0 desliga)
+    consulta_lenta_ms: float = float(os.environ.get("SQLITE_CONSULTA_LENTA_MS", 0))
+    # Segundos que a lista de lojas e as versões dos dados ficam em memória (0 desliga);
+    # gravações de outros processos aparecem depois disso
+    ttl_versoes_segundos: float = float(os.environ.get("SQLITE_VERSOES_TTL", 1.0))
+
+
+CONFIGURACAO = ConfiguracaoSQLite()
+
+METRICA_SQL = "sqlite_consulta_segundos"
+metricas.registrar_histograma(METRICA_SQL, "Duração de cada comando SQL (execução + leitura das linhas).")
+
+_log_consultas_lentas = logging.getLogger("database.consultas_lentas")
+_log_migracoes = logging.getLogger("database.migracoes")
+
+# Máximo de comandos distintos com série própria; os demais caem em "outras"
+LIMITE_ASSINATURAS_SQL = 500
+_assinaturas: dict[str, str] = {}
+_assinaturas_conhecidas: set[str] = set()
+_RE_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _assinatura_sql(sql: str) -> str:
+    """Texto do comando sem literais nem espaços repetidos, usado como rótulo da métrica."""
+    assinatura = _assinaturas.get(sql)
+    if assinatura is None:
+        assinatura = " ".join(_RE_LITERAIS.sub("?", sql).split())[:200]
+        if assinatura not in _assinaturas_conhecidas:
+            if len(_assinaturas_conhecidas) >= LIMITE_ASSINATURAS_SQL:
+                assinatura = "outras"
+            else:
+                _assinaturas_conhecidas.add(assinatura)
+        if len(_assinaturas) < 4 * LIMITE_ASSINATURAS_SQL:
+            _assinaturas[sql] = assinatura
+    return assinatura
+
+
+class _CursorMedido(sqlite3.Cursor):
+    """Cursor que mede cada comando: execute/executemany mais as leituras (fetch*) das linhas.
+
+    O trace callback do sqlite3 só avisa o início do comando e a biblioteca padrão
+    não expõe o profile do SQLite, então a medição envolve o cursor. O tempo é
+    registrado quando as linhas se esgotam, no próximo comando ou quando o cursor
+    é descartado. Iterar o cursor diretamente (`for linha in cursor`) não soma o
+    tempo de leitura.
+    """
+
+    _sql: str | None = None
+    _duracao = 0.0
+
+    def _concluir(self) -> None:
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            _registrar_comando(self.connection, sql, self._duracao)
+
+    def _medir_comando(self, comando, sql: str, parametros) -> sqlite3.Cursor:
+        self._concluir()
+        inicio = time.perf_counter()
+        try:
+            return comando(sql, parametros)
+        finally:
+            self._sql, self._duracao = sql, time.perf_counter() - inicio
+
+    def _medir_leitura(self, leitura, *args):
+        inicio = time.perf_counter()
+        try:
+            return leitura(*args)
+        finally:
+            self._duracao += time.perf_counter() - inicio
+
+    def execute(self, sql: str, parametros=(), /) -> sqlite3.Cursor:
+        return self._medir_comando(super().execute, sql, parametros)
+
+    def executemany(self, sql: str, parametros, /) -> sqlite3.Cursor:
+        return self._medir_comando(super().executemany, sql, parametros)
+
+    def fetchone(self):
+        linha = self._medir_leitura(super().fetchone)
+        if linha is None:
+            self._concluir()
+        return linha
+
+    def fetchmany(self, size: int | None = None):
+        linhas = self._medir_leitura(super().fetchmany, self.arraysize if size is None else size)
+        if not linhas:
+            self._concluir()
+        return linhas
+
+    def fetchall(self):
+        linhas = self._medir_leitura(super().fetchall)
+        self._concluir()
+        return linhas
+
+    def close(self) -> None:
+        self._concluir()
+        super().close()
+
+    def __del__(self) -> None:
+        self._concluir()
+
+
+class _ConexaoMedida(sqlite3.Connection):
+    """Conexão cujos comandos (inclusive `conn.execute`) passam por `_CursorMedido`."""
+
+    banco = ""
+    medir = True
+    consulta_lenta_s = 0.0
+
+    def cursor(self, factory=_CursorMedido) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parametros=(), /) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql: str, parametros, /) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, parametros)
+
+
+def _registrar_comando(conexao: _ConexaoMedida, sql: str, duracao: float) -> None:
+    if conexao.medir:
+        metricas.observar(METRICA_SQL, duracao, banco=conexao.banco, consulta=_assinatura_sql(sql))
+    if conexao.consulta_lenta_s and duracao >= conexao.consulta_lenta_s:
+        _log_consultas_lentas.warning("%.1f ms em %s: %s", duracao * 1000, conexao.banco, " ".join(sql.split()))
+
+
+class _ConexaoDaThread:
+    """Guarda a conexão emprestada a uma thread e a devolve ao pool quando a thread termina."""
+
+    def __init__(self, pool: PoolConexoes, conexao: sqlite3.Connection) -> None:
+        self.conexao = conexao
+        self._finalizador = weakref.finalize(self, pool._devolver, conexao)
+
+    def devolver(self) -> None:
+        self._finalizador()
+
+
+class PoolConexoes:
+    """Pool limitado de conexões SQLite de um arquivo.
+
+    - Leitura: cada thread recebe uma conexão própria, reaproveitada entre chamadas
+      e devolvida ao pool quando a thread termina (ou em `liberar_conexao`).
+    - Escrita: uma conexão dedicada, usada por uma thread de cada vez. Em modo WAL
+      leitores não bloqueiam o escritor, então importações e dashboard rodam juntos.
+    """
+
+    def __init__(self, caminho: Path, configuracao: ConfiguracaoSQLite = CONFIGURACAO) -> None:
+        self.caminho = caminho
+        self.configuracao = configuracao
+        self._locais = threading.local()
+        self._ociosas: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._vagas = threading.BoundedSemaphore(configuracao.max_conexoes)
+        self._trava_escrita = threading.RLock()
+        self._escritor: sqlite3.Connection | None = None
+
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        conexao = self._abrir()
+        # WAL é persistente no arquivo; basta ativar uma vez
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.close()
+
+    def _abrir(self) -> sqlite3.Connection:
+        configuracao = self.configuracao
+        # check_same_thread=False: a conexão troca de dono ao voltar ao pool,
+        # mas nunca é usada por duas threads ao mesmo tempo. uri=True: ATTACH aceita
+        # URIs com parâmetros (meses arquivados do BI anexados com mode=ro, ver bi.particoes)
+        instrumentada = configuracao.metricas or configuracao.consulta_lenta_ms > 0
+        conexao = sqlite3.connect(
+            self.caminho.resolve().as_uri(),
+            uri=True,
+            timeout=configuracao.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            factory=_ConexaoMedida if instrumentada else sqlite3.Connection,
+        )
+        if instrumentada:
+            conexao.banco = self.caminho.name
+            conexao.medir = configuracao.metricas
+            conexao.consulta_lenta_s = configuracao.consulta_lenta_ms / 1000
+        conexao.row_factory = sqlite3.Row
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        conexao.execute(f"PRAGMA cache_size=-{int(configuracao.cache_size_kib)}")
+        conexao.execute(f"PRAGMA mmap_size={int(configuracao.mmap_size)}")
+        conexao.execute(f"PRAGMA busy_timeout={int(configuracao.busy_timeout_ms)}")
+        conexao.execute("PRAGMA temp_store=MEMORY")
+        return conexao
+
+    def conexao_da_thread(self) -> sqlite3.Connection:
+        emprestada: _ConexaoDaThread | None = getattr(self._locais, "emprestada", None)
+        if emprestada is not None:
+            return emprestada.conexao
+
+        if not self._vagas.acquire(timeout=self.configuracao.espera_pool_segundos):
+            raise RuntimeError(f"Pool de conexões esgotado ({self.configuracao.max_conexoes} conexões em uso).")
+        try:
+            conexao = self._ociosas.get_nowait()
+        except queue.Empty:
+            try:
+                conexao = self._abrir()
+            except Exception:
+                self._vagas.release()
+                raise
+        self._locais.emprestada = _ConexaoDaThread(self, conexao)
+        return conexao
+
+    def _devolver(self, conexao: sqlite3.Connection) -> None:
+        if conexao.in_transaction:
+            conexao.rollback()
+        self._ociosas.put(conexao)
+        self._vagas.release()
+
+    def liberar_conexao_da_thread(self) -> None:
+        emprestada: _ConexaoDaThread | None = getattr(self._locais, "emprestada", None)
+        if emprestada is not None:
+            del self._locais.emprestada
+            emprestada.devolver()
+
+    @contextmanager
+    def escrita(self) -> Iterator[sqlite3.Connection]:
+        with self._trava_escrita:
+            if self._escritor is None:
+                self._escritor = self._abrir()
+            conexao = self._escritor
+            # Reentrante: blocos aninhados participam da transação do bloco externo
+            externo = conexao.in_transaction
+            try:
+                yield conexao
+                if not externo:
+                    conexao.commit()
+            except BaseException:
+                if not externo:
+                    conexao.rollback()
+                raise
+
+    def fechar(self) -> None:
+        with self._trava_escrita:
+            if self._escritor is not None:
+                self._escritor.close()
+                self._escritor = None
+        while True:
+            try:
+                self._ociosas.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def pasta_lojas() -> Path:
+    return DATA_DIR / "lojas"
+
+
+def loja_atual() -> str:
+    """Loja cujo shard `get_connection()` e `conexao_escrita()` usam sem `caminho`."""
+    return _loja_atual.get()
+
+
+def caminho_loja(loja: str | None = None) -> Path:
+    """Arquivo do shard da loja (padrão: a loja atual)."""
+    loja = loja or _loja_atual.get()
+    if loja == LOJA_PADRAO:
+        return DB_PATH
+    if not _RE_LOJA.fullmatch(loja):
+        raise ValueError(f"Loja inválida: '{loja}'. Use letras minúsculas, números, '-' ou '_'.")
+    return pasta_lojas() / f"{loja}.db"
+
+
+@contextmanager
+def usar_loja(loja: str) -> Iterator[str]:
+    """Roteia as conexões do bloco (nesta thread ou tarefa) para o shard da loja."""
+    caminho_loja(loja)
+    token = _loja_atual.set(loja)
+    try:
+        yield loja
+    finally:
+        _loja_atual.reset(token)
+
+
+def _lojas_configuradas() -> list[str]:
+    return [loja.strip() for loja in os.environ.get("LOJAS", "").split(",") if loja.strip()]
+
+
+_lojas_em_memoria: dict[Path, tuple[list[str], float]] = {}
+
+
+def listar_lojas() -> list[str]:
+    """Lojas com shard: a padrão primeiro, depois as demais em ordem alfabética.
+
+    A lista fica em memória por CONFIGURACAO.ttl_versoes_segundos; `criar_loja` a descarta.
+    """
+    guardada = _lojas_em_memoria.get(DATA_DIR)
+    if guardada is not None and guardada[1] > time.monotonic():
+        return list(guardada[0])
+    pasta = pasta_lojas()
+    existentes = {arquivo.stem for arquivo in pasta.glob("*.db")} if pasta.is_dir() else set()
+    lojas = [LOJA_PADRAO, *sorted(loja for loja in existentes if _RE_LOJA.fullmatch(loja) and loja != LOJA_PADRAO)]
+    _lojas_em_memoria[DATA_DIR] = (lojas, time.monotonic() + CONFIGURACAO.ttl_versoes_segundos)
+    return list(lojas)
+
+
+_pools: dict[Path, PoolConexoes] = {}
+_trava_pools = threading.Lock()
+
+
+def obter_pool(caminho: Path | None = None) -> PoolConexoes:
+    """Pool do arquivo informado (padrão: shard da loja atual), criado na primeira chamada."""
+    caminho = Path(caminho or caminho_loja())
+    pool = _pools.get(caminho)
+    if pool is None:
+        with _trava_pools:
+            pool = _pools.get(caminho)
+            if pool is None:
+                pool = _pools[caminho] = PoolConexoes(caminho)
+    return pool
+
+
+def get_connection(caminho: Path | None = None) -> sqlite3.Connection:
+    """Retorna a conexão SQLite da thread atual, com acesso por nome de coluna.
+
+    Sem `caminho`, usa o shard da loja atual (ver `usar_loja`; padrão: DB_PATH). A conexão é reaproveitada:
+    use `with get_connection() as conn:` para commit/rollback, sem fechá-la.
+    Para gravações, prefira `conexao_escrita()`.
+    """
+    return obter_pool(caminho).conexao_da_thread()
+
+
+@contextmanager
+def conexao_escrita(caminho: Path | None = None) -> Iterator[sqlite3.Connection]:
+    """Empresta a conexão dedicada de escrita; faz commit ao sair (rollback em erro).
+
+    Ao sair, descarta as versões dos dados guardadas em memória.
+    """
+    try:
+        with obter_pool(caminho).escrita() as conexao:
+            yield conexao
+    finally:
+        _descartar_versoes()
+
+
+def liberar_conexao(caminho: Path | None = None) -> None:
+    """Devolve ao pool a conexão de leitura da thread atual (ex.: ao fim de uma requisição).
+
+    Sem `caminho`, devolve as conexões da thread em todos os bancos (uma requisição
+    pode ter lido vários shards).
+    """
+    pools = [_pools.get(Path(caminho))] if caminho else list(_pools.values())
+    for pool in pools:
+        if pool is not None:
+            pool.liberar_conexao_da_thread()
+
+
+def fechar_conexoes() -> None:
+    """Fecha as conexões ociosas e de escrita de todos os pools."""
+    with _trava_pools:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.fechar()
+
+
+_executor_lojas: ThreadPoolExecutor | None = None
+_trava_executor_lojas = threading.Lock()
+_tarefa_de_loja = threading.local()
+
+
+def _obter_executor_lojas() -> ThreadPoolExecutor:
+    global _executor_lojas
+    with _trava_executor_lojas:
+        if _executor_lojas is None:
+            _executor_lojas = ThreadPoolExecutor(
+                max_workers=max(CONFIGURACAO.workers_lojas, 1), thread_name_prefix="lojas"
+            )
+        return _executor_lojas
+
+
+def _rodar_na_loja(loja: str, funcao: Callable[[], T]) -> T:
+    _tarefa_de_loja.ativa = True
+    try:
+        with usar_loja(loja):
+            return funcao()
+    finally:
+        _tarefa_de_loja.ativa = False
+
+
+def em_cada_loja(funcao: Callable[[], T], lojas: Iterable[str] | None = None) -> dict[str, T]:
+    """Roda `funcao` uma vez no shard de cada loja (padrão: todas) e retorna loja -> resultado.
+
+    Com mais de uma loja, as chamadas rodam em paralelo num pool de threads: o
+    sqlite3 solta o GIL enquanto a consulta roda, então cada shard é lido ao mesmo
+    tempo, cada um com a conexão da sua thread. Com uma loja só (ou dentro de
+    outra tarefa do pool), roda direto na thread atual.
+    """
+    lojas = list(lojas) if lojas is not None else listar_lojas()
+    if len(lojas) == 1 or getattr(_tarefa_de_loja, "ativa", False):
+        resultados = {}
+        for loja in lojas:
+            with usar_loja(loja):
+                resultados[loja] = funcao()
+        return resultados
+    executor = _obter_executor_lojas()
+    futuros = {loja: executor.submit(_rodar_na_loja, loja, funcao) for loja in lojas}
+    return {loja: futuro.result() for loja, futuro in futuros.items()}
+
+
+# Versões lidas por (pasta dos dados, loja, escopo): (versão, expira em). A geração
+# muda a cada escrita, para uma leitura anterior ao commit não ser guardada depois dele
+_versoes_em_memoria: dict[tuple[Path, str, str], tuple[int, float]] = {}
+_geracao_versoes = 0
+_trava_versoes = threading.Lock()
+
+
+def _descartar_versoes() -> None:
+    global _geracao_versoes
+    with _trava_versoes:
+        _geracao_versoes += 1
+        _versoes_em_memoria.clear()
+
+
+def obter_versao_dados(escopo: str, loja: str | None = None) -> int:
+    """Versão atual dos dados de um escopo (ex.: '99food') na loja (padrão: a atual).
+
+    Muda a cada importação. Fica em memória por CONFIGURACAO.ttl_versoes_segundos:
+    as gravações deste processo (`conexao_escrita`) a descartam ao terminar; as de
+    outros processos aparecem em até esse tempo.
+    """
+    loja = loja or _loja_atual.get()
+    chave = (DATA_DIR, loja, escopo)
+    with _trava_versoes:
+        guardada = _versoes_em_memoria.get(chave)
+        geracao = _geracao_versoes
+    if guardada is not None and guardada[1] > time.monotonic():
+        return guardada[0]
+    with usar_loja(loja), get_connection() as conn:
+        row = conn.execute("SELECT versao FROM versao_dados WHERE escopo = ?", (escopo,)).fetchone()
+    versao = int(row["versao"]) if row else 0
+    with _trava_versoes:
+        if _geracao_versoes == geracao:
+            _versoes_em_memoria[chave] = (versao, time.monotonic() + CONFIGURACAO.ttl_versoes_segundos)
+    return versao
+
+
+def incrementar_versao_dados(conn: sqlite3.Connection, escopo: str) -> int:
+    """Incrementa e retorna a versão do escopo; deve rodar na mesma transação da gravação."""
+    row = conn.execute(
+        """
+        INSERT INTO versao_dados (escopo, versao) VALUES (?, 1)
+        ON CONFLICT(escopo) DO UPDATE SET versao = versao + 1
+        RETURNING versao
+        """,
+        (escopo,),
+    ).fetchone()
+    return int(row[0])
+
+
+def texto_busca(texto: str) -> str:
+    """Forma do nome usada na busca por prefixo: sem acentos, minúscula e sem espaços nas pontas."""
+    decomposto = unicodedata.normalize("NFKD", texto.strip())
+    return "".join(letra for letra in decomposto if not unicodedata.combining(letra)).casefold()
+
+
+# Horário do pedido: o texto 'YYYY-MM-DD HH:MM:SS' (horário local do relatório) é a
+# origem; epoch (segundos, lendo esse horário como UTC) e dia/hora/dia_semana são
+# calculados uma vez na gravação (STORED), e não a cada consulta.
+_DDL_BI_PEDIDOS = """
+    CREATE TABLE IF NOT EXISTS {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        provedor TEXT NOT NULL,
+        pedido_id TEXT NOT NULL,
+        data_hora_pedido TEXT NOT NULL,
+        status TEXT NOT NULL,
+        tempo_preparo_min REAL NOT NULL DEFAULT 0,
+        tempo_entrega_min REAL NOT NULL DEFAULT 0,
+        arquivo_origem TEXT NOT NULL,
+        criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        versao INTEGER NOT NULL DEFAULT 0,
+        epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', data_hora_pedido) AS INTEGER)) STORED,
+        dia TEXT GENERATED ALWAYS AS (date(epoch, 'unixepoch')) STORED,
+        hora INTEGER GENERATED ALWAYS AS (CAST(strftime('%H', epoch, 'unixepoch') AS INTEGER)) STORED,
+        dia_semana INTEGER GENERATED ALWAYS AS (CAST(strftime('%w', epoch, 'unixepoch') AS INTEGER)) STORED,
+        UNIQUE (provedor, pedido_id)
+    )
+"""
+
+
+def _migrar_lancamentos_hash_importacao(conn: sqlite3.Connection) -> None:
+    """Adiciona a coluna hash_importacao (deduplicação de importações em lote) a bancos antigos."""
+    colunas = {linha["name"] for linha in conn.execute("PRAGMA table_info(lancamentos)")}
+    if "hash_importacao" not in colunas:
+        conn.execute("ALTER TABLE lancamentos ADD COLUMN hash_importacao TEXT")
+    # Parcial: lançamentos manuais (sem hash) não entram no índice
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_lancamentos_hash_importacao
+        ON lancamentos(hash_importacao) WHERE hash_importacao IS NOT NULL
+        """
+    )
+
+
+def _migrar_itens_para_chave_natural(conn: sqlite3.Connection) -> None:
+    """Garante a chave única (pedido_id, nome_item) em bi_99food_itens.
+
+    Bancos antigos acumulavam itens duplicados a cada reenvio do relatório. Antes de
+    criar o índice único, remove cópias idênticas e soma as linhas restantes com a
+    mesma chave. Roda antes da cópia para as tabelas por provedor.
+    """
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_bi_99food_itens_chave_natural'"
+    ).fetchone()
+    if existe:
+        return
+
+    colunas = {linha["name"] for linha in conn.execute("PRAGMA table_info(bi_99food_itens)")}
+    if "lote_importacao" not in colunas:
+        conn.execute("ALTER TABLE bi_99food_itens ADD COLUMN lote_importacao TEXT")
+
+    duplicados = conn.execute(
+        "SELECT 1 FROM bi_99food_itens GROUP BY pedido_id, nome_item HAVING COUNT(*) > 1 LIMIT 1"
+    ).fetchone()
+    if duplicados:
+        # Reenvios do mesmo arquivo geraram cópias exatas: fica só a primeira
+        conn.execute(
+            """
+            DELETE FROM bi_99food_itens
+            WHERE id NOT IN (
+                SELECT MIN(id)
+                FROM bi_99food_itens
+                GROUP BY pedido_id, nome_item, quantidade_vendida, receita_item, preco_medio, arquivo_origem
+            )
+            """
+        )
+        # O que sobrou com a mesma chave são linhas distintas do mesmo item: soma numa só
+        conn.execute(
+            """
+            UPDATE bi_99food_itens
+            SET
+                quantidade_vendida = agregado.quantidade,
+                receita_item = agregado.receita,
+                preco_medio = CASE WHEN agregado.quantidade > 0 THEN agregado.receita / agregado.quantidade ELSE 0 END
+            FROM (
+                SELECT MIN(id) AS id, SUM(quantidade_vendida) AS quantidade, SUM(receita_item) AS receita
+                FROM bi_99food_itens
+                GROUP BY pedido_id, nome_item
+                HAVING COUNT(*) > 1
+            ) AS agregado
+            WHERE bi_99food_itens.id = agregado.id
+            """
+        )
+        conn.execute(
+            """
+            DELETE FROM bi_99food_itens
+            WHERE id NOT IN (SELECT MIN(id) FROM bi_99food_itens GROUP BY pedido_id, nome_item)
+            """
+        )
+
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX idx_bi_99food_itens_chave_natural
+        ON bi_99food_itens(pedido_id, nome_item)
+        """
+    )
+
+
+def _migrar_bi_versao_linhas(conn: sqlite3.Connection) -> None:
+    """Adiciona a coluna versao (versão dos dados que gravou a linha) a bancos antigos.
+
+    Linhas anteriores ficam com versão 0. O índice (provedor, versao) atende a
+    leitura só do que mudou desde uma versão (bi.colunar).
+    """
+    for tabela in ("bi_pedidos", "bi_itens"):
+        colunas = {linha["name"] for linha in conn.execute(f"PRAGMA table_info({tabela})")}
+        if "versao" not in colunas:
+            conn.execute(f"ALTER TABLE {tabela} ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_versao ON {tabela}(provedor, versao)")
+
+
+def _preencher_bi_produtos(conn: sqlite3.Connection) -> None:
+    """Cadastra em bi_produtos os nomes dos itens sem produto_id e preenche a chave."""
+    nomes = conn.execute(
+        "SELECT DISTINCT provedor, nome_item FROM bi_itens WHERE produto_id IS NULL"
+    ).fetchall()
+    if not nomes:
+        return
+    conn.executemany(
+        "INSERT OR IGNORE INTO bi_produtos (provedor, nome, nome_busca) VALUES (?, ?, ?)",
+        ((provedor, nome, texto_busca(nome)) for provedor, nome in nomes),
+    )
+    conn.execute(
+        """
+        UPDATE bi_itens
+        SET produto_id = pr.id
+        FROM bi_produtos pr
+        WHERE bi_itens.produto_id IS NULL AND pr.provedor = bi_itens.provedor AND pr.nome = bi_itens.nome_item
+        """
+    )
+
+
+def _migrar_bi_produtos(conn: sqlite3.Connection) -> None:
+    """Troca o nome do item pela chave inteira de bi_produtos em bancos antigos.
+
+    bi_itens ganha a coluna produto_id, preenchida a partir dos nomes; o rollup
+    por produto antigo (chaveado pelo nome) é descartado junto com bi_rollup_hora,
+    e `bi.rollups.garantir_rollups` recalcula os dois na inicialização.
+    """
+    colunas = {linha["name"] for linha in conn.execute("PRAGMA table_info(bi_itens)")}
+    if "produto_id" not in colunas:
+        conn.execute("ALTER TABLE bi_itens ADD COLUMN produto_id INTEGER REFERENCES bi_produtos(id)")
+        _preencher_bi_produtos(conn)
+    conn.execute("DROP INDEX IF EXISTS idx_bi_itens_nome_item")
+    # Com pedido_id no fim, serve tanto à varredura por produto quanto à busca pontual
+    # (pedido, produto) quando os pedidos vêm de um filtro de período
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bi_itens_produto ON bi_itens(provedor, produto_id, pedido_id)")
 
 
-def get_connection() -> sqlite3.Connection:
-    """Retorna conexão SQLite com acesso por nome de coluna."""
-    # Garante que a pasta /data exista antes de abrir o arquivo .db
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
+def _migrar_rollup_produto_para_chave(conn: sqlite3.Connection) -> None:
+    """Remove o rollup por produto chaveado pelo nome; roda antes da criação das tabelas."""
+    colunas = {linha["name"] for linha in conn.execute("PRAGMA table_info(bi_rollup_hora_produto)")}
+    if "nome_item" in colunas:
+        conn.execute("DROP TABLE bi_rollup_hora_produto")
+        conn.execute("DELETE FROM bi_rollup_hora")
+
+
+def _migrar_bi_para_tabelas_por_provedor(conn: sqlite3.Connection) -> None:
+    """Copia os dados das antigas tabelas bi_99food_* para as tabelas por provedor.
+
+    As tabelas antigas (e seus rollups) são removidas; os rollups novos são
+    calculados por `bi.rollups.garantir_rollups` na inicialização.
+    """
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bi_99food_pedidos'"
+    ).fetchone()
+    if not existe:
+        return
+
+    _migrar_itens_para_chave_natural(conn)
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO bi_pedidos (
+            provedor, pedido_id, data_hora_pedido, status, tempo_preparo_min, tempo_entrega_min,
+            arquivo_origem, criado_em, atualizado_em
+        )
+        SELECT
+            '99food', pedido_id, data_hora_pedido, status, tempo_preparo_min, tempo_entrega_min,
+            arquivo_origem, criado_em, atualizado_em
+        FROM bi_99food_pedidos
+        ORDER BY id
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO bi_itens (
+            provedor, pedido_id, nome_item, quantidade_vendida, receita_item, preco_medio,
+            arquivo_origem, lote_importacao, criado_em
+        )
+        SELECT
+            '99food', pedido_id, nome_item, quantidade_vendida, receita_item, preco_medio,
+            arquivo_origem, lote_importacao, criado_em
+        FROM bi_99food_itens
+        ORDER BY id
+        """
+    )
+    _preencher_bi_produtos(conn)
+    for tabela in ("bi_99food_itens", "bi_99food_pedidos", "bi_99food_rollup_hora", "bi_99food_rollup_hora_produto"):
+        conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+
+
+# Linhas copiadas por transação ao reconstruir uma tabela
+TAMANHO_LOTE_MIGRACAO = 50_000
+
+
+def _colunas(conn: sqlite3.Connection, tabela: str) -> list[str]:
+    """Colunas gravadas pelo usuário (sem as geradas), na ordem da tabela."""
+    return [linha["name"] for linha in conn.execute(f"PRAGMA table_xinfo({tabela})") if linha["hidden"] == 0]
+
+
+def _reconstruir_tabela(conn: sqlite3.Connection, tabela: str, ddl: str) -> None:
+    """Recria `tabela` com o `ddl` novo, copiando as linhas em lotes pela chave `id`.
+
+    O SQLite não acrescenta colunas geradas STORED com ALTER TABLE, então a tabela
+    é copiada para `<tabela>_migracao` e renomeada no fim. Cada lote de
+    TAMANHO_LOTE_MIGRACAO linhas tem commit próprio: o WAL não cresce com o
+    tamanho da tabela e, se o processo parar no meio, a cópia continua do último
+    id copiado na próxima inicialização. Os índices são recriados pela migração.
+    """
+    nova = f"{tabela}_migracao"
+    conn.execute(ddl.format(tabela=nova))
+    copiadas = set(_colunas(conn, nova))
+    colunas = ", ".join(coluna for coluna in _colunas(conn, tabela) if coluna in copiadas)
+
+    ultimo = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {nova}").fetchone()[0]
+    total = conn.execute(f"SELECT COUNT(*) FROM {tabela} WHERE id > ?", (ultimo,)).fetchone()[0]
+    feitas = 0
+    while True:
+        lote = conn.execute(
+            f"INSERT INTO {nova} ({colunas}) SELECT {colunas} FROM {tabela} WHERE id > ? ORDER BY id LIMIT ?",
+            (ultimo, TAMANHO_LOTE_MIGRACAO),
+        ).rowcount
+        if lote <= 0:
+            break
+        ultimo = conn.execute(f"SELECT MAX(id) FROM {nova}").fetchone()[0]
+        conn.commit()
+        feitas += lote
+        _log_migracoes.info("%s: %d de %d linhas copiadas", tabela, feitas, total)
 
-    connection = sqlite3.connect(DB_PATH)
-    connection.row_factory = sqlite3.Row
-    return connection
+    conn.execute(f"DROP TABLE {tabela}")
+    conn.execute(f"ALTER TABLE {nova} RENAME TO {tabela}")
+
+
+def _migracao_bi_pedidos_tempo(conn: sqlite3.Connection) -> None:
+    """bi_pedidos com epoch e dia/hora/dia_semana gerados, indexados para os agrupamentos.
+
+    (provedor, dia, hora) atende o filtro de período e os GROUP BY dos rollups;
+    com epoch no fim, também entrega os pedidos em ordem cronológica (exportação).
+    """
+    colunas = {linha["name"] for linha in conn.execute("PRAGMA table_xinfo(bi_pedidos)")}
+    if "epoch" not in colunas:
+        _reconstruir_tabela(conn, "bi_pedidos", _DDL_BI_PEDIDOS)
+    conn.execute("DROP INDEX IF EXISTS idx_bi_pedidos_data_hora")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bi_pedidos_tempo ON bi_pedidos(provedor, dia, hora, epoch)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bi_pedidos_versao ON bi_pedidos(provedor, versao)")
+
+
+def _migracao_bi_particoes(conn: sqlite3.Connection) -> None:
+    """Catálogo dos meses de BI arquivados em arquivos próprios (ver bi.particoes)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bi_particoes (
+            mes TEXT PRIMARY KEY,
+            arquivo TEXT NOT NULL,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            itens INTEGER NOT NULL DEFAULT 0,
+            arquivado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+@dataclass(frozen=True)
+class Migracao:
+    """Passo versionado do esquema; `aplicar` recebe a conexão de escrita.
+
+    Cada migração roda uma vez por banco (tabela schema_migracoes) e deve aceitar
+    tanto um banco antigo quanto um recém-criado pelo `init_db`.
+    """
+
+    versao: int
+    descricao: str
+    aplicar: Callable[[sqlite3.Connection], None]
+
+
+# Em ordem de versão; mudanças novas no esquema entram aqui, nunca editando uma já publicada
+MIGRACOES: tuple[Migracao, ...] = (
+    Migracao(1, "bi_pedidos: epoch e dia/hora/dia_semana gerados, com índices", _migracao_bi_pedidos_tempo),
+    Migracao(2, "bi_particoes: catálogo dos meses arquivados", _migracao_bi_particoes),
+)
+VERSAO_ESQUEMA = MIGRACOES[-1].versao
+# Banco dos jobs (sem MIGRACOES); suba ao mudar o DDL de `_inicializar_jobs`
+VERSAO_ESQUEMA_JOBS = 1
+
+
+def _aplicar_migracoes(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            segundos REAL NOT NULL,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    aplicadas = {linha[0] for linha in conn.execute("SELECT versao FROM schema_migracoes")}
+    for migracao in MIGRACOES:
+        if migracao.versao in aplicadas:
+            continue
+        _log_migracoes.info("Aplicando migração %d: %s", migracao.versao, migracao.descricao)
+        inicio = time.perf_counter()
+        migracao.aplicar(conn)
+        conn.execute(
+            "INSERT INTO schema_migracoes (versao, descricao, segundos) VALUES (?, ?, ?)",
+            (migracao.versao, migracao.descricao, time.perf_counter() - inicio),
+        )
+        conn.commit()
+
+
+def versao_esquema(caminho: Path | None = None) -> int:
+    """Maior migração aplicada no banco (0 se nenhuma)."""
+    with get_connection(caminho) as conn:
+        existe = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migracoes'"
+        ).fetchone()
+        if not existe:
+            return 0
+        return int(conn.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_migracoes").fetchone()[0])
+
+
+def _migrar_jobs_loja(conn: sqlite3.Connection) -> None:
+    """Adiciona a loja de destino aos jobs de bancos antigos (jobs anteriores vão para a loja padrão)."""
+    colunas = {linha["name"] for linha in conn.execute("PRAGMA table_info(bi_import_jobs)")}
+    if "loja" not in colunas:
+        conn.execute(f"ALTER TABLE bi_import_jobs ADD COLUMN loja TEXT NOT NULL DEFAULT '{LOJA_PADRAO}'")
+
+
+def criar_loja(loja: str) -> str:
+    """Cria (ou migra) o shard da loja com o esquema atual e retorna o slug.
+
+    Um shard que já está em VERSAO_ESQUEMA é só conferido (uma leitura), sem DDL.
+    """
+    with usar_loja(loja):
+        if not caminho_loja(loja).exists() or versao_esquema() < VERSAO_ESQUEMA:
+            _inicializar_shard()
+    _lojas_em_memoria.pop(DATA_DIR, None)
+    return loja
 
 
 def init_db() -> None:
-    """Inicializa o banco de dados e cria tabelas se não existirem."""
-    with get_connection() as conn:
+    """Inicializa os shards de todas as lojas e o banco dos jobs.
+
+    Além das lojas que já têm arquivo, cria as listadas em LOJAS (separadas por vírgula).
+    Com os bancos em dia, só lê a versão de cada um: o DDL roda quando falta
+    alguma migração, por isso toda mudança de esquema precisa entrar em MIGRACOES.
+    """
+    for loja in dict.fromkeys([*listar_lojas(), *_lojas_configuradas()]):
+        criar_loja(loja)
+    _inicializar_jobs()
+
+
+def _inicializar_shard() -> None:
+    """Cria as tabelas do shard da loja atual se não existirem.
+
+    As funções `_migrar_*` são as checagens anteriores ao controle de versão e
+    rodam a cada inicialização; depois delas vêm as migrações de MIGRACOES
+    ainda não aplicadas.
+    """
+    with conexao_escrita() as conn:
+        _migrar_rollup_produto_para_chave(conn)
+        # Tabelas de BI compartilhadas por todos os provedores (bi.provedores),
+        # com o slug do provedor no início de cada chave
+        conn.execute(_DDL_BI_PEDIDOS.format(tabela="bi_pedidos"))
+        # Dimensão de produtos: a importação cadastra cada nome novo e os itens guardam
+        # a chave inteira; nome_busca (ver texto_busca) atende a busca por prefixo
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS bi_99food_pedidos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pedido_id TEXT NOT NULL UNIQUE,
-                data_hora_pedido TEXT NOT NULL,
-                status TEXT NOT NULL,
-                tempo_preparo_min REAL NOT NULL DEFAULT 0,
-                tempo_entrega_min REAL NOT NULL DEFAULT 0,
-                arquivo_origem TEXT NOT NULL,
-                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            CREATE TABLE IF NOT EXISTS bi_produtos (
+                id INTEGER PRIMARY KEY,
+                provedor TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                nome_busca TEXT NOT NULL,
+                UNIQUE (provedor, nome)
             )
             """
         )
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS bi_99food_itens (
+            CREATE INDEX IF NOT EXISTS idx_bi_produtos_busca
+            ON bi_produtos(provedor, nome_busca, nome)
+            """
+        )
+        # A chave única (provedor, pedido_id, nome_item) também atende a junção com bi_pedidos
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bi_itens (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                provedor TEXT NOT NULL,
                 pedido_id TEXT NOT NULL,
                 nome_item TEXT NOT NULL,
                 quantidade_vendida REAL NOT NULL DEFAULT 0,
                 receita_item REAL NOT NULL DEFAULT 0,
                 preco_medio REAL NOT NULL DEFAULT 0,
                 arquivo_origem TEXT NOT NULL,
+                lote_importacao TEXT,
                 criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (pedido_id) REFERENCES bi_99food_pedidos(pedido_id)
+                versao INTEGER NOT NULL DEFAULT 0,
+                produto_id INTEGER REFERENCES bi_produtos(id),
+                UNIQUE (provedor, pedido_id, nome_item),
+                FOREIGN KEY (provedor, pedido_id) REFERENCES bi_pedidos(provedor, pedido_id)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bi_arquivos_importados (
+                sha256 TEXT PRIMARY KEY,
+                provedor TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                linhas INTEGER NOT NULL DEFAULT 0,
+                importado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bi_rollup_hora (
+                provedor TEXT NOT NULL,
+                dia TEXT NOT NULL,
+                hora TEXT NOT NULL,
+                dia_semana INTEGER NOT NULL,
+                pedidos INTEGER NOT NULL DEFAULT 0,
+                receita REAL NOT NULL DEFAULT 0,
+                quantidade REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (provedor, dia, hora)
             )
             """
         )
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_bi_99food_pedidos_data_hora
-            ON bi_99food_pedidos(data_hora_pedido)
+            CREATE TABLE IF NOT EXISTS bi_rollup_hora_produto (
+                provedor TEXT NOT NULL,
+                dia TEXT NOT NULL,
+                hora TEXT NOT NULL,
+                dia_semana INTEGER NOT NULL,
+                produto_id INTEGER NOT NULL,
+                pedidos INTEGER NOT NULL DEFAULT 0,
+                receita REAL NOT NULL DEFAULT 0,
+                quantidade REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (provedor, dia, hora, produto_id)
+            )
             """
         )
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_bi_99food_itens_pedido_id
-            ON bi_99food_itens(pedido_id)
+            CREATE INDEX IF NOT EXISTS idx_bi_rollup_hora_produto_id
+            ON bi_rollup_hora_produto(provedor, produto_id, dia)
             """
         )
+        _migrar_bi_produtos(conn)
+        _migrar_bi_para_tabelas_por_provedor(conn)
+        _migrar_bi_versao_linhas(conn)
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_bi_99food_itens_nome_item
-            ON bi_99food_itens(nome_item)
+            CREATE TABLE IF NOT EXISTS versao_dados (
+                escopo TEXT PRIMARY KEY,
+                versao INTEGER NOT NULL DEFAULT 0
+            )
             """
         )
         conn.execute(
@@ -87,8 +1011,117 @@ def init_db() -> None:
                 valor REAL NOT NULL CHECK(valor >= 0),
                 data TEXT NOT NULL,
                 categoria TEXT NOT NULL,
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                hash_importacao TEXT
+            )
+            """
+        )
+        _migrar_lancamentos_hash_importacao(conn)
+        # Atende listar_por_periodo (BETWEEN + ORDER BY data, id) e a listagem completa
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_lancamentos_data_id ON lancamentos(data, id)")
+        # Paginação por chave (data, id) filtrada por categoria
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_lancamentos_categoria_data_id ON lancamentos(categoria, data, id)"
+        )
+        # Totais mantidos por finance.adicionar_lancamento na mesma transação do INSERT
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lancamentos_resumo_mensal (
+                mes TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                quantidade INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (mes, categoria, tipo)
+            )
+            """
+        )
+        # NF-e importadas (chave de acesso) e seus itens; o lançamento de cada nota
+        # tem hash_importacao derivado de 'nfe:<chave>'
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS nfe_documentos (
+                chave TEXT PRIMARY KEY,
+                numero TEXT,
+                data_emissao TEXT,
+                emitente_cnpj TEXT,
+                emitente_nome TEXT,
+                valor_total REAL,
+                origem TEXT,
+                importado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS nfe_itens (
+                chave TEXT NOT NULL REFERENCES nfe_documentos(chave),
+                numero_item INTEGER NOT NULL,
+                codigo TEXT,
+                descricao TEXT,
+                quantidade REAL,
+                valor_unitario REAL,
+                valor_total REAL,
+                PRIMARY KEY (chave, numero_item)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lancamentos_saldo (
+                id INTEGER PRIMARY KEY CHECK(id = 1),
+                total_entradas REAL NOT NULL DEFAULT 0,
+                total_saidas REAL NOT NULL DEFAULT 0,
+                quantidade INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.commit()
+        _aplicar_migracoes(conn)
+
+
+def _inicializar_jobs() -> None:
+    """Cria as tabelas da fila de importação; PRAGMA user_version marca o esquema em dia."""
+    with get_connection(JOBS_DB_PATH) as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= VERSAO_ESQUEMA_JOBS:
+            return
+    with conexao_escrita(JOBS_DB_PATH) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bi_import_jobs (
+                id TEXT PRIMARY KEY,
+                provedor TEXT NOT NULL,
                 criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
             """
         )
+        _migrar_jobs_loja(conn)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bi_import_job_arquivos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                caminho TEXT NOT NULL,
+                tipo TEXT,
+                status TEXT NOT NULL DEFAULT 'pendente'
+                    CHECK(status IN ('pendente', 'processando', 'concluido', 'erro')),
+                pid INTEGER,
+                linhas INTEGER NOT NULL DEFAULT 0,
+                linhas_rejeitadas INTEGER NOT NULL DEFAULT 0,
+                erros TEXT NOT NULL DEFAULT '[]',
+                mensagem TEXT,
+                iniciado_em REAL,
+                finalizado_em REAL,
+                FOREIGN KEY (job_id) REFERENCES bi_import_jobs(id)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_bi_import_job_arquivos_job
+            ON bi_import_job_arquivos(job_id, status)
+            """
+        )
+        conn.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA_JOBS}")
         conn.commit()
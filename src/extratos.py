@@ -0,0 +1,157 @@
+"""Leitura de extratos bancários (CSV e OFX) como lançamentos.
+
+Os leitores são geradores: percorrem o arquivo linha a linha e entregam um
+dicionário por lançamento (tipo, descricao, valor, data, categoria e, quando o
+banco informa, `chave` com o identificador da transação). A validação e a
+gravação ficam em `finance.importar_lancamentos`.
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+CATEGORIA_PADRAO = "importado"
+
+# Nomes de coluna aceitos no CSV (cabeçalho em minúsculas, sem espaços nas pontas)
+_COLUNAS_CSV = {
+    "tipo": ("tipo",),
+    "descricao": ("descricao", "descrição", "historico", "histórico", "memo"),
+    "valor": ("valor", "quantia", "montante"),
+    "data": ("data", "data lançamento", "data lancamento", "data movimento"),
+    "categoria": ("categoria",),
+    "chave": ("id", "identificador", "documento", "fitid"),
+}
+
+_RE_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _data_iso(valor: str) -> str:
+    """Converte DD/MM/AAAA para AAAA-MM-DD; outros formatos seguem como vieram."""
+    valor = valor.strip()
+    try:
+        return datetime.strptime(valor, "%d/%m/%Y").date().isoformat()
+    except ValueError:
+        return valor
+
+
+def _numero(valor: str) -> float | str:
+    """Lê valores como '1.234,56', '-1234.56' ou 'R$ 10,00'; devolve o texto se não for número."""
+    texto = valor.strip().replace("R$", "").replace(" ", "")
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        return valor
+
+
+def _tipo_e_valor(tipo: str | None, valor: float | str) -> tuple[str, float | str]:
+    # Sem coluna de tipo, o sinal do valor decide (extratos trazem débitos negativos)
+    if not tipo and isinstance(valor, float):
+        return ("saida" if valor < 0 else "entrada"), abs(valor)
+    return (tipo or ""), valor
+
+
+def ler_csv(caminho: Path, categoria_padrao: str = CATEGORIA_PADRAO, encoding: str = "utf-8-sig") -> Iterator[dict[str, Any]]:
+    """Lê um extrato CSV (separador ',' ou ';', detectado pelo início do arquivo).
+
+    Colunas obrigatórias: data, descrição e valor. Sem coluna `tipo`, valores
+    negativos viram saídas. Datas DD/MM/AAAA são convertidas para ISO.
+    """
+    with Path(caminho).open(newline="", encoding=encoding) as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.reader(arquivo, dialeto)
+
+        cabecalho = [coluna.strip().lower() for coluna in next(leitor, [])]
+        posicoes: dict[str, int] = {}
+        for campo, nomes in _COLUNAS_CSV.items():
+            for nome in nomes:
+                if nome in cabecalho:
+                    posicoes[campo] = cabecalho.index(nome)
+                    break
+        faltando = {"data", "descricao", "valor"} - posicoes.keys()
+        if faltando:
+            raise ValueError(f"Colunas obrigatórias ausentes no CSV: {', '.join(sorted(faltando))}.")
+
+        def campo(linha: list[str], nome: str) -> str:
+            posicao = posicoes.get(nome)
+            return linha[posicao].strip() if posicao is not None and posicao < len(linha) else ""
+
+        for linha in leitor:
+            if not any(celula.strip() for celula in linha):
+                continue
+            tipo, valor = _tipo_e_valor(campo(linha, "tipo").lower(), _numero(campo(linha, "valor")))
+            yield {
+                "tipo": tipo,
+                "descricao": campo(linha, "descricao"),
+                "valor": valor,
+                "data": _data_iso(campo(linha, "data")),
+                "categoria": campo(linha, "categoria") or categoria_padrao,
+                "chave": campo(linha, "chave") or None,
+            }
+
+
+def _encoding_ofx(caminho: Path) -> str:
+    with Path(caminho).open("rb") as arquivo:
+        cabecalho = arquivo.read(1024).decode("ascii", errors="ignore").upper()
+    if "UTF-8" in cabecalho or "ENCODING=\"UTF" in cabecalho:
+        return "utf-8"
+    return "cp1252"
+
+
+def ler_ofx(caminho: Path, categoria_padrao: str = CATEGORIA_PADRAO) -> Iterator[dict[str, Any]]:
+    """Lê as transações (<STMTTRN>) de um extrato OFX 1.x (SGML) ou 2.x (XML).
+
+    A leitura é linha a linha; só a transação corrente fica em memória. O FITID
+    vira a `chave` do lançamento, usada na deduplicação.
+    """
+    conta = ""
+    transacao: dict[str, str] | None = None
+    with Path(caminho).open(encoding=_encoding_ofx(caminho), errors="replace") as arquivo:
+        for linha in arquivo:
+            for fechamento, tag, valor in _RE_TAG_OFX.findall(linha):
+                tag = tag.upper()
+                valor = valor.strip()
+                if tag == "ACCTID" and not fechamento:
+                    conta = valor
+                elif tag == "STMTTRN":
+                    if not fechamento:
+                        transacao = {}
+                    elif transacao is not None:
+                        yield _lancamento_ofx(transacao, conta, categoria_padrao)
+                        transacao = None
+                elif transacao is not None and not fechamento and valor:
+                    transacao[tag] = valor
+
+
+def _lancamento_ofx(transacao: dict[str, str], conta: str, categoria_padrao: str) -> dict[str, Any]:
+    data = transacao.get("DTPOSTED", "")
+    valor = _numero(transacao.get("TRNAMT", ""))
+    tipo, valor = _tipo_e_valor(None, valor)
+    fitid = transacao.get("FITID")
+    return {
+        "tipo": tipo,
+        "descricao": transacao.get("MEMO") or transacao.get("NAME") or "",
+        "valor": valor,
+        # DTPOSTED: AAAAMMDD[HHMMSS[.XXX][fuso]]
+        "data": f"{data[:4]}-{data[4:6]}-{data[6:8]}" if len(data) >= 8 and data[:8].isdigit() else data,
+        "categoria": categoria_padrao,
+        "chave": f"ofx:{conta}:{fitid}" if fitid else None,
+    }
+
+
+def ler_extrato(caminho: Path, categoria_padrao: str = CATEGORIA_PADRAO) -> Iterator[dict[str, Any]]:
+    """Escolhe o leitor pela extensão (.ofx ou CSV)."""
+    if Path(caminho).suffix.lower() == ".ofx":
+        return ler_ofx(caminho, categoria_padrao)
+    return ler_csv(caminho, categoria_padrao)
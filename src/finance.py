@@ -1,10 +1,103 @@
-"""Camada de regras de negócio para lançamentos financeiros."""
+"""Camada de regras de negócio para lançamentos financeiros.
+
+Além da tabela `lancamentos`, mantém dois resumos atualizados na mesma transação
+de cada gravação: totais por mês × categoria × tipo (lancamentos_resumo_mensal)
+e o saldo corrente (lancamentos_saldo). `calcular_saldo` e `relatorio_mensal`
+leem dos resumos; `verificar_resumos` os compara com um recálculo do zero.
+
+Cada loja grava e lê no próprio shard (ver `database.usar_loja`); `calcular_saldo`
+sem loja soma o saldo de todas, lidos em paralelo.
+"""
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import zipfile
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+from multiprocessing import get_context
+from pathlib import Path
 from typing import Any
 
-from database import get_connection
+import pandas as pd
+
+import nfe
+from database import conexao_escrita, em_cada_loja, get_connection, listar_lojas, usar_loja
+
+# Linhas lidas do cursor por vez em iterar_lancamentos
+TAMANHO_LOTE_LEITURA = 1_000
+
+# Lançamentos por transação em importar_lancamentos
+TAMANHO_LOTE_IMPORTACAO = 5_000
+# Máximo de linhas rejeitadas detalhadas no resultado da importação
+LIMITE_ERROS = 1_000
+
+# NF-e gravadas por transação e XMLs lidos por tarefa do pool de processos
+TAMANHO_LOTE_NFE = 1_000
+TAMANHO_LOTE_PROCESSO_NFE = 64
+
+# Tolerância relativa para diferenças de arredondamento entre somas em ordens distintas
+TOLERANCIA = 1e-9
+
+_SQL_RESUMO_MENSAL = """
+    SELECT substr(data, 1, 7) AS mes, categoria, tipo, SUM(valor) AS total, COUNT(*) AS quantidade
+    FROM lancamentos
+    GROUP BY 1, 2, 3
+"""
+
+_SQL_SALDO = """
+    SELECT
+        COALESCE(SUM(CASE WHEN tipo = 'entrada' THEN valor ELSE 0 END), 0) AS total_entradas,
+        COALESCE(SUM(CASE WHEN tipo = 'saida' THEN valor ELSE 0 END), 0) AS total_saidas,
+        COUNT(*) AS quantidade
+    FROM lancamentos
+"""
+
+
+def _acumular_resumos(conn: sqlite3.Connection, lancamentos: Iterable[tuple[str, float, str, str]]) -> None:
+    """Soma (tipo, valor, data, categoria) aos resumos; deve rodar na transação do INSERT."""
+    por_mes: dict[tuple[str, str, str], list[float]] = {}
+    entradas = saidas = 0.0
+    quantidade = 0
+    for tipo, valor, data, categoria in lancamentos:
+        acumulado = por_mes.setdefault((data[:7], categoria, tipo), [0.0, 0])
+        acumulado[0] += valor
+        acumulado[1] += 1
+        if tipo == "entrada":
+            entradas += valor
+        else:
+            saidas += valor
+        quantidade += 1
+    if not quantidade:
+        return
+
+    conn.executemany(
+        """
+        INSERT INTO lancamentos_resumo_mensal (mes, categoria, tipo, total, quantidade)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(mes, categoria, tipo) DO UPDATE SET
+            total = total + excluded.total,
+            quantidade = quantidade + excluded.quantidade
+        """,
+        [(*chave, total, contagem) for chave, (total, contagem) in por_mes.items()],
+    )
+    conn.execute(
+        """
+        INSERT INTO lancamentos_saldo (id, total_entradas, total_saidas, quantidade)
+        VALUES (1, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            total_entradas = total_entradas + excluded.total_entradas,
+            total_saidas = total_saidas + excluded.total_saidas,
+            quantidade = quantidade + excluded.quantidade
+        """,
+        (entradas, saidas, quantidade),
+    )
 
 
 def adicionar_lancamento(
@@ -22,18 +115,137 @@ def adicionar_lancamento(
     if valor < 0:
         raise ValueError("Valor não pode ser negativo.")
 
-    with get_connection() as conn:
+    data = data.strip()
+    categoria = categoria.strip()
+    with conexao_escrita() as conn:
         cursor = conn.execute(
             """
             INSERT INTO lancamentos (tipo, descricao, valor, data, categoria)
             VALUES (?, ?, ?, ?, ?)
             """,
-            (tipo_normalizado, descricao.strip(), valor, data.strip(), categoria.strip()),
+            (tipo_normalizado, descricao.strip(), valor, data, categoria),
         )
-        conn.commit()
+        _acumular_resumos(conn, [(tipo_normalizado, valor, data, categoria)])
         return int(cursor.lastrowid)
 
 
+def _hash_lancamento(linha: tuple[Any, ...], ocorrencia: int) -> str:
+    tipo, descricao, valor, data, categoria, chave = linha
+    # Com identificador do banco (ex.: FITID do OFX), ele basta; sem, lançamentos
+    # idênticos no mesmo arquivo se distinguem pela ordem de ocorrência
+    base = f"chave|{chave}" if chave else f"{tipo}|{descricao}|{valor:.2f}|{data}|{categoria}|{ocorrencia}"
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+def _validar_lote(lote: list[Mapping[str, Any]], primeira_linha: int) -> tuple[pd.DataFrame, list[dict[str, Any]]]:
+    """Valida o lote coluna a coluna; retorna as linhas válidas e as rejeitadas (com o número da linha)."""
+    df = pd.DataFrame.from_records(
+        [
+            (item.get("tipo"), item.get("descricao"), item.get("valor"), item.get("data"), item.get("categoria"), item.get("chave"))
+            for item in lote
+        ],
+        columns=["tipo", "descricao", "valor", "data", "categoria", "chave"],
+        index=pd.RangeIndex(primeira_linha, primeira_linha + len(lote)),
+    )
+    tipo = df["tipo"].astype("string").str.strip().str.lower().fillna("")
+    valor = pd.to_numeric(df["valor"], errors="coerce")
+    data = df["data"].astype("string").str.strip().fillna("")
+    data_convertida = pd.to_datetime(data.where(data.str.fullmatch(r"\d{4}-\d{2}-\d{2}")), format="%Y-%m-%d", errors="coerce")
+
+    problemas = [
+        (valor.isna(), "Valor inválido: {valor}", "valor"),
+        (valor < 0, "Valor não pode ser negativo: {valor}", "valor"),
+        (~tipo.isin(["entrada", "saida"]), "Tipo inválido: {valor}. Use 'entrada' ou 'saida'.", "tipo"),
+        (data_convertida.isna(), "Data inválida (use YYYY-MM-DD): {valor}", "data"),
+    ]
+    rejeitada = pd.Series(False, index=df.index)
+    erros: list[dict[str, Any]] = []
+    for mascara, mensagem, coluna in problemas:
+        novas = mascara & ~rejeitada
+        erros.extend({"linha": int(linha), "erro": mensagem.format(valor=bruto)} for linha, bruto in df[coluna][novas].items())
+        rejeitada |= mascara
+
+    validas = pd.DataFrame(
+        {
+            "tipo": tipo,
+            "descricao": df["descricao"].astype("string").str.strip().fillna(""),
+            "valor": valor.astype(float),
+            "data": data,
+            "categoria": df["categoria"].astype("string").str.strip().fillna(""),
+            "chave": df["chave"].astype("string").fillna(""),
+        }
+    )[~rejeitada]
+    erros.sort(key=lambda erro: erro["linha"])
+    return validas, erros
+
+
+def _gravar_lancamentos(conn: sqlite3.Connection, linhas: list[tuple[Any, ...]], hashes: list[str]) -> int:
+    """Insere as linhas validadas cujo hash ainda não existe e atualiza os resumos.
+
+    Deve rodar dentro de uma transação de escrita; retorna quantas linhas entraram.
+    """
+    existentes = {
+        row[0]
+        for row in conn.execute(
+            "SELECT hash_importacao FROM lancamentos WHERE hash_importacao IN (SELECT value FROM json_each(?))",
+            (json.dumps(hashes),),
+        ).fetchall()
+    }
+    novos: dict[str, tuple[Any, ...]] = {}
+    for hash_linha, linha in zip(hashes, linhas):
+        if hash_linha not in existentes:
+            novos.setdefault(hash_linha, linha)
+    conn.executemany(
+        """
+        INSERT INTO lancamentos (tipo, descricao, valor, data, categoria, hash_importacao)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [(*linha[:5], hash_linha) for hash_linha, linha in novos.items()],
+    )
+    _acumular_resumos(conn, [(tipo, valor, data, categoria) for tipo, _, valor, data, categoria, _ in novos.values()])
+    return len(novos)
+
+
+def importar_lancamentos(
+    lancamentos: Iterable[Mapping[str, Any]],
+    tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO,
+    progresso: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
+    """Grava lançamentos em lote (dicionários com tipo, descricao, valor, data, categoria).
+
+    Cada lote de `tamanho_lote` é validado de uma vez e gravado com executemany numa
+    transação própria, junto com os resumos. Cada lançamento recebe um hash (da
+    `chave` opcional, ou dos campos + ordem de ocorrência), então reimportar o mesmo
+    arquivo não duplica nada. `progresso`, se informado, recebe as linhas lidas após
+    cada lote.
+    """
+    ocorrencias: dict[tuple[Any, ...], int] = {}
+    resultado: dict[str, Any] = {"linhas": 0, "inseridos": 0, "duplicados": 0, "rejeitados": 0, "erros": []}
+    iterador = iter(lancamentos)
+
+    while lote := list(islice(iterador, tamanho_lote)):
+        validas, erros = _validar_lote(lote, resultado["linhas"] + 1)
+        resultado["linhas"] += len(lote)
+        resultado["rejeitados"] += len(erros)
+        resultado["erros"].extend(erros[: max(LIMITE_ERROS - len(resultado["erros"]), 0)])
+
+        linhas = list(validas.itertuples(index=False, name=None))
+        hashes = []
+        for linha in linhas:
+            ocorrencia = ocorrencias[linha] = ocorrencias.get(linha, 0) + 1
+            hashes.append(_hash_lancamento(linha, ocorrencia))
+
+        with conexao_escrita() as conn:
+            inseridos = _gravar_lancamentos(conn, linhas, hashes)
+
+        resultado["inseridos"] += inseridos
+        resultado["duplicados"] += len(linhas) - inseridos
+        if progresso:
+            progresso(resultado["linhas"])
+
+    return resultado
+
+
 def listar_lancamentos() -> list[dict[str, Any]]:
     """Lista todos os lançamentos em ordem de data (mais recentes primeiro)."""
     with get_connection() as conn:
@@ -48,23 +260,122 @@ def listar_lancamentos() -> list[dict[str, Any]]:
     return [dict(row) for row in rows]
 
 
-def calcular_saldo() -> float:
-    """Calcula saldo total: soma(entradas) - soma(saídas)."""
+def _saldo_da_loja() -> float:
     with get_connection() as conn:
-        row = conn.execute(
-            """
-            SELECT
-                COALESCE(SUM(CASE WHEN tipo = 'entrada' THEN valor ELSE 0 END), 0) AS total_entradas,
-                COALESCE(SUM(CASE WHEN tipo = 'saida' THEN valor ELSE 0 END), 0) AS total_saidas
-            FROM lancamentos
-            """
-        ).fetchone()
+        row = conn.execute("SELECT total_entradas, total_saidas FROM lancamentos_saldo WHERE id = 1").fetchone()
 
+    if row is None:
+        return 0.0
     total_entradas = float(row["total_entradas"])
     total_saidas = float(row["total_saidas"])
     return total_entradas - total_saidas
 
 
+def calcular_saldo(loja: str | None = None) -> float:
+    """Calcula saldo total: soma(entradas) - soma(saídas), lido do saldo corrente.
+
+    Com `loja`, só o shard dela é lido; sem, o saldo consolidado de todas as lojas.
+    """
+    return sum(em_cada_loja(_saldo_da_loja, [loja] if loja else None).values())
+
+
+def _filtros_lancamentos(
+    data_inicial: str | None, data_final: str | None, categoria: str | None
+) -> tuple[list[str], list[Any]]:
+    filtros = ["1=1"]
+    parametros: list[Any] = []
+    if data_inicial:
+        filtros.append("data >= ?")
+        parametros.append(data_inicial.strip())
+    if data_final:
+        filtros.append("data <= ?")
+        parametros.append(data_final.strip())
+    if categoria:
+        filtros.append("categoria = ?")
+        parametros.append(categoria.strip())
+    return filtros, parametros
+
+
+def listar_pagina(
+    tamanho: int = 50,
+    apos: tuple[str, int] | None = None,
+    antes: tuple[str, int] | None = None,
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    categoria: str | None = None,
+) -> dict[str, Any]:
+    """Uma página de lançamentos (mais recentes primeiro), paginada pela chave (data, id).
+
+    Para a próxima página, passe em `apos` o `proximo` da página atual; para a
+    anterior, passe em `antes` o `anterior`. Cada página custa uma busca no índice,
+    independente de quantas páginas vieram antes (sem OFFSET).
+    Retorna {"itens", "proximo", "anterior"}; as chaves são None quando não há mais páginas.
+    """
+    if apos and antes:
+        raise ValueError("Informe apenas 'apos' ou 'antes'.")
+    filtros, parametros = _filtros_lancamentos(data_inicial, data_final, categoria)
+    ordem = "DESC"
+    if apos:
+        filtros.append("(data, id) < (?, ?)")
+        parametros.extend(apos)
+    elif antes:
+        filtros.append("(data, id) > (?, ?)")
+        parametros.extend(antes)
+        ordem = "ASC"
+
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT id, tipo, descricao, valor, data, categoria, criado_em
+            FROM lancamentos
+            WHERE {" AND ".join(filtros)}
+            ORDER BY data {ordem}, id {ordem}
+            LIMIT ?
+            """,
+            [*parametros, tamanho + 1],
+        ).fetchall()
+
+    ha_mais = len(rows) > tamanho
+    itens = [dict(row) for row in rows[:tamanho]]
+    if antes:
+        itens.reverse()
+    if not itens:
+        return {"itens": [], "proximo": None, "anterior": None}
+
+    primeiro = (itens[0]["data"], itens[0]["id"])
+    ultimo = (itens[-1]["data"], itens[-1]["id"])
+    if antes:
+        return {"itens": itens, "proximo": ultimo, "anterior": primeiro if ha_mais else None}
+    return {"itens": itens, "proximo": ultimo if ha_mais else None, "anterior": primeiro if apos else None}
+
+
+def iterar_lancamentos(
+    data_inicial: str | None = None,
+    data_final: str | None = None,
+    categoria: str | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Percorre os lançamentos (mais recentes primeiro) lendo do cursor em lotes.
+
+    Nada é materializado além de TAMANHO_LOTE_LEITURA linhas por vez.
+    """
+    filtros, parametros = _filtros_lancamentos(data_inicial, data_final, categoria)
+    cursor = get_connection().execute(
+        f"""
+        SELECT id, tipo, descricao, valor, data, categoria, criado_em
+        FROM lancamentos
+        WHERE {" AND ".join(filtros)}
+        ORDER BY data DESC, id DESC
+        """,
+        parametros,
+    )
+    try:
+        while rows := cursor.fetchmany(TAMANHO_LOTE_LEITURA):
+            for row in rows:
+                yield dict(row)
+    finally:
+        cursor.close()
+
+
 def listar_por_periodo(data_inicial: str, data_final: str) -> list[dict[str, Any]]:
     """Lista lançamentos entre duas datas (inclusive).
 
@@ -84,19 +395,318 @@ def listar_por_periodo(data_inicial: str, data_final: str) -> list[dict[str, Any
     return [dict(row) for row in rows]
 
 
-def importar_nfe_xml(caminho_xml: str) -> dict[str, Any]:
-    """Função preparada para futura importação de XML de NF-e.
+def relatorio_mensal(
+    mes_inicial: str | None = None,
+    mes_final: str | None = None,
+    categoria: str | None = None,
+) -> dict[str, Any]:
+    """Relatório por mês e por categoria, lido dos resumos.
 
-    Esta função foi criada como ponto de extensão para a versão futura.
-    Ideia de evolução:
-    - Ler XML da NF-e
-    - Extrair itens/valores relevantes
-    - Converter em lançamentos automáticos
-    - Salvar no banco
+    Meses no formato YYYY-MM (inclusive). O saldo acumulado de cada mês considera
+    também os meses anteriores ao período; com `categoria`, só essa categoria entra.
     """
-    # Nesta V1, retornamos um resultado didático indicando que ainda não foi implementado.
+    filtros = ["1=1"]
+    parametros: list[Any] = []
+    if categoria:
+        filtros.append("categoria = ?")
+        parametros.append(categoria.strip())
+    where = " AND ".join(filtros)
+
+    periodo = ["1=1"]
+    parametros_periodo: list[Any] = []
+    if mes_inicial:
+        periodo.append("mes >= ?")
+        parametros_periodo.append(mes_inicial.strip())
+    if mes_final:
+        periodo.append("mes <= ?")
+        parametros_periodo.append(mes_final.strip())
+    where_periodo = " AND ".join(periodo)
+
+    with get_connection() as conn:
+        meses = conn.execute(
+            f"""
+            SELECT mes, entradas, saidas, entradas - saidas AS saldo_mes, saldo_acumulado
+            FROM (
+                SELECT
+                    mes,
+                    SUM(CASE WHEN tipo = 'entrada' THEN total ELSE 0 END) AS entradas,
+                    SUM(CASE WHEN tipo = 'saida' THEN total ELSE 0 END) AS saidas,
+                    SUM(SUM(CASE WHEN tipo = 'entrada' THEN total ELSE -total END)) OVER (ORDER BY mes)
+                        AS saldo_acumulado
+                FROM lancamentos_resumo_mensal
+                WHERE {where}
+                GROUP BY mes
+            )
+            WHERE {where_periodo}
+            ORDER BY mes
+            """,
+            parametros + parametros_periodo,
+        ).fetchall()
+
+        categorias = conn.execute(
+            f"""
+            SELECT categoria, tipo, SUM(total) AS total, SUM(quantidade) AS quantidade
+            FROM lancamentos_resumo_mensal
+            WHERE {where} AND {where_periodo}
+            GROUP BY categoria, tipo
+            ORDER BY total DESC
+            """,
+            parametros + parametros_periodo,
+        ).fetchall()
+
+    return {
+        "meses": [dict(row) for row in meses],
+        "categorias": [dict(row) for row in categorias],
+    }
+
+
+def reconstruir_resumos() -> None:
+    """Recria os resumos do zero a partir de `lancamentos`."""
+    with conexao_escrita() as conn:
+        conn.execute("DELETE FROM lancamentos_resumo_mensal")
+        conn.execute("DELETE FROM lancamentos_saldo")
+        conn.execute(
+            f"""
+            INSERT INTO lancamentos_resumo_mensal (mes, categoria, tipo, total, quantidade)
+            {_SQL_RESUMO_MENSAL}
+            """
+        )
+        conn.execute(
+            f"""
+            INSERT INTO lancamentos_saldo (id, total_entradas, total_saidas, quantidade)
+            SELECT 1, total_entradas, total_saidas, quantidade FROM ({_SQL_SALDO})
+            """
+        )
+
+
+def garantir_resumos() -> None:
+    """Popula os resumos de bancos que já tinham lançamentos antes das tabelas existirem, loja a loja."""
+    for loja in listar_lojas():
+        with usar_loja(loja):
+            with get_connection() as conn:
+                vazio = conn.execute("SELECT 1 FROM lancamentos_saldo").fetchone() is None
+                com_dados = conn.execute("SELECT 1 FROM lancamentos LIMIT 1").fetchone() is not None
+            if vazio and com_dados:
+                reconstruir_resumos()
+
+
+def _difere(atual: float, esperado: float) -> bool:
+    return abs(atual - esperado) > TOLERANCIA * max(1.0, abs(esperado))
+
+
+def verificar_resumos() -> dict[str, Any]:
+    """Recalcula os resumos do zero e compara com os mantidos incrementalmente.
+
+    Retorna as chaves divergentes (ausentes, sobrando ou com valores diferentes).
+    """
+    with get_connection() as conn:
+        esperado = {
+            (row["mes"], row["categoria"], row["tipo"]): (row["total"], row["quantidade"])
+            for row in conn.execute(_SQL_RESUMO_MENSAL).fetchall()
+        }
+        atual = {
+            (row["mes"], row["categoria"], row["tipo"]): (row["total"], row["quantidade"])
+            for row in conn.execute(
+                "SELECT mes, categoria, tipo, total, quantidade FROM lancamentos_resumo_mensal"
+            ).fetchall()
+        }
+        saldo_esperado = conn.execute(_SQL_SALDO).fetchone()
+        saldo_atual = conn.execute(
+            "SELECT total_entradas, total_saidas, quantidade FROM lancamentos_saldo WHERE id = 1"
+        ).fetchone()
+
+    divergencias = [
+        {"chave": list(chave), "esperado": esperado.get(chave), "atual": atual.get(chave)}
+        for chave in sorted(esperado.keys() | atual.keys())
+        if chave not in esperado
+        or chave not in atual
+        or _difere(atual[chave][0], esperado[chave][0])
+        or atual[chave][1] != esperado[chave][1]
+    ]
+    saldo_ok = (saldo_atual is None and saldo_esperado["quantidade"] == 0) or (
+        saldo_atual is not None
+        and saldo_atual["quantidade"] == saldo_esperado["quantidade"]
+        and not _difere(saldo_atual["total_entradas"], saldo_esperado["total_entradas"])
+        and not _difere(saldo_atual["total_saidas"], saldo_esperado["total_saidas"])
+    )
+    return {
+        "consistente": not divergencias and saldo_ok,
+        "divergencias": divergencias,
+        "saldo_consistente": saldo_ok,
+    }
+
+
+def _chaves_nfe_existentes(conn: sqlite3.Connection, chaves: list[str]) -> set[str]:
     return {
-        "status": "nao_implementado",
-        "mensagem": "Importação de XML de NF-e será implementada em versão futura.",
+        row[0]
+        for row in conn.execute(
+            "SELECT chave FROM nfe_documentos WHERE chave IN (SELECT value FROM json_each(?))",
+            (json.dumps(chaves),),
+        ).fetchall()
+    }
+
+
+def _gravar_nfes(
+    documentos: list[dict[str, Any]], cnpj_proprio: str | None, categoria: str
+) -> tuple[int, int, list[dict[str, Any]]]:
+    """Grava documentos, itens e um lançamento por NF-e numa transação.
+
+    Retorna (importados, duplicados, erros).
+    """
+    erros: list[dict[str, Any]] = []
+    validos = []
+    for documento in documentos:
+        if "erro" in documento:
+            erros.append(documento)
+        elif not documento["chave"] or len(documento["chave"]) != 44:
+            erros.append({"origem": documento["origem"], "erro": "Chave de acesso (chNFe) ausente ou inválida."})
+        else:
+            validos.append(documento)
+
+    lancamentos = [
+        {
+            # Nota emitida pela própria empresa é venda (entrada); as demais, compras
+            "tipo": "entrada" if cnpj_proprio and documento["emitente_cnpj"] == cnpj_proprio else "saida",
+            "descricao": f"NF-e {documento['numero'] or documento['chave']} - {documento['emitente_nome'] or ''}".strip(" -"),
+            "valor": documento["valor_total"],
+            "data": documento["data_emissao"],
+            "categoria": categoria,
+            "chave": f"nfe:{documento['chave']}",
+        }
+        for documento in validos
+    ]
+    validas, erros_validacao = _validar_lote(lancamentos, 0)
+    erros.extend({"origem": validos[erro["linha"]]["origem"], "erro": erro["erro"]} for erro in erros_validacao)
+    validos = [validos[posicao] for posicao in validas.index]
+
+    with conexao_escrita() as conn:
+        # Revalida na transação: o mesmo lote pode repetir a chave, ou outra importação tê-la gravado
+        existentes = _chaves_nfe_existentes(conn, [documento["chave"] for documento in validos])
+        novos: dict[str, int] = {}
+        for posicao, documento in enumerate(validos):
+            if documento["chave"] not in existentes:
+                novos.setdefault(documento["chave"], posicao)
+        selecionados = [validos[posicao] for posicao in novos.values()]
+
+        conn.executemany(
+            """
+            INSERT INTO nfe_documentos (chave, numero, data_emissao, emitente_cnpj, emitente_nome, valor_total, origem)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    documento["chave"],
+                    documento["numero"],
+                    documento["data_emissao"],
+                    documento["emitente_cnpj"],
+                    documento["emitente_nome"],
+                    documento["valor_total"],
+                    documento["origem"],
+                )
+                for documento in selecionados
+            ],
+        )
+        conn.executemany(
+            """
+            INSERT INTO nfe_itens (chave, numero_item, codigo, descricao, quantidade, valor_unitario, valor_total)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    documento["chave"],
+                    item["numero_item"],
+                    item.get("codigo"),
+                    item.get("descricao"),
+                    item.get("quantidade"),
+                    item.get("valor_unitario"),
+                    item.get("valor_total"),
+                )
+                for documento in selecionados
+                for item in documento["itens"]
+            ],
+        )
+        linhas_validas = list(validas.itertuples(index=False, name=None))
+        linhas = [linhas_validas[posicao] for posicao in novos.values()]
+        _gravar_lancamentos(conn, linhas, [_hash_lancamento(linha, 1) for linha in linhas])
+
+    return len(selecionados), len(validos) - len(selecionados), erros
+
+
+def importar_nfe_xml(
+    caminho_xml: str,
+    cnpj_proprio: str | None = None,
+    categoria: str = "nfe",
+    processos: int | None = None,
+    progresso: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
+    """Importa NF-e de um XML, de uma pasta ou de um .zip, gerando um lançamento por nota.
+
+    As chaves de acesso são lidas primeiro (pelo nome do arquivo ou pelo início do
+    XML) e as notas já importadas são descartadas sem parse completo. As demais são
+    lidas em `processos` processos (padrão: número de CPUs) com `iterparse` e gravadas
+    em lotes de TAMANHO_LOTE_NFE. Notas cujo emitente é `cnpj_proprio` viram entradas;
+    as demais, saídas. `progresso`, se informado, recebe as notas processadas.
+    """
+    caminho = Path(caminho_xml)
+    if not caminho.exists():
+        raise ValueError(f"Caminho não encontrado: {caminho_xml}")
+    cnpj_proprio = re.sub(r"\D", "", cnpj_proprio) if cnpj_proprio else None
+
+    origens = nfe.listar_origens(caminho)
+    pacotes: dict[str, zipfile.ZipFile] = {}
+    try:
+        chaves = [nfe.ler_chave(origem, pacotes) for origem in origens]
+    finally:
+        for pacote in pacotes.values():
+            pacote.close()
+    with get_connection() as conn:
+        existentes = _chaves_nfe_existentes(conn, [chave for chave in chaves if chave])
+
+    pendentes = []
+    vistas: set[str] = set()
+    for origem, chave in zip(origens, chaves):
+        if chave and (chave in existentes or chave in vistas):
+            continue
+        if chave:
+            vistas.add(chave)
+        pendentes.append(origem)
+
+    resultado: dict[str, Any] = {
+        "status": "ok",
         "arquivo": caminho_xml,
+        "documentos": len(origens),
+        "importados": 0,
+        "duplicados": len(origens) - len(pendentes),
+        "rejeitados": 0,
+        "erros": [],
     }
+    lotes = [pendentes[inicio : inicio + TAMANHO_LOTE_PROCESSO_NFE] for inicio in range(0, len(pendentes), TAMANHO_LOTE_PROCESSO_NFE)]
+    processos = processos or os.cpu_count() or 1
+
+    def gravar(documentos: list[dict[str, Any]]) -> None:
+        importados, duplicados, erros = _gravar_nfes(documentos, cnpj_proprio, categoria)
+        resultado["importados"] += importados
+        resultado["duplicados"] += duplicados
+        resultado["rejeitados"] += len(erros)
+        resultado["erros"].extend(erros[: max(LIMITE_ERROS - len(resultado["erros"]), 0)])
+        if progresso:
+            progresso(resultado["duplicados"] + resultado["importados"] + resultado["rejeitados"])
+
+    with ExitStack() as pilha:
+        if processos > 1 and len(lotes) > 1:
+            # spawn: os filhos só importam nfe.py, sem herdar conexões nem threads do pai
+            executor = pilha.enter_context(ProcessPoolExecutor(processos, mp_context=get_context("spawn")))
+            leituras = executor.map(nfe.ler_lote, lotes)
+        else:
+            leituras = map(nfe.ler_lote, lotes)
+
+        acumulados: list[dict[str, Any]] = []
+        for documentos in leituras:
+            acumulados.extend(documentos)
+            if len(acumulados) >= TAMANHO_LOTE_NFE:
+                gravar(acumulados)
+                acumulados = []
+        if acumulados:
+            gravar(acumulados)
+
+    return resultado
@@ -1,18 +1,29 @@
-"""Interface de terminal (CLI) do sistema financeiro."""
+"""Interface de terminal (CLI) do sistema financeiro.
+
+Os lançamentos vão para a loja da variável LOJA (padrão: a loja principal).
+"""
 
 from __future__ import annotations
 
-from database import init_db
-from finance import adicionar_lancamento, calcular_saldo, listar_lancamentos
+import os
+from pathlib import Path
+
+from database import LOJA_PADRAO, criar_loja, init_db, listar_lojas, loja_atual, usar_loja
+from extratos import CATEGORIA_PADRAO, ler_extrato
+from finance import adicionar_lancamento, calcular_saldo, garantir_resumos, importar_lancamentos, listar_pagina
+
+# Lançamentos exibidos por página na listagem
+TAMANHO_PAGINA = 20
 
 
 def exibir_menu() -> None:
     """Mostra o menu principal."""
-    print("\n=== Sistema Financeiro (v1) ===")
+    print(f"\n=== Sistema Financeiro (v1) - loja {loja_atual()} ===")
     print("1 - Adicionar entrada")
     print("2 - Adicionar saída")
     print("3 - Listar lançamentos")
     print("4 - Ver saldo")
+    print("5 - Importar extrato (CSV/OFX)")
     print("0 - Sair")
 
 
@@ -43,32 +54,76 @@ def coletar_dados_lancamento(tipo: str) -> None:
 
 
 def mostrar_lancamentos() -> None:
-    """Exibe os lançamentos no terminal."""
-    itens = listar_lancamentos()
-    if not itens:
-        print("\nNenhum lançamento cadastrado.")
+    """Exibe os lançamentos no terminal, página a página, com filtros opcionais."""
+    print("\nFiltros (Enter para ignorar)")
+    filtros = {
+        "data_inicial": input("Data inicial (YYYY-MM-DD): ").strip() or None,
+        "data_final": input("Data final (YYYY-MM-DD): ").strip() or None,
+        "categoria": input("Categoria: ").strip() or None,
+    }
+
+    pagina = listar_pagina(TAMANHO_PAGINA, **filtros)
+    if not pagina["itens"]:
+        print("\nNenhum lançamento encontrado.")
         return
 
-    print("\n=== Lançamentos ===")
-    for item in itens:
-        sinal = "+" if item["tipo"] == "entrada" else "-"
-        print(
-            f"#{item['id']} | {item['data']} | {item['categoria']} | "
-            f"{item['descricao']} | {sinal}R$ {item['valor']:.2f}"
-        )
+    numero = 1
+    while True:
+        print(f"\n=== Lançamentos (página {numero}) ===")
+        for item in pagina["itens"]:
+            sinal = "+" if item["tipo"] == "entrada" else "-"
+            print(
+                f"#{item['id']} | {item['data']} | {item['categoria']} | "
+                f"{item['descricao']} | {sinal}R$ {item['valor']:.2f}"
+            )
+
+        opcoes = []
+        if pagina["proximo"]:
+            opcoes.append("[p] próxima")
+        if pagina["anterior"]:
+            opcoes.append("[a] anterior")
+        opcoes.append("[s] sair")
+        escolha = input("  ".join(opcoes) + ": ").strip().lower()
+
+        if escolha == "p" and pagina["proximo"]:
+            pagina = listar_pagina(TAMANHO_PAGINA, apos=pagina["proximo"], **filtros)
+            numero += 1
+        elif escolha == "a" and pagina["anterior"]:
+            pagina = listar_pagina(TAMANHO_PAGINA, antes=pagina["anterior"], **filtros)
+            numero -= 1
+        elif escolha == "s":
+            return
 
 
 def mostrar_saldo() -> None:
-    """Mostra o saldo total consolidado."""
+    """Mostra o saldo total consolidado e, com mais de uma loja, o da loja atual."""
     saldo = calcular_saldo()
     print(f"\nSaldo atual: R$ {saldo:.2f}")
+    if len(listar_lojas()) > 1:
+        print(f"Saldo da loja {loja_atual()}: R$ {calcular_saldo(loja_atual()):.2f}")
 
 
-def main() -> None:
-    """Ponto de entrada da aplicação CLI."""
-    # Inicializa o banco automaticamente ao abrir o sistema
-    init_db()
+def importar_extrato() -> None:
+    """Importa um extrato CSV ou OFX mostrando o progresso."""
+    caminho = Path(input("\nCaminho do arquivo (.csv ou .ofx): ").strip().strip('"'))
+    if not caminho.is_file():
+        print("Arquivo não encontrado.")
+        return
+    categoria = input(f"Categoria padrão [{CATEGORIA_PADRAO}]: ").strip() or CATEGORIA_PADRAO
+
+    def progresso(linhas: int) -> None:
+        print(f"\r{linhas} linhas processadas...", end="", flush=True)
 
+    resultado = importar_lancamentos(ler_extrato(caminho, categoria), progresso=progresso)
+    print(
+        f"\nImportação concluída: {resultado['inseridos']} novos, "
+        f"{resultado['duplicados']} já existentes, {resultado['rejeitados']} rejeitados."
+    )
+    for erro in resultado["erros"][:10]:
+        print(f"  linha {erro['linha']}: {erro['erro']}")
+
+
+def _executar_menu() -> None:
     while True:
         exibir_menu()
         opcao = input("Escolha uma opção: ").strip()
@@ -82,6 +137,8 @@ def main() -> None:
                 mostrar_lancamentos()
             elif opcao == "4":
                 mostrar_saldo()
+            elif opcao == "5":
+                importar_extrato()
             elif opcao == "0":
                 print("Até mais!")
                 break
@@ -91,5 +148,15 @@ def main() -> None:
             print(f"Erro ao processar operação: {exc}")
 
 
+def main() -> None:
+    """Ponto de entrada da aplicação CLI."""
+    # Inicializa o banco automaticamente ao abrir o sistema
+    init_db()
+    garantir_resumos()
+
+    with usar_loja(criar_loja(os.environ.get("LOJA") or LOJA_PADRAO)):
+        _executar_menu()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,254 @@
+"""Métricas de desempenho em memória, expostas no formato texto do Prometheus.
+
+Histogramas (latência de consultas SQL, etapas da importação, rotas HTTP) e
+contadores simples, agrupados por rótulos. Os valores são por processo e
+zeram quando o processo reinicia.
+
+Com vários processos (servidor prefork), cada worker chama `compartilhar` com a
+mesma pasta: o seu retrato das séries é regravado lá a cada
+INTERVALO_COMPARTILHAMENTO segundos e na saída, e `exportar_prometheus` soma os
+retratos de todos os workers, inclusive dos que já saíram, para os contadores
+não voltarem para trás. Os outros workers aparecem com até um intervalo de
+atraso.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+# Limites dos baldes em segundos (de 0,5 ms a 1 min)
+BALDES_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Segundos entre as gravações do retrato de cada processo na pasta compartilhada
+INTERVALO_COMPARTILHAMENTO = 2.0
+
+_Rotulos = tuple[tuple[str, str], ...]
+
+
+class Histograma:
+    """Contagens acumuladas por balde, soma e total de observações de uma série."""
+
+    def __init__(self, baldes: tuple[float, ...] = BALDES_PADRAO) -> None:
+        self.baldes = baldes
+        self.contagens = [0] * len(baldes)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        for posicao, limite in enumerate(self.baldes):
+            if valor <= limite:
+                self.contagens[posicao] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+
+class _Familia:
+    def __init__(self, nome: str, tipo: str, ajuda: str, baldes: tuple[float, ...]) -> None:
+        self.nome = nome
+        self.tipo = tipo
+        self.ajuda = ajuda
+        self.baldes = baldes
+        self.series: dict[_Rotulos, Histograma | float] = {}
+        self.trava = threading.Lock()
+
+
+_familias: dict[str, _Familia] = {}
+_trava_familias = threading.Lock()
+_pasta_compartilhada: Path | None = None
+_arquivo_retrato: Path | None = None
+
+
+def _familia(nome: str, tipo: str, ajuda: str = "", baldes: tuple[float, ...] = BALDES_PADRAO) -> _Familia:
+    familia = _familias.get(nome)
+    if familia is None:
+        with _trava_familias:
+            familia = _familias.setdefault(nome, _Familia(nome, tipo, ajuda, baldes))
+    return familia
+
+
+def registrar_histograma(nome: str, ajuda: str, baldes: tuple[float, ...] = BALDES_PADRAO) -> None:
+    """Declara um histograma (texto de ajuda e baldes) antes da primeira observação."""
+    _familia(nome, "histogram", ajuda, baldes)
+
+
+def registrar_contador(nome: str, ajuda: str) -> None:
+    """Declara um contador antes do primeiro incremento."""
+    _familia(nome, "counter", ajuda)
+
+
+def observar(nome: str, valor: float, **rotulos: str) -> None:
+    """Registra uma observação (em segundos) no histograma `nome`."""
+    familia = _familia(nome, "histogram")
+    chave = tuple(sorted(rotulos.items()))
+    with familia.trava:
+        serie = familia.series.get(chave)
+        if serie is None:
+            serie = familia.series[chave] = Histograma(familia.baldes)
+        serie.observar(valor)
+
+
+def incrementar(nome: str, valor: float = 1, **rotulos: str) -> None:
+    """Soma `valor` ao contador `nome`."""
+    familia = _familia(nome, "counter")
+    chave = tuple(sorted(rotulos.items()))
+    with familia.trava:
+        familia.series[chave] = familia.series.get(chave, 0) + valor
+
+
+@contextmanager
+def medir(nome: str, **rotulos: str) -> Iterator[None]:
+    """Observa no histograma `nome` a duração do bloco `with`, mesmo se ele falhar."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nome, time.perf_counter() - inicio, **rotulos)
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(rotulos: _Rotulos) -> str:
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(str(valor))}"' for nome, valor in rotulos) + "}"
+
+
+def _formatar_numero(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+def _retrato() -> dict[str, dict[str, Any]]:
+    """Cópia das séries do processo, serializável em JSON."""
+    with _trava_familias:
+        familias = sorted(_familias.values(), key=lambda familia: familia.nome)
+    retrato = {}
+    for familia in familias:
+        with familia.trava:
+            series = [
+                [list(rotulos), serie if familia.tipo == "counter" else [list(serie.contagens), serie.soma, serie.total]]
+                for rotulos, serie in familia.series.items()
+            ]
+        retrato[familia.nome] = {
+            "tipo": familia.tipo,
+            "ajuda": familia.ajuda,
+            "baldes": list(familia.baldes),
+            "series": series,
+        }
+    return retrato
+
+
+def _somar(destino: dict[str, dict[str, Any]], retrato: dict[str, dict[str, Any]]) -> None:
+    for nome, familia in retrato.items():
+        soma = destino.setdefault(nome, {**familia, "series": {}})
+        if len(familia["baldes"]) != len(soma["baldes"]):
+            continue
+        for rotulos, serie in familia["series"]:
+            chave = tuple(tuple(par) for par in rotulos)
+            atual = soma["series"].get(chave)
+            if familia["tipo"] == "counter":
+                soma["series"][chave] = (atual or 0) + serie
+            elif atual is None:
+                soma["series"][chave] = [list(serie[0]), serie[1], serie[2]]
+            else:
+                atual[0] = [a + b for a, b in zip(atual[0], serie[0])]
+                atual[1] += serie[1]
+                atual[2] += serie[2]
+
+
+def _gravar_retrato() -> None:
+    if _arquivo_retrato is None:
+        return
+    temporario = _arquivo_retrato.with_suffix(".tmp")
+    temporario.write_text(json.dumps(_retrato()), encoding="utf-8")
+    os.replace(temporario, _arquivo_retrato)
+
+
+def _retratos_compartilhados() -> Iterator[dict[str, dict[str, Any]]]:
+    for caminho in sorted(_pasta_compartilhada.glob("*.json")):
+        try:
+            yield json.loads(caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+
+
+def compartilhar(pasta: Path) -> None:
+    """Passa a gravar o retrato deste processo em `pasta` e a exportar a soma de todos os retratos.
+
+    Chamado em cada worker, depois do fork; a pasta é criada e apagada por quem
+    cria os workers.
+    """
+    global _pasta_compartilhada, _arquivo_retrato
+    _pasta_compartilhada = Path(pasta)
+    # O instante entra no nome: um worker novo com o pid de um antigo não apaga o retrato dele
+    _arquivo_retrato = _pasta_compartilhada / f"{os.getpid()}-{time.time_ns()}.json"
+    _gravar_retrato()
+
+    def gravar_periodicamente() -> None:
+        while True:
+            time.sleep(INTERVALO_COMPARTILHAMENTO)
+            _gravar_retrato()
+
+    threading.Thread(target=gravar_periodicamente, name="metricas", daemon=True).start()
+
+
+def encerrar_compartilhamento() -> None:
+    """Grava o retrato final do processo (chamado pelo worker antes de sair)."""
+    _gravar_retrato()
+
+
+def exportar_prometheus() -> str:
+    """Texto no formato de exposição do Prometheus (versão 0.0.4).
+
+    Com `compartilhar`, soma as séries de todos os processos que usam a pasta.
+    """
+    familias: dict[str, dict[str, Any]] = {}
+    if _pasta_compartilhada is None:
+        _somar(familias, _retrato())
+    else:
+        _gravar_retrato()
+        for retrato in _retratos_compartilhados():
+            _somar(familias, retrato)
+
+    linhas: list[str] = []
+    for nome, familia in sorted(familias.items()):
+        if familia["ajuda"]:
+            linhas.append(f"# HELP {nome} {familia['ajuda']}")
+        linhas.append(f"# TYPE {nome} {familia['tipo']}")
+
+        for rotulos, serie in sorted(familia["series"].items()):
+            if familia["tipo"] == "counter":
+                linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {_formatar_numero(serie)}")
+                continue
+            contagens, soma, total = serie
+            acumulado = 0
+            for limite, contagem in zip(familia["baldes"] + [math.inf], contagens + [0]):
+                acumulado += contagem
+                balde = rotulos + (("le", _formatar_numero(limite)),)
+                valor = total if math.isinf(limite) else acumulado
+                linhas.append(f"{nome}_bucket{_formatar_rotulos(balde)} {valor}")
+            linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {_formatar_numero(soma)}")
+            linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {total}")
+
+    return "\n".join(linhas) + "\n"
+
+
+def limpar() -> None:
+    """Zera todas as séries (as declarações de ajuda e baldes são mantidas)."""
+    with _trava_familias:
+        familias = list(_familias.values())
+    for familia in familias:
+        with familia.trava:
+            familia.series.clear()
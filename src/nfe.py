@@ -0,0 +1,176 @@
+"""Leitura de XML de NF-e (nota avulsa `NFe` ou processada `nfeProc`).
+
+O XML é percorrido com `iterparse` e cada elemento é descartado logo após ser
+lido, então a memória por documento não depende do tamanho do arquivo além da
+lista de itens extraída. As funções aqui não importam pandas nem o banco: rodam
+nos processos de `finance.importar_nfe_xml`.
+"""
+
+from __future__ import annotations
+
+import re
+import zipfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any
+from xml.etree.ElementTree import ParseError, iterparse
+
+_RE_CHAVE = re.compile(r"(?<!\d)(\d{44})(?!\d)")
+
+# Origem de um XML: (arquivo, membro do zip ou None)
+Origem = tuple[str, str | None]
+
+
+def _nome_local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def listar_origens(caminho: Path) -> list[Origem]:
+    """XMLs de um arquivo .xml, de um .zip ou de uma pasta (inclusive zips dentro dela)."""
+    caminho = Path(caminho)
+    if caminho.is_dir():
+        origens: list[Origem] = []
+        for arquivo in sorted(caminho.rglob("*")):
+            if arquivo.suffix.lower() in (".xml", ".zip"):
+                origens.extend(listar_origens(arquivo))
+        return origens
+    if caminho.suffix.lower() == ".zip":
+        with zipfile.ZipFile(caminho) as pacote:
+            return [
+                (str(caminho), membro.filename)
+                for membro in pacote.infolist()
+                if not membro.is_dir() and membro.filename.lower().endswith(".xml")
+            ]
+    return [(str(caminho), None)]
+
+
+def rotulo(origem: Origem) -> str:
+    arquivo, membro = origem
+    return f"{arquivo}:{membro}" if membro else arquivo
+
+
+@contextmanager
+def _abrir(origem: Origem, pacotes: dict[str, zipfile.ZipFile]) -> Iterator[IO[bytes]]:
+    arquivo, membro = origem
+    if membro is None:
+        with open(arquivo, "rb") as fluxo:
+            yield fluxo
+        return
+    pacote = pacotes.get(arquivo)
+    if pacote is None:
+        pacote = pacotes[arquivo] = zipfile.ZipFile(arquivo)
+    with pacote.open(membro) as fluxo:
+        yield fluxo
+
+
+def chave_pelo_nome(origem: Origem) -> str | None:
+    """Chave de acesso no nome do arquivo (padrão '<chave>-nfe.xml'), se houver."""
+    correspondencia = _RE_CHAVE.search(Path(origem[1] or origem[0]).name)
+    return correspondencia.group(1) if correspondencia else None
+
+
+def ler_chave(origem: Origem, pacotes: dict[str, zipfile.ZipFile] | None = None) -> str | None:
+    """Chave de acesso do documento: pelo nome do arquivo ou pelo início do XML.
+
+    Lê só até o atributo Id de <infNFe>, que vem antes do conteúdo da nota.
+    """
+    chave = chave_pelo_nome(origem)
+    if chave:
+        return chave
+    pacotes = {} if pacotes is None else pacotes
+    try:
+        with _abrir(origem, pacotes) as fluxo:
+            for _, elemento in iterparse(fluxo, events=("start",)):
+                if _nome_local(elemento.tag) == "infNFe":
+                    correspondencia = _RE_CHAVE.search(elemento.get("Id", ""))
+                    return correspondencia.group(1) if correspondencia else None
+    except (ParseError, OSError, KeyError):
+        return None
+    return None
+
+
+def _numero(texto: str | None) -> float | None:
+    try:
+        return float(texto) if texto not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def ler_documento(fluxo: IO[bytes]) -> dict[str, Any]:
+    """Extrai chave, número, emitente, data de emissão, total (vNF) e itens de uma NF-e."""
+    documento: dict[str, Any] = {
+        "chave": None,
+        "numero": None,
+        "data_emissao": None,
+        "emitente_cnpj": None,
+        "emitente_nome": None,
+        "valor_total": None,
+        "itens": [],
+    }
+    caminho: list[str] = []
+    elementos: list[Any] = []
+    item: dict[str, Any] | None = None
+
+    for evento, elemento in iterparse(fluxo, events=("start", "end")):
+        nome = _nome_local(elemento.tag)
+        if evento == "start":
+            caminho.append(nome)
+            elementos.append(elemento)
+            if nome == "infNFe" and not documento["chave"]:
+                correspondencia = _RE_CHAVE.search(elemento.get("Id", ""))
+                documento["chave"] = correspondencia.group(1) if correspondencia else None
+            elif nome == "det":
+                item = {"numero_item": int(elemento.get("nItem") or len(documento["itens"]) + 1)}
+            continue
+
+        texto = (elemento.text or "").strip()
+        pai = caminho[-2] if len(caminho) > 1 else ""
+        if pai == "ide" and nome == "nNF":
+            documento["numero"] = texto
+        elif pai == "ide" and nome in ("dhEmi", "dEmi"):
+            documento["data_emissao"] = texto[:10]
+        elif pai == "emit" and nome in ("CNPJ", "CPF"):
+            documento["emitente_cnpj"] = texto
+        elif pai == "emit" and nome == "xNome":
+            documento["emitente_nome"] = texto
+        elif pai == "ICMSTot" and nome == "vNF":
+            documento["valor_total"] = _numero(texto)
+        elif pai == "infProt" and nome == "chNFe" and not documento["chave"]:
+            documento["chave"] = texto
+        elif pai == "prod" and item is not None:
+            campos = {"cProd": "codigo", "xProd": "descricao", "qCom": "quantidade", "vUnCom": "valor_unitario", "vProd": "valor_total"}
+            if nome in campos:
+                item[campos[nome]] = texto if nome in ("cProd", "xProd") else _numero(texto)
+        elif nome == "det" and item is not None:
+            documento["itens"].append(item)
+            item = None
+
+        # Descarta o elemento já lido: a árvore em memória não cresce com o arquivo
+        caminho.pop()
+        elementos.pop()
+        if elementos:
+            elementos[-1].remove(elemento)
+        elemento.clear()
+
+    return documento
+
+
+def ler_lote(origens: list[Origem]) -> list[dict[str, Any]]:
+    """Lê vários XMLs (executado nos processos do pool); erros voltam como {'origem', 'erro'}."""
+    pacotes: dict[str, zipfile.ZipFile] = {}
+    resultados = []
+    try:
+        for origem in origens:
+            try:
+                with _abrir(origem, pacotes) as fluxo:
+                    documento = ler_documento(fluxo)
+            except (ParseError, OSError, KeyError) as exc:
+                resultados.append({"origem": rotulo(origem), "erro": f"XML inválido: {exc}"})
+                continue
+            documento["origem"] = rotulo(origem)
+            resultados.append(documento)
+    finally:
+        for pacote in pacotes.values():
+            pacote.close()
+    return resultados
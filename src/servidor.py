@@ -0,0 +1,194 @@
+"""Servidor de produção: prefork, com vários processos e threads por processo.
+
+O processo mestre carrega a aplicação uma vez (`create_app`: esquema e rollups),
+fecha as conexões SQLite e abre o socket; depois cria os workers com fork. Eles
+herdam a aplicação já importada e aceitam conexões do mesmo socket, cada um com
+até `--threads` requisições ao mesmo tempo. Um worker saturado para de aceitar
+conexões e deixa as próximas para os outros.
+
+Cada worker inicia a sua fila de importação depois do fork; o arquivo é
+reivindicado no banco dos jobs (bi.jobs), então dois workers nunca importam o
+mesmo. Cache e snapshot colunar são por processo; o /metrics soma as métricas
+de todos os workers, que gravam os seus valores numa pasta temporária criada
+pelo mestre (`metricas.compartilhar`).
+
+Um worker que morre é substituído. SIGTERM ou SIGINT no mestre encerra os
+workers, que terminam as requisições em andamento antes de sair. Só em
+sistemas com fork (Linux, macOS).
+
+Uso:
+    python src/servidor.py [--host 0.0.0.0] [--porta 5000] [--workers N] [--threads 8]
+
+Padrões também por variáveis de ambiente: WEB_HOST, WEB_PORTA, WEB_WORKERS
+(número de CPUs) e WEB_THREADS.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from flask import Flask
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+import metricas
+from database import fechar_conexoes, liberar_conexao
+
+THREADS_PADRAO = 8
+# Worker que morre antes disso é recriado com uma pausa, para não girar em falha
+VIDA_MINIMA_SEGUNDOS = 1.0
+_SINAIS_ENCERRAMENTO = {signal.SIGINT, signal.SIGTERM}
+
+_log = logging.getLogger("servidor")
+
+
+class _TratadorRequisicao(WSGIRequestHandler):
+    # Sem keep-alive: um cliente ocioso não prende uma das threads do worker
+    protocol_version = "HTTP/1.0"
+    # Segundos sem receber dados antes de desistir da conexão
+    timeout = 60
+
+
+class ServidorThreads(BaseWSGIServer):
+    """Servidor WSGI com um pool fixo de threads, criado no worker (depois do fork)."""
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, host: str, porta: int, app: Flask, threads: int) -> None:
+        super().__init__(host, porta, app, handler=_TratadorRequisicao)
+        self.threads = max(threads, 1)
+        self._executor: ThreadPoolExecutor | None = None
+        self._vagas: threading.BoundedSemaphore | None = None
+
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="http")
+        self._vagas = threading.BoundedSemaphore(self.threads)
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def process_request(self, request, client_address) -> None:
+        # Bloqueia o accept enquanto todas as threads estão ocupadas
+        self._vagas.acquire()
+        self._executor.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._vagas.release()
+
+
+def _rodar_worker(servidor: ServidorThreads, pasta_metricas: Path) -> None:
+    # O mestre coordena o Ctrl+C; SIGTERM para o accept e espera as requisições
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=servidor.shutdown).start())
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, _SINAIS_ENCERRAMENTO)
+    status = 0
+    try:
+        # Herdadas do mestre: os valores dele não são deste worker
+        metricas.limpar()
+        metricas.compartilhar(pasta_metricas)
+        from bi import iniciar_fila_importacao
+
+        iniciar_fila_importacao()
+        servidor.serve_forever()
+    except BaseException:
+        _log.exception("Worker %d falhou", os.getpid())
+        status = 1
+    finally:
+        try:
+            metricas.encerrar_compartilhamento()
+        finally:
+            os._exit(status)
+
+
+def _iniciar_worker(servidor: ServidorThreads, filhos: dict[int, float], pasta_metricas: Path) -> None:
+    # Sinais bloqueados durante o fork: o encerramento só roda com o worker já em `filhos`
+    signal.pthread_sigmask(signal.SIG_BLOCK, _SINAIS_ENCERRAMENTO)
+    try:
+        pid = os.fork()
+        if pid == 0:
+            _rodar_worker(servidor, pasta_metricas)
+        filhos[pid] = time.monotonic()
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, _SINAIS_ENCERRAMENTO)
+
+
+def servir(app: Flask, host: str, porta: int, workers: int, threads: int) -> None:
+    """Abre o socket e mantém `workers` processos atendendo até receber SIGTERM/SIGINT."""
+    # Conexões SQLite não podem atravessar o fork; cada worker abre as suas
+    liberar_conexao()
+    fechar_conexoes()
+    servidor = ServidorThreads(host, porta, app, threads)
+    pasta_metricas = Path(tempfile.mkdtemp(prefix="metricas-"))
+
+    filhos: dict[int, float] = {}
+    encerrando = False
+
+    def encerrar(*_args) -> None:
+        nonlocal encerrando
+        encerrando = True
+        for pid in list(filhos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    for _ in range(max(workers, 1)):
+        if not encerrando:
+            _iniciar_worker(servidor, filhos, pasta_metricas)
+    _log.info("Servindo em http://%s:%d com %d workers × %d threads", host, servidor.port, len(filhos), threads)
+
+    while filhos:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        iniciado_em = filhos.pop(pid, None)
+        if encerrando or iniciado_em is None:
+            continue
+        _log.warning("Worker %d saiu (status %d); criando outro", pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - iniciado_em < VIDA_MINIMA_SEGUNDOS:
+            time.sleep(VIDA_MINIMA_SEGUNDOS)
+        if not encerrando:
+            _iniciar_worker(servidor, filhos, pasta_metricas)
+    servidor.server_close()
+    shutil.rmtree(pasta_metricas, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.environ.get("WEB_HOST", "0.0.0.0"))
+    parser.add_argument("--porta", type=int, default=int(os.environ.get("WEB_PORTA", 5000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WEB_THREADS", THREADS_PADRAO)))
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        raise SystemExit("O servidor prefork precisa de fork(); use `python src/webapp.py` neste sistema.")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s[%(process)d] %(message)s")
+    from webapp import create_app
+
+    # Carregada uma vez no mestre; os workers herdam a aplicação pronta
+    servir(create_app(iniciar_fila=False), args.host, args.porta, args.workers, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,282 @@
-"""Aplicação web do sistema financeiro com módulo BI."""
+"""Aplicação web do sistema financeiro com módulo BI.
+
+A aplicação é criada no primeiro acesso a `webapp.app` (ou por `create_app`),
+não na importação. `python src/webapp.py` sobe o servidor de desenvolvimento;
+em produção use `python src/servidor.py` (prefork, vários processos).
+"""
 
 from __future__ import annotations
 
-from flask import Flask, jsonify, render_template, request
+import time
+
+from flask import Flask, abort, g, jsonify, render_template, request, stream_with_context
+
+import metricas
+
+from bi import (
+    FORMATOS_DASHBOARD,
+    FORMATOS_EXPORTACAO,
+    LIMITE_BUSCA,
+    PAINEIS_DASHBOARD,
+    TIPOS_EXPORTACAO,
+    BIProvider,
+    buscar_produtos,
+    carregar_dashboard_em_cache,
+    carregar_painel_em_cache,
+    codificacoes_disponiveis,
+    comprimir,
+    comprimir_gzip,
+    consultar_job,
+    dashboard_colunar,
+    enfileirar_importacao,
+    exportar,
+    garantir_rollups,
+    iniciar_fila_importacao,
+    listar_provedores,
+    obter_provedor,
+    painel_colunar,
+    serializar_json,
+    versao_dados,
+)
+from database import LOJA_PADRAO, init_db, liberar_conexao, listar_lojas
+
+METRICA_ROTA = "http_requisicao_segundos"
+METRICA_REQUISICOES = "http_requisicoes_total"
+metricas.registrar_histograma(METRICA_ROTA, "Latência das requisições HTTP por rota.")
+metricas.registrar_contador(METRICA_REQUISICOES, "Requisições HTTP por rota e status.")
+
+
+def _provedor_ou_404(slug: str) -> BIProvider:
+    try:
+        return obter_provedor(slug)
+    except ValueError:
+        abort(404)
+
+
+def _loja_ou_404(loja: str | None) -> str | None:
+    # Sem loja, as leituras consolidam todas; loja sem shard não é criada por aqui
+    if loja and loja not in listar_lojas():
+        abort(404)
+    return loja or None
 
-from bi import carregar_dashboard_99food, importar_arquivos_99food
-from database import init_db
 
+def create_app(iniciar_fila: bool = True) -> Flask:
+    """Cria a aplicação; `iniciar_fila=False` deixa a fila de importação para depois.
 
-def create_app() -> Flask:
+    O servidor prefork cria a aplicação no processo mestre sem threads e inicia
+    a fila em cada worker, depois do fork.
+    """
     app = Flask(__name__)
 
     init_db()
+    garantir_rollups()
+    if iniciar_fila:
+        # Workers configuráveis via BI_IMPORT_WORKERS; jobs interrompidos são retomados
+        iniciar_fila_importacao()
+
+    @app.context_processor
+    def provedores_bi() -> dict:
+        # Menu e página inicial listam os provedores registrados
+        return {"provedores_bi": listar_provedores()}
+
+    @app.teardown_appcontext
+    def devolver_conexao(_exc: BaseException | None) -> None:
+        # Threads de requisição são efêmeras; devolve a conexão ao pool logo ao fim
+        liberar_conexao()
+
+    @app.before_request
+    def iniciar_medicao() -> None:
+        g.inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def guardar_status(response):
+        g.status_requisicao = response.status_code
+        return response
+
+    @app.teardown_request
+    def registrar_metricas_requisicao(_exc: BaseException | None) -> None:
+        inicio = g.pop("inicio_requisicao", None)
+        if inicio is None:
+            return
+        # Rótulo pelo padrão da rota (/bi/<provedor>/jobs/<job_id>), não pela URL
+        rota = request.url_rule.rule if request.url_rule else "nao_encontrada"
+        metricas.observar(METRICA_ROTA, time.perf_counter() - inicio, metodo=request.method, rota=rota)
+        # Exceção não tratada não passa por after_request: vira 500
+        status = str(g.pop("status_requisicao", 500))
+        metricas.incrementar(METRICA_REQUISICOES, metodo=request.method, rota=rota, status=status)
+
+    @app.get("/metrics")
+    def exportar_metricas():
+        return app.response_class(
+            metricas.exportar_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
 
     @app.get("/")
     def home() -> str:
         return render_template("home.html")
 
-    @app.get("/bi/99food")
-    def bi_99food_page() -> str:
-        dashboard = carregar_dashboard_99food()
-        return render_template("bi_99food.html", dashboard=dashboard)
+    @app.get("/bi/<provedor>")
+    def bi_page(provedor: str) -> str:
+        provedor_bi = _provedor_ou_404(provedor)
+        return render_template("bi_provedor.html", provedor=provedor_bi, lojas=listar_lojas())
 
-    @app.post("/bi/99food/upload")
-    def bi_99food_upload():
+    @app.post("/bi/<provedor>/upload")
+    def bi_upload(provedor: str):
+        provedor_bi = _provedor_ou_404(provedor)
+        loja = _loja_ou_404(request.form.get("loja")) or LOJA_PADRAO
         arquivos = request.files.getlist("arquivos")
-        payload = [(arquivo.filename, arquivo.read()) for arquivo in arquivos if arquivo.filename]
+        # Repassa o stream de cada upload; o serviço copia para disco em blocos
+        payload = [(arquivo.filename, arquivo.stream) for arquivo in arquivos if arquivo.filename]
         try:
-            resultado = importar_arquivos_99food(payload)
-            return jsonify({"status": "ok", "resultado": resultado})
+            job_id = enfileirar_importacao(provedor_bi.slug, payload, loja)
+            return jsonify({"status": "ok", "job_id": job_id}), 202
         except Exception as exc:
             return jsonify({"status": "erro", "mensagem": str(exc)}), 400
 
-    @app.get("/bi/99food/dashboard")
-    def bi_99food_dashboard():
-        data_inicial = request.args.get("data_inicial")
-        data_final = request.args.get("data_final")
-        produto = request.args.get("produto")
-        return jsonify(carregar_dashboard_99food(data_inicial, data_final, produto))
+    @app.get("/bi/<provedor>/jobs/<job_id>")
+    def bi_job(provedor: str, job_id: str):
+        provedor_bi = _provedor_ou_404(provedor)
+        job = consultar_job(job_id)
+        if job is None or job["provedor"] != provedor_bi.slug:
+            return jsonify({"status": "erro", "mensagem": "Job não encontrado."}), 404
+        return jsonify(job)
+
+    def json_versionado(slug: str, loja: str | None, gerar):
+        """JSON com ETag na versão dos dados do provedor na loja (ou em todas); 304 sem chamar `gerar`.
+
+        O corpo sai comprimido em brotli ou gzip quando o cliente aceita.
+        """
+        # O ETag só muda quando uma importação altera os dados do provedor; é fraco
+        # porque o mesmo conteúdo sai com ou sem compressão
+        versao = versao_dados(slug, loja)
+        etag = f"{slug}-{loja or 'lojas'}-{versao}"
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            codificacao = request.accept_encodings.best_match(codificacoes_disponiveis())
+            corpo, codificacao = comprimir(serializar_json(gerar(versao)), codificacao)
+            response = app.response_class(corpo, mimetype="application/json")
+            if codificacao:
+                response.headers["Content-Encoding"] = codificacao
+        response.set_etag(etag, weak=True)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def filtros_dashboard() -> tuple[str | None, str | None, str | None]:
+        return request.args.get("data_inicial"), request.args.get("data_final"), request.args.get("produto")
+
+    def todo_periodo() -> bool:
+        # Sem datas, o padrão são os meses quentes; todo_periodo=1 inclui os arquivados
+        return request.args.get("todo_periodo") == "1"
+
+    def formato_dashboard() -> str:
+        # formato=colunar: séries como arrays paralelos (bi.respostas); o padrão são linhas
+        formato = request.args.get("formato", "linhas")
+        if formato not in FORMATOS_DASHBOARD:
+            response = jsonify(
+                {"status": "erro", "mensagem": f"Formato desconhecido: '{formato}'. Use: {', '.join(FORMATOS_DASHBOARD)}."}
+            )
+            response.status_code = 400
+            abort(response)
+        return formato
+
+    @app.get("/bi/<provedor>/dashboard")
+    def bi_dashboard(provedor: str):
+        # Dashboard completo num JSON só; a tela usa as rotas por painel
+        provedor_bi = _provedor_ou_404(provedor)
+        loja = _loja_ou_404(request.args.get("loja"))
+        formato = formato_dashboard()
+
+        def gerar(versao: int):
+            dashboard = carregar_dashboard_em_cache(
+                provedor_bi.slug, *filtros_dashboard(), versao, loja, todo_periodo()
+            )[1]
+            if formato == "colunar":
+                # produtos=0 deixa os rankings de fora
+                return dashboard_colunar(dashboard, produtos=request.args.get("produtos") != "0")
+            return dashboard
+
+        return json_versionado(provedor_bi.slug, loja, gerar)
+
+    @app.get("/bi/<provedor>/dashboard/<painel>")
+    def bi_painel(provedor: str, painel: str):
+        provedor_bi = _provedor_ou_404(provedor)
+        if painel not in PAINEIS_DASHBOARD:
+            abort(404)
+        loja = _loja_ou_404(request.args.get("loja"))
+        formato = formato_dashboard()
+
+        def gerar(versao: int):
+            valor = carregar_painel_em_cache(
+                provedor_bi.slug, painel, *filtros_dashboard(), versao, loja, todo_periodo()
+            )[1]
+            return painel_colunar(painel, valor) if formato == "colunar" else valor
+
+        return json_versionado(provedor_bi.slug, loja, gerar)
+
+    @app.get("/bi/<provedor>/produtos")
+    def bi_produtos(provedor: str):
+        provedor_bi = _provedor_ou_404(provedor)
+        # Sugestões do filtro de produto: busca por prefixo em vez da lista inteira
+        limite = request.args.get("limite", LIMITE_BUSCA, type=int)
+        loja = _loja_ou_404(request.args.get("loja"))
+        return json_versionado(
+            provedor_bi.slug,
+            loja,
+            lambda _versao: buscar_produtos(provedor_bi.slug, request.args.get("q", ""), limite, loja),
+        )
+
+    @app.get("/bi/<provedor>/export/<tipo>")
+    def bi_exportar(provedor: str, tipo: str):
+        provedor_bi = _provedor_ou_404(provedor)
+        if tipo not in TIPOS_EXPORTACAO:
+            abort(404)
+        formato = request.args.get("formato", "csv")
+        # Exportações leem um shard só: sem loja, a loja padrão
+        loja = _loja_ou_404(request.args.get("loja")) or LOJA_PADRAO
+        try:
+            blocos = exportar(
+                provedor_bi.slug,
+                tipo,
+                formato,
+                request.args.get("data_inicial"),
+                request.args.get("data_final"),
+                request.args.get("produto"),
+                loja,
+                todo_periodo(),
+            )
+        except ValueError as exc:
+            return jsonify({"status": "erro", "mensagem": str(exc)}), 400
+
+        # gzip só se o cliente aceitar; navegadores descompactam sozinhos
+        compactar = request.accept_encodings["gzip"] > 0
+        if compactar:
+            blocos = comprimir_gzip(blocos)
+        # O contexto da requisição (e a conexão da thread) dura até o último bloco
+        response = app.response_class(stream_with_context(blocos), content_type=FORMATOS_EXPORTACAO[formato])
+        if compactar:
+            response.headers["Content-Encoding"] = "gzip"
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-store"
+        response.headers["Content-Disposition"] = f'attachment; filename="{loja}-{provedor_bi.slug}-{tipo}.{formato}"'
+        return response
 
     return app
 
 
-app = create_app()
+_app: Flask | None = None
+
+
+def __getattr__(nome: str) -> Flask:
+    # `webapp.app` (flask --app webapp, servidores WSGI) cria a aplicação no primeiro acesso
+    global _app
+    if nome == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    create_app().run(host="0.0.0.0", port=5000, debug=True)